@@ -0,0 +1,113 @@
+"""
+Benchmark for the vectorized geodesic solver used for hard-ties
+(processing/geodesic.py).
+
+Usage:
+    python bench_geodesic.py [number of pairs] [--min-speedup 20]
+
+Random hard-ties (1 m to 2 km long) are generated in UTM zone 10N (100,000 by
+default) and solved both pair by pair and in one vectorized call. If pyproj is
+installed, the results are also checked against the previous hard-tie method:
+the ellipsoidal distance (GeographicLib, as used by QgsDistanceArea) and the
+grid bearing corrected by the grid convergence at the feature point. The
+script exits with an error if the rounded distances (cm) or bearings (0.1 deg)
+differ by more than one unit. The speedup depends on the machine, so it is
+only reported, unless --min-speedup is given, in which case the script exits
+with an error if the vectorized solver is slower than that.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+try:
+    import pyproj
+except ImportError:
+    pyproj = None
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'processing'))
+from geodesic import geodesic_inverse
+
+def random_ties(n, rng):
+    """Returns UTM zone 10N coordinates of `n` random hard-ties"""
+    x1 = rng.uniform(300000, 700000, n)
+    y1 = rng.uniform(4000000, 6500000, n)
+    angles = rng.uniform(0, 2*np.pi, n)
+    lengths = rng.uniform(1, 2000, n)
+    return x1, y1, x1 + lengths*np.sin(angles), y1 + lengths*np.cos(angles)
+
+def to_geographic(x, y):
+    """
+    Returns the longitudes and latitudes of UTM zone 10N coordinates, using
+    pyproj if it is installed and a rough approximation (good enough for the
+    timing) if it is not
+    """
+    if pyproj is not None:
+        return pyproj.Transformer.from_crs(32610, 4326, always_xy=True).transform(x, y)
+    lat = y/110946
+    return -123 + (x - 500000)/(111320*np.cos(np.radians(lat))), lat
+
+def check_previous_method(x1, y1, x2, y2, distances, bearings):
+    """
+    Compares the results with the previous hard-tie method. Returns True if
+    the rounded values differ by at most 1 cm and 0.1 deg.
+    """
+    lon1, lat1 = to_geographic(x1, y1)
+    lon2, lat2 = to_geographic(x2, y2)
+
+    # Previous method: ellipsoidal distance, grid bearing + convergence at the feature
+    previous_distances = pyproj.Geod(ellps='WGS84').inv(lon1, lat1, lon2, lat2)[2]
+    grid_bearings = np.degrees(np.pi/2 - np.arctan2(y2 - y1, x2 - x1))
+    convergence = pyproj.Proj(32610).get_factors(lon2, lat2).meridian_convergence
+    previous_bearings = np.mod(grid_bearings + convergence, 360.0)
+
+    distance_error = np.abs(distances - previous_distances)
+    bearing_error = np.abs((bearings - previous_bearings + 180) % 360 - 180)
+    rounded_distances = np.abs(np.round(distances, 2) - np.round(previous_distances, 2))
+    rounded_bearings = np.abs((np.round(bearings, 1) - np.round(previous_bearings, 1) + 180) % 360 - 180)
+    print(f"max distance difference:    {distance_error.max():.2e} m")
+    print(f"max bearing difference:     {bearing_error.max():.2e} deg")
+    print(f"rounded values that differ: {np.mean((rounded_distances > 0) | (rounded_bearings > 0)):.3%}")
+    return rounded_distances.max() <= 0.01 + 1e-9 and rounded_bearings.max() <= 0.1 + 1e-9
+
+def main(n, min_speedup=None):
+    rng = np.random.default_rng(0)
+    x1, y1, x2, y2 = random_ties(n, rng)
+    lon1, lat1 = to_geographic(x1, y1)
+    lon2, lat2 = to_geographic(x2, y2)
+
+    start = time.perf_counter()
+    per_pair = [geodesic_inverse(*coords) for coords in zip(lon1, lat1, lon2, lat2)]
+    per_pair_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    distances, _, bearings = geodesic_inverse(lon1, lat1, lon2, lat2)
+    vectorized_time = time.perf_counter() - start
+
+    # Check that both agree
+    per_pair_distances = np.array([float(d) for d, _, _ in per_pair])
+    assert np.allclose(per_pair_distances, distances, rtol=0, atol=1e-6), "per-pair and vectorized distances differ"
+
+    speedup = per_pair_time/vectorized_time
+    print(f"pairs:       {n}")
+    print(f"per-pair:    {per_pair_time:.3f} s ({n/per_pair_time:,.0f} pairs/s)")
+    print(f"vectorized:  {vectorized_time:.3f} s ({n/vectorized_time:,.0f} pairs/s)")
+    if min_speedup is None:
+        print(f"speedup:     {speedup:.0f}x")
+        fast_enough = True
+    else:
+        print(f"speedup:     {speedup:.0f}x (required: {min_speedup:g}x)")
+        fast_enough = speedup >= min_speedup
+
+    if pyproj is None:
+        print("pyproj not installed: skipping the comparison with the previous method")
+        return fast_enough
+    return check_previous_method(x1, y1, x2, y2, distances, bearings) and fast_enough
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Times geodesic_inverse pair by pair against one vectorized call.")
+    parser.add_argument('n', nargs='?', type=int, default=100_000, help="number of pairs (default 100,000)")
+    parser.add_argument('--min-speedup', type=float, help="exit with an error if the speedup is lower than this")
+    args = parser.parse_args()
+    sys.exit(0 if main(args.n, args.min_speedup) else 1)
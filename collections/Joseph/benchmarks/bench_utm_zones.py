@@ -0,0 +1,71 @@
+"""
+Microbenchmark comparing the per-point latlong_to_utmzone with the vectorized
+latlong_to_utmzone_array (processing/utm_zones.py).
+
+Usage:
+    python bench_utm_zones.py [number of points] [--min-speedup 50]
+
+Both functions are run on the same random points (1,000,000 by default) and
+the results are checked against each other; the script fails if they differ.
+The speedup depends on the machine and the number of points, so it is only
+reported, unless --min-speedup is given, in which case the script exits with
+an error if the vectorized function is slower than that.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'processing'))
+from utm_zones import latlong_to_utmzone, latlong_to_utmzone_array
+
+class Point:
+    """Minimal stand-in for QgsPointXY"""
+    __slots__ = ('_x', '_y')
+
+    def __init__(self, x, y):
+        self._x = x
+        self._y = y
+
+    def x(self):
+        return self._x
+
+    def y(self):
+        return self._y
+
+def main(n, min_speedup=None):
+    rng = np.random.default_rng(0)
+    lons = rng.uniform(-180, 180, n)
+    lats = rng.uniform(-80, 84, n)
+    points = [Point(x, y) for x, y in zip(lons.tolist(), lats.tolist())]
+
+    start = time.perf_counter()
+    per_point = [latlong_to_utmzone(point) for point in points]
+    per_point_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    zones, bands = latlong_to_utmzone_array(lons, lats)
+    vectorized_time = time.perf_counter() - start
+
+    # Check that both functions agree
+    vectorized = [[str(zone).zfill(2), band] for zone, band in zip(zones.tolist(), bands.tolist())]
+    assert vectorized == per_point, "per-point and vectorized results differ"
+
+    speedup = per_point_time/vectorized_time
+    print(f"points:      {n}")
+    print(f"per-point:   {per_point_time:.3f} s ({n/per_point_time:,.0f} points/s)")
+    print(f"vectorized:  {vectorized_time:.3f} s ({n/vectorized_time:,.0f} points/s)")
+    if min_speedup is None:
+        print(f"speedup:     {speedup:.0f}x")
+        return True
+    print(f"speedup:     {speedup:.0f}x (required: {min_speedup:g}x)")
+    return speedup >= min_speedup
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Times latlong_to_utmzone against latlong_to_utmzone_array.")
+    parser.add_argument('n', nargs='?', type=int, default=1_000_000, help="number of points (default 1,000,000)")
+    parser.add_argument('--min-speedup', type=float, help="exit with an error if the speedup is lower than this")
+    args = parser.parse_args()
+    sys.exit(0 if main(args.n, args.min_speedup) else 1)
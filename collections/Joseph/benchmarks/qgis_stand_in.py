@@ -0,0 +1,196 @@
+"""
+Lightweight stand-in for qgis.core, used by the benchmarks when QGIS is not
+installed (see install()).
+
+Only the parts used by the benchmarked helpers are provided:
+
+-  QgsCoordinateReferenceSystem for EPSG:4326 and the WGS84 UTM zones
+   (EPSG:32601-32660 and 32701-32760); other codes give an invalid crs
+-  QgsCoordinateTransform between those, using the Krüger series for the
+   transverse Mercator projection (accurate to about a millimetre within a
+   UTM zone)
+-  QgsLineString, QgsPointXY, QgsEllipsoidUtils, QgsDistanceArea and
+   QgsCoordinateTransformContext with just enough of their API for
+   batch_transform.py, geometry_context.py, grid_convergence.py and
+   hard_ties.py
+"""
+from collections import namedtuple
+import sys
+import types
+
+import numpy as np
+
+WGS84_A = 6378137.0
+WGS84_F = 1/298.257223563
+UTM_SCALE = 0.9996
+UTM_FALSE_EASTING = 500000.0
+UTM_FALSE_NORTHING_SOUTH = 10000000.0
+
+# Krüger series coefficients (3rd order in the third flattening n)
+_N = WGS84_F/(2 - WGS84_F)
+_A = WGS84_A/(1 + _N)*(1 + _N**2/4 + _N**4/64)
+_ALPHA = (_N/2 - 2*_N**2/3 + 5*_N**3/16, 13*_N**2/48 - 3*_N**3/5, 61*_N**3/240)
+_BETA = (_N/2 - 2*_N**2/3 + 37*_N**3/96, _N**2/48 + _N**3/15, 17*_N**3/480)
+_DELTA = (2*_N - 2*_N**2/3 - 2*_N**3, 7*_N**2/3 - 8*_N**3/5, 56*_N**3/15)
+
+def _utm_zone(epsg):
+    """Returns the zone number and whether the zone is south of the equator, or None"""
+    if 32601 <= epsg <= 32660:
+        return epsg - 32600, False
+    if 32701 <= epsg <= 32760:
+        return epsg - 32700, True
+    return None
+
+def geographic_to_utm(lons, lats, zone, south=False):
+    """Returns the UTM eastings and northings of WGS84 longitudes and latitudes (degrees)"""
+    lon0 = np.radians(6*zone - 183)
+    phi = np.radians(np.asarray(lats, dtype=float))
+    dlon = np.radians(np.asarray(lons, dtype=float)) - lon0
+    c = 2*np.sqrt(_N)/(1 + _N)
+    t = np.sinh(np.arctanh(np.sin(phi)) - c*np.arctanh(c*np.sin(phi)))
+    xi = np.arctan2(t, np.cos(dlon))
+    eta = np.arctanh(np.sin(dlon)/np.sqrt(1 + t**2))
+    easting = eta
+    northing = xi
+    for j, alpha in enumerate(_ALPHA, 1):
+        easting = easting + alpha*np.cos(2*j*xi)*np.sinh(2*j*eta)
+        northing = northing + alpha*np.sin(2*j*xi)*np.cosh(2*j*eta)
+    easting = UTM_FALSE_EASTING + UTM_SCALE*_A*easting
+    northing = UTM_SCALE*_A*northing + (UTM_FALSE_NORTHING_SOUTH if south else 0.0)
+    return easting, northing
+
+def utm_to_geographic(eastings, northings, zone, south=False):
+    """Returns the WGS84 longitudes and latitudes (degrees) of UTM eastings and northings"""
+    northings = np.asarray(northings, dtype=float) - (UTM_FALSE_NORTHING_SOUTH if south else 0.0)
+    xi = northings/(UTM_SCALE*_A)
+    eta = (np.asarray(eastings, dtype=float) - UTM_FALSE_EASTING)/(UTM_SCALE*_A)
+    xi_prime = xi
+    eta_prime = eta
+    for j, beta in enumerate(_BETA, 1):
+        xi_prime = xi_prime - beta*np.sin(2*j*xi)*np.cosh(2*j*eta)
+        eta_prime = eta_prime - beta*np.cos(2*j*xi)*np.sinh(2*j*eta)
+    chi = np.arcsin(np.sin(xi_prime)/np.cosh(eta_prime))
+    phi = chi
+    for j, delta in enumerate(_DELTA, 1):
+        phi = phi + delta*np.sin(2*j*chi)
+    lon = np.radians(6*zone - 183) + np.arctan2(np.sinh(eta_prime), np.cos(xi_prime))
+    return np.degrees(lon), np.degrees(phi)
+
+class QgsCoordinateReferenceSystem:
+    """EPSG:4326 or a WGS84 UTM zone, identified by its EPSG code"""
+    def __init__(self, definition=4326):
+        if isinstance(definition, str):
+            definition = definition.upper().replace('EPSG:', '')
+        self.epsg = int(definition)
+        self._valid = self.epsg == 4326 or _utm_zone(self.epsg) is not None
+
+    def authid(self):
+        return f"EPSG:{self.epsg}" if self._valid else ''
+
+    def toWkt(self):
+        return self.authid()
+
+    def toProj(self):
+        if not self._valid:
+            return ''
+        if self.isGeographic():
+            return '+proj=longlat +datum=WGS84 +no_defs'
+        zone, south = _utm_zone(self.epsg)
+        return f"+proj=utm +zone={zone}{' +south' if south else ''} +datum=WGS84 +units=m +no_defs"
+
+    def isValid(self):
+        return self._valid
+
+    def isGeographic(self):
+        return self.epsg == 4326
+
+    def toGeographicCrs(self):
+        return QgsCoordinateReferenceSystem(4326)
+
+    def ellipsoidAcronym(self):
+        return 'EPSG:7030'
+
+    def __eq__(self, other):
+        return isinstance(other, QgsCoordinateReferenceSystem) and other.epsg == self.epsg
+
+    def __hash__(self):
+        return hash(self.epsg)
+
+class QgsCoordinateTransformContext:
+    def __eq__(self, other):
+        return isinstance(other, QgsCoordinateTransformContext)
+
+class QgsCoordinateTransform:
+    """Transforms between EPSG:4326 and the WGS84 UTM zones"""
+    def __init__(self, source_crs, dest_crs, transform_context=None):
+        self.source_crs = source_crs
+        self.dest_crs = dest_crs
+
+    def transform_arrays(self, xs, ys):
+        """Returns the transformed coordinates of arrays of x and y values"""
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        if self.source_crs != self.dest_crs and not self.source_crs.isGeographic():
+            xs, ys = utm_to_geographic(xs, ys, *_utm_zone(self.source_crs.epsg))
+        if self.source_crs != self.dest_crs and not self.dest_crs.isGeographic():
+            xs, ys = geographic_to_utm(xs, ys, *_utm_zone(self.dest_crs.epsg))
+        return xs, ys
+
+class QgsPointXY:
+    __slots__ = ('_x', '_y')
+
+    def __init__(self, x=0.0, y=0.0):
+        self._x = x
+        self._y = y
+
+    def x(self):
+        return self._x
+
+    def y(self):
+        return self._y
+
+class QgsLineString:
+    """A line string that can only be built from x and y sequences and transformed"""
+    def __init__(self, xs=(), ys=()):
+        self._xs = np.asarray(xs, dtype=float)
+        self._ys = np.asarray(ys, dtype=float)
+
+    def transform(self, transform):
+        self._xs, self._ys = transform.transform_arrays(self._xs, self._ys)
+
+    def xVector(self):
+        return self._xs.tolist()
+
+    def yVector(self):
+        return self._ys.tolist()
+
+EllipsoidParameters = namedtuple('EllipsoidParameters', ['valid', 'semiMajor', 'semiMinor'])
+
+class QgsEllipsoidUtils:
+    @staticmethod
+    def ellipsoidParameters(acronym):
+        """Returns the parameters of WGS84 for any ellipsoid"""
+        return EllipsoidParameters(True, WGS84_A, WGS84_A*(1 - WGS84_F))
+
+class QgsDistanceArea:
+    def setSourceCrs(self, crs, transform_context):
+        self.crs = crs
+
+    def setEllipsoid(self, ellipsoid):
+        self.ellipsoid = ellipsoid
+
+def install():
+    """
+    Makes this module importable as qgis.core if QGIS is not installed.
+    Returns the QGIS version, or 'stand-in' if the stand-in was installed.
+    """
+    try:
+        from qgis.core import Qgis
+        return Qgis.QGIS_VERSION
+    except ImportError:
+        pass
+    qgis = types.ModuleType('qgis')
+    qgis.core = sys.modules[__name__]
+    sys.modules['qgis'] = qgis
+    sys.modules['qgis.core'] = qgis.core
+    return 'stand-in'
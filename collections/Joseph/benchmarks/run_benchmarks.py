@@ -0,0 +1,241 @@
+"""
+Benchmark suite for the helpers in the processing folder, run on synthetic
+data (synthetic_data.py).
+
+Usage:
+    python run_benchmarks.py [--sizes 1000,10000,100000] [--repeat 3]
+                             [--only name,...] [--output results.json]
+                             [--baseline previous.json] [--tolerance 0.25]
+
+Each benchmark is run at every size (the number of rows, points, ties or grid
+vertices it processes). The best time of `repeat` runs gives the throughput,
+and one more run under tracemalloc gives the peak memory allocated while it
+runs. With --output, the results are written as JSON, together with the
+python, numpy and QGIS versions. If QGIS is not installed, the qgis.core stand-in
+(qgis_stand_in.py) is used.
+
+With --baseline, the throughput of each benchmark is compared with an earlier
+results file, and the script exits with an error if any of them is more than
+`tolerance` (a fraction) slower.
+"""
+from collections import namedtuple
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from qgis_stand_in import install
+QGIS_VERSION = install()
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'processing'))
+from qgis.core import QgsCoordinateReferenceSystem, QgsPointXY
+from geometry_context import GeometryContext
+from grid_cell_codec import cell_key
+from grid_cell_locations import merge_locations, sort_and_shorten_locations, sort_locations
+from grid_subdivision import small_grid_point, subdivision_vertices
+from hard_ties import hard_tie_description, hard_tie_inverse
+from utm_zones import latlong_to_utmzone, latlong_to_utmzone_array
+
+import synthetic_data
+
+SIDES = 4   #subdivision of the parent grid cells, as in create-small-grid.py
+
+# setup(size, rng, tmpdir) returns the data that run(data) processes; only
+# run is timed
+Benchmark = namedtuple('Benchmark', ['name', 'unit', 'setup', 'run'])
+
+def setup_locations(size, rng, tmpdir):
+    return synthetic_data.location_strings(size, rng)
+
+def run_sort_locations(locations):
+    cell_key.cache_clear()      #start with cold sort keys, like a new run of the script
+    for location in locations:
+        sort_locations(location, ', ', '; ')
+
+def run_sort_and_shorten_locations(locations):
+    cell_key.cache_clear()
+    for location in locations:
+        sort_and_shorten_locations(location, ', ', '; ')
+
+def setup_intersections(size, rng, tmpdir):
+    """Writes an intersection csv with about `size` rows (20% duplicates)"""
+    path = os.path.join(tmpdir, f"intersections_{size}.csv")
+    features = max(size//14, 1)
+    synthetic_data.write_intersections_csv(path, synthetic_data.intersection_rows(features, rng, duplication=0.2))
+    return path
+
+def run_clean_merge(path):
+    """Reads, merges and writes an intersection csv like clean-grid-cell-location-list.py"""
+    with open(path, newline='', encoding='utf-8-sig') as infile, open(os.devnull, 'w', newline='') as outfile:
+        csvreader = csv.reader(infile)
+        csvwriter = csv.writer(outfile)
+        csvwriter.writerow(next(csvreader, None))
+        csvwriter.writerows(merge_locations(csvreader, 1, 2))
+
+def setup_grid(size, rng, tmpdir):
+    """Parent cells (rotated by 10 degrees) with `size` small grid vertices in total"""
+    parents = max(size//(SIDES+1)**2, 1)
+    names, quads = synthetic_data.excavation_grid(parents, rng, rotation=10.0, jitter=0.05)
+    return quads
+
+def run_small_grid_point(quads):
+    for extents in quads.tolist():
+        for i in range(SIDES+1):
+            for k in range(SIDES+1):
+                small_grid_point(extents, SIDES, i, k)
+
+def run_subdivision_vertices(quads):
+    subdivision_vertices(quads, SIDES)
+
+def setup_points(size, rng, tmpdir):
+    return synthetic_data.survey_points(size, rng)
+
+def run_latlong_to_utmzone(points):
+    for lon, lat in zip(points['lon'].tolist(), points['lat'].tolist()):
+        latlong_to_utmzone(QgsPointXY(lon, lat))
+
+def run_latlong_to_utmzone_array(points):
+    latlong_to_utmzone_array(points['lon'], points['lat'])
+
+def setup_hard_ties(size, rng, tmpdir):
+    """Survey points tied to the first point of their site, grouped by UTM zone"""
+    points = synthetic_data.survey_points(size, rng)
+    ties = []
+    for zone, south in sorted(set(zip(points['zone'].tolist(), points['south'].tolist()))):
+        in_zone = (points['zone'] == zone) & (points['south'] == south)
+        sites = points['site'][in_zone]
+        x = points['x'][in_zone]
+        y = points['y'][in_zone]
+        _, first = np.unique(sites, return_index=True)
+        ref = first[np.searchsorted(np.unique(sites), sites)]
+        names = [f"Datum {site}" for site in sites.tolist()]
+        crs = QgsCoordinateReferenceSystem(f"EPSG:{(32700 if south else 32600) + zone}")
+        ties.append((x[ref], y[ref], x, y, crs, names))
+    return ties
+
+def run_hard_ties(ties):
+    """Solves the hard-ties of each zone at once and writes their descriptions"""
+    geometry_context = GeometryContext()
+    for ref_x, ref_y, feat_x, feat_y, crs, names in ties:
+        distances, bearings = hard_tie_inverse(ref_x, ref_y, feat_x, feat_y, crs, geometry_context)
+        for distance, bearing, name in zip(distances, bearings, names):
+            hard_tie_description(distance, bearing, name)
+
+BENCHMARKS = [
+    Benchmark('sort_locations', 'rows', setup_locations, run_sort_locations),
+    Benchmark('sort_and_shorten_locations', 'rows', setup_locations, run_sort_and_shorten_locations),
+    Benchmark('clean_merge', 'rows', setup_intersections, run_clean_merge),
+    Benchmark('small_grid_point', 'vertices', setup_grid, run_small_grid_point),
+    Benchmark('subdivision_vertices', 'vertices', setup_grid, run_subdivision_vertices),
+    Benchmark('latlong_to_utmzone', 'points', setup_points, run_latlong_to_utmzone),
+    Benchmark('latlong_to_utmzone_array', 'points', setup_points, run_latlong_to_utmzone_array),
+    Benchmark('hard_ties', 'ties', setup_hard_ties, run_hard_ties),
+]
+
+def measure(benchmark, size, repeat, seed, tmpdir):
+    """Returns the results of one benchmark at one size as a dictionary"""
+    data = benchmark.setup(size, np.random.default_rng(seed), tmpdir)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        benchmark.run(data)
+        times.append(time.perf_counter() - start)
+    seconds = min(times)
+
+    tracemalloc.start()
+    benchmark.run(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'name': benchmark.name,
+        'size': size,
+        'unit': benchmark.unit,
+        'seconds': seconds,
+        'throughput': size/seconds if seconds > 0 else float('inf'),
+        'peak_memory_bytes': peak,
+    }
+
+def compare(results, baseline, tolerance):
+    """
+    Prints the change in throughput of each benchmark since `baseline` and
+    returns the results that are more than `tolerance` slower
+    """
+    previous = {(r['name'], r['size']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get((result['name'], result['size']))
+        if old is None:
+            continue
+        ratio = result['throughput']/old['throughput']
+        flag = ''
+        if ratio < 1 - tolerance:
+            regressions.append(result)
+            flag = '  REGRESSION'
+        print(f"{result['name']:<28} {result['size']:>9}  {ratio:6.2f}x{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Times the processing helpers on synthetic data.")
+    parser.add_argument('--sizes', default='1000,10000,100000', help="comma-separated input sizes (default 1000,10000,100000)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per benchmark, the best is kept (default 3)")
+    parser.add_argument('--only', help="comma-separated names of the benchmarks to run (default all)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the synthetic data (default 0)")
+    parser.add_argument('--output', help="JSON file to write the results to (default: only print them)")
+    parser.add_argument('--baseline', help="earlier JSON results to compare the throughput with")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="slowdown (fraction of the baseline throughput) reported as a regression (default 0.25)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    benchmarks = BENCHMARKS
+    if args.only:
+        names = args.only.split(',')
+        unknown = set(names) - {b.name for b in BENCHMARKS}
+        if unknown:
+            parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+        benchmarks = [b for b in BENCHMARKS if b.name in names]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for benchmark in benchmarks:
+            for size in sizes:
+                result = measure(benchmark, size, args.repeat, args.seed, tmpdir)
+                results.append(result)
+                print(f"{result['name']:<28} {size:>9}  {result['seconds']:9.4f} s  "
+                      f"{result['throughput']:>14,.0f} {result['unit']}/s  {result['peak_memory_bytes']/2**20:8.1f} MiB")
+
+    report = {
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'qgis': QGIS_VERSION,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(report, outfile, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as infile:
+            regressions = compare(results, json.load(infile), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} benchmarks are more than {args.tolerance:.0%} slower than the baseline")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Synthetic data for the benchmarks (run_benchmarks.py) and for trying out the
+processing scripts without real excavation data.
+
+-  excavation_grid: parent grid cells (GridID '<row>.<col>', e.g. 'C.XIV'),
+   optionally rotated, with their corners in random order
+-  location_strings: lists of grid cell ids ('<row>.<col>.<num>') as written by
+   clean-grid-cell-location-list.py
+-  intersection_rows / write_intersections_csv: an intersection export of
+   features and grid cells, with a controllable share of duplicate rows
+-  survey_points: points of several survey sites spread over UTM zones, in
+   geographic and UTM coordinates
+
+All functions take a numpy random Generator, so the data is reproducible.
+
+Usage (writes an intersection csv for grid-cell-location-pipeline.py):
+    python synthetic_data.py output.csv [--features N] [--cells N] [--duplication F]
+"""
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'processing'))
+from grid_cell_codec import int_to_roman
+
+INTERSECTION_HEADER = ['id', 'FeatureID', 'GridID']
+
+def int_to_letters(rank):
+    """Returns the row name of a rank (1 -> A, 26 -> Z, 27 -> AA, ...)"""
+    letters = ''
+    while rank > 0:
+        rank, remainder = divmod(rank - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+def grid_shape(n_cells):
+    """Returns the number of rows and columns of a roughly square grid of at least n_cells cells"""
+    rows = max(int(np.ceil(np.sqrt(n_cells))), 1)
+    return rows, max(int(np.ceil(n_cells/rows)), 1)
+
+def excavation_grid(n_cells, rng, cell_size=5.0, rotation=0.0, jitter=0.0, origin=(500000.0, 5000000.0)):
+    """
+    Returns the GridIDs and the corners (shaped (n_cells, 4, 2)) of the first
+    n_cells cells of a grid of cell_size by cell_size cells, row by row. The
+    grid is rotated by `rotation` degrees around its origin, each corner is
+    moved by up to `jitter` map units, and the corners of each cell are
+    shuffled (as they can come out of a digitized layer).
+    """
+    rows, cols = grid_shape(n_cells)
+    row_index, col_index = np.divmod(np.arange(n_cells), cols)
+    names = [f"{int_to_letters(r+1)}.{int_to_roman(c+1)}" for r, c in zip(row_index.tolist(), col_index.tolist())]
+
+    unit = np.array([[0, 0], [0, 1], [1, 1], [1, 0]], dtype=float)
+    corners = (np.stack([col_index, row_index], axis=1)[:, None, :] + unit)*cell_size
+    corners = corners + rng.uniform(-jitter, jitter, corners.shape)
+    angle = np.radians(rotation)
+    rotation_matrix = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    corners = corners @ rotation_matrix.T + np.asarray(origin)
+
+    order = np.argsort(rng.random((n_cells, 4)), axis=1)
+    return names, np.take_along_axis(corners, order[:, :, None], axis=1)
+
+def random_cell_ids(n, rng, rows=26, cols=40, sides=4):
+    """Returns n random grid cell ids '<row>.<col>.<num>' of a rows by cols grid of sides by sides cells"""
+    row_names = np.array([int_to_letters(r) for r in range(1, rows+1)])
+    col_names = np.array([int_to_roman(c) for c in range(1, cols+1)])
+    r = row_names[rng.integers(0, rows, n)]
+    c = col_names[rng.integers(0, cols, n)]
+    num = rng.integers(1, sides*sides+1, n).astype(str)
+    return [f"{a}.{b}.{d}" for a, b, d in zip(r.tolist(), c.tolist(), num.tolist())]
+
+def location_strings(n, rng, cells_per_feature=12, delim=', ', **grid):
+    """
+    Returns n lists of grid cell ids joined by `delim`. The cells of each list
+    are clustered around one parent cell, like the cells a feature crosses.
+    """
+    counts = rng.poisson(cells_per_feature - 1, n) + 1
+    cells = random_cell_ids(int(counts.sum()), rng, **grid)
+    clustered = (rng.random(len(cells)) < 0.7).tolist()
+
+    # Cluster the cells of each list: most of them keep the row and column of
+    # its first cell
+    locations = []
+    start = 0
+    for count in counts.tolist():
+        first = cells[start].rsplit('.', 1)[0]
+        ids = [first + '.' + cell.rsplit('.', 1)[1] if keep else cell
+               for cell, keep in zip(cells[start:start+count], clustered[start:start+count])]
+        locations.append(delim.join(ids))
+        start += count
+    return locations
+
+def intersection_rows(n_features, rng, cells_per_feature=12, duplication=0.0, shuffle=True, **grid):
+    """
+    Returns the rows of an intersection export [id, FeatureID, GridID]: one row
+    per feature and grid cell it crosses. A share `duplication` (0 to 1) of
+    extra rows repeats an existing feature and cell. The rows are in random
+    order if `shuffle` is True and sorted by FeatureID otherwise.
+    """
+    rows = []
+    for fid, locations in enumerate(location_strings(n_features, rng, cells_per_feature, **grid), 1):
+        rows.extend([str(fid), cell] for cell in locations.split(', '))
+    if duplication > 0:
+        extra = rng.integers(0, len(rows), int(round(len(rows)*duplication)))
+        rows.extend(list(rows[i]) for i in extra.tolist())
+    if shuffle:
+        rows = [rows[i] for i in rng.permutation(len(rows)).tolist()]
+    else:
+        rows.sort(key=lambda row: int(row[0]))
+    return [[str(i), fid, cell] for i, (fid, cell) in enumerate(rows, 1)]
+
+def write_intersections_csv(path, rows):
+    """Writes intersection rows (see intersection_rows) to a csv file with a header"""
+    with open(path, 'w', newline='', encoding='utf-8-sig') as outfile:
+        csvwriter = csv.writer(outfile)
+        csvwriter.writerow(INTERSECTION_HEADER)
+        csvwriter.writerows(rows)
+
+def survey_points(n, rng, zones=(10, 11, 12, 33, 55), south=(False, False, False, False, True), sites_per_zone=4,
+                  site_radius=2000.0):
+    """
+    Returns a dictionary of arrays describing n survey points spread over
+    sites in the given UTM zones: 'zone', 'south', 'site', 'x' and 'y' (UTM
+    coordinates), and 'lon' and 'lat' (degrees). The geographic coordinates
+    are a spherical approximation, good enough for zone lookups.
+    """
+    zones = np.asarray(zones)
+    south = np.asarray(south, dtype=bool)
+    n_sites = len(zones)*sites_per_zone
+    site_zone = np.repeat(np.arange(len(zones)), sites_per_zone)
+    site_x = rng.uniform(300000, 700000, n_sites)
+    site_lat = rng.uniform(5, 60, n_sites)*np.where(south[site_zone], -1, 1)
+
+    site = rng.integers(0, n_sites, n)
+    angle = rng.uniform(0, 2*np.pi, n)
+    radius = site_radius*np.sqrt(rng.random(n))
+    x = site_x[site] + radius*np.cos(angle)
+    lat = site_lat[site] + radius*np.sin(angle)/110946
+    zone = zones[site_zone[site]]
+    lon = 6*zone - 183 + (x - 500000)/(111320*np.cos(np.radians(lat)))
+    y = lat*110946 + np.where(south[site_zone[site]], 10000000, 0)
+    return {'zone': zone, 'south': south[site_zone[site]], 'site': site, 'x': x, 'y': y, 'lon': lon, 'lat': lat}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Writes a synthetic intersection csv (id, FeatureID, GridID).")
+    parser.add_argument('output', help="path of the csv file to write")
+    parser.add_argument('--features', type=int, default=10000, help="number of features (default 10000)")
+    parser.add_argument('--cells', type=float, default=12, help="mean number of grid cells per feature (default 12)")
+    parser.add_argument('--duplication', type=float, default=0.1, help="share of duplicate rows (default 0.1)")
+    parser.add_argument('--sorted', action='store_true', help="sort the rows by FeatureID")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default 0)")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    rows = intersection_rows(args.features, rng, args.cells, args.duplication, shuffle=not args.sorted)
+    write_intersections_csv(args.output, rows)
+    print(f"Wrote {len(rows)} rows for {args.features} features to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Helpers for moving the coordinates of many point features through a single
+QgsCoordinateTransform call instead of transforming one geometry at a time.
+
+The coordinates are packed into one QgsLineString, which QGIS transforms in a
+single pass through PROJ, and then unpacked again as plain lists of x and y
+values.
+"""
+from qgis.core import QgsLineString
+
+def point_coordinates(features):
+    """
+    Returns the feature ids and the x and y coordinates of an iterable of point
+    features as three lists. Features without a geometry are skipped.
+    """
+    fids = []
+    xs = []
+    ys = []
+    for f in features:
+        geom = f.geometry()
+        if geom.isNull() or geom.isEmpty():
+            continue
+        point = geom.asPoint()
+        fids.append(f.id())
+        xs.append(point.x())
+        ys.append(point.y())
+    return fids, xs, ys
+
+def transform_xy(xs, ys, transform):
+    """
+    Transforms sequences of x and y coordinates with `transform` in one pass and
+    returns the transformed coordinates as two lists
+    """
+    if len(xs) == 0:
+        return [], []
+    line = QgsLineString([float(x) for x in xs], [float(y) for y in ys])
+    line.transform(transform)
+    return line.xVector(), line.yVector()
@@ -1,9 +1,11 @@
 # This script calculates expected hard-ties relative to True North for
-# a set of specified features and a single specified reference point
+# a set of specified features and a single specified reference point, or the
+# nearest reference points to each feature
 
 # Usage:
 #   1. In the layer that contains your reference points, select the feature you
-#      want to use as the reference point for your hard-ties
+#      want to use as the reference point for your hard-ties (only needed if
+#      tie_mode is 'selected')
 #   2. In the code below, edit the following variables according to your needs:
 #       - feat_layer_name   --> name of the layer with the features you want to
 #                               calculate hard-ties to
@@ -13,56 +15,61 @@
 #                               want to calculate hard-ties to
 #       - ref_id_field      --> name of the field with unique ids in your
 #                               reference points layer
+#       - tie_mode          --> 'selected' to tie every feature to the selected
+#                               reference point, 'nearest' to tie each feature
+#                               to its k nearest reference points, or 'within'
+#                               to tie each feature to every reference point
+#                               within max_tie_distance
+#       - k                 --> number of reference points per feature
+#                               ('nearest' mode)
+#       - max_tie_distance  --> maximum hard-tie length in project crs units
+#                               ('within' mode; in 'nearest' mode, 0 means no
+#                               limit)
+#
+# The helper modules hard_ties.py, geodesic.py, grid_convergence.py,
+# batch_transform.py, geometry_context.py, layer_reprojection.py and
+# feature_sink.py must be in the same folder as this script.
 
 from qgis.core import *
 from qgis.gui import *
-import math as m
-
-def true_north_bearing(pointfeature, source_crs, proj_inst):
+import numpy as np
+import os
+import sys
+
+# Make the helper modules next to this script importable
+try:
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+except NameError:   #__file__ is not defined when the script is run from the python console
+    scripts_dir = os.path.join(QgsApplication.qgisSettingsDirPath(), 'processing', 'scripts')
+if scripts_dir not in sys.path:
+    sys.path.append(scripts_dir)
+
+from feature_sink import BufferedFeatureSink, FileFeatureSink
+from geometry_context import GeometryContext
+from grid_convergence import true_north_bearings
+from hard_ties import hard_tie_description, hard_tie_inverse, nearest_reference_pairs
+from layer_reprojection import layer_request
+
+def true_north_bearing(pointfeature, source_crs, proj_inst, geometry_context=None):
     """
-    Calculates the bearing (counter-clockwise) of True North relative to Grid 
+    Calculates the bearing (clockwise, 0 to 360) of True North relative to Grid 
     North at a specified point within a specified crs.
-    """
-    # Get feature geometry
-    geom = pointfeature.geometry()
-    
-    # Define CRS transformation
-    dest_crs = QgsCoordinateReferenceSystem(4326)
-    tr = QgsCoordinateTransform(source_crs, dest_crs, proj_inst)
-    
-    # Clone geometry and transform it
-    geom2 = QgsGeometry(geom)
-    geom2.transform(tr)
     
-    # Shift the cloned geometry north along its meridian
-    geom2.translate(0,0.001)
-    
-    # Transform Geometry back to source CRS
-    tr = QgsCoordinateTransform(dest_crs, source_crs, proj_inst)
-    geom2.transform(tr)
-    
-    # Calculate angle between the two points
-    p1 = geom.asPoint()
-    p2 = geom2.asPoint()
-    
-    x1 = p1.x()
-    y1 = p1.y()
-    x2 = p2.x()
-    y2 = p2.y()
-    
-    angle = QgsGeometryUtils.lineAngle(x1, y1, x2, y2)*(180/(m.pi))
-    
-    return angle
+    To calculate bearings for many points, use true_north_bearings (from
+    grid_convergence.py) on arrays of coordinates instead.
+    """
+    p = pointfeature.geometry().asPoint()
+    return float(true_north_bearings([p.x()], [p.y()], source_crs, proj_inst, geometry_context)[0])
     
-def measure_distance(feat1, feat2, proj_inst):
+def measure_distance(feat1, feat2, proj_inst, geometry_context=None):
     """
     Returns ellipsoidal distance between 2 point features in the project CRS.
+    The distance measurement is reused from `geometry_context` if it is given.
     """
     # Configure the distance measurement
     proj_crs = proj_inst.crs()
-    distance = QgsDistanceArea()
-    distance.setSourceCrs(proj_crs, proj_inst.transformContext())
-    distance.setEllipsoid(proj_crs.ellipsoidAcronym())
+    geometry_context = geometry_context or GeometryContext(proj_inst)
+    distance = geometry_context.distance_area(proj_crs)
     
     # Measure distance
     geom1 = feat1.geometry()
@@ -73,44 +80,37 @@ def measure_distance(feat1, feat2, proj_inst):
     
     return m
     
-def calculate_hard_tie(ref_pt, ref_pt_name_field, feat_pt, proj_inst):
+def calculate_hard_tie(ref_pt, ref_pt_name_field, feat_pt, proj_inst, geometry_context=None):
     """
     Determines the distance and compass bearing (relative to True North) from
-    a reference point to a feature point using the project CRS.
+    a reference point to a feature point using the project CRS. Both come from
+    the geodesic between the two points (see hard_tie_inverse in hard_ties.py).
     
     Returns a string formatted as follows: '<distance> <unit> @ <bearing> deg
     from <ref_pt name>'
+    
+    To calculate many hard-ties at once, use the functions in hard_ties.py
+    instead.
     """
     # Determine project CRS
     proj_crs = proj_inst.crs()
+    geometry_context = geometry_context or GeometryContext(proj_inst)
     
-    # Calculate distance to nearest cm
-    distance = round(measure_distance(ref_pt, feat_pt, proj_inst), 2)
-    
-    # Calculate bearing to nearest 0.1 degrees
+    # Calculate distance and bearing
     p1 = ref_pt.geometry().asPoint()
     p2 = feat_pt.geometry().asPoint()
-    
-    x1 = p1.x()
-    y1 = p1.y()
-    x2 = p2.x()
-    y2 = p2.y()
-    
-    bearing_from_gn = QgsGeometryUtils.lineAngle(x1, y1, x2, y2)*(180/(m.pi))
-    tn_bearing = true_north_bearing(feat_pt, proj_crs, proj_inst)
-    bearing_from_tn = round(bearing_from_gn + (360 - tn_bearing), 1)
+    distances, bearings = hard_tie_inverse([p1.x()], [p1.y()], [p2.x()], [p2.y()], proj_crs, geometry_context)
     
     # Get Reference Point Name
     ref_pt_name = ref_pt[ref_pt_name_field]
     
-    # Compose description
-    description = f"{distance} m @ {bearing_from_tn} deg from {ref_pt_name}"
-    
-    return description
+    # Compose description (distance to nearest cm, bearing to nearest 0.1 degrees)
+    return hard_tie_description(distances[0], bearings[0], ref_pt_name)
 
-def create_hard_tie(from_pt, to_pt, desc,  from_txt, to_txt, layer, proj_inst):
+def create_hard_tie(from_pt, to_pt, desc,  from_txt, to_txt, sink):
     """
-    Create polyline feature representing a hard-tie
+    Create polyline feature representing a hard-tie and add it to `sink` (a
+    BufferedFeatureSink or FileFeatureSink from feature_sink.py)
     """
     # Re-format the input features as QgsPoint objects
     from_pt = from_pt.geometry().asPoint()
@@ -121,63 +121,29 @@ def create_hard_tie(from_pt, to_pt, desc,  from_txt, to_txt, layer, proj_inst):
     feature.setGeometry(QgsGeometry.fromPolylineXY([from_pt, to_pt])) 
     
     #Set the new feature's attributes
-    feature.setFields(layer.fields())
+    feature.setFields(sink.fields())
     feature.setAttribute("From", from_txt)
     feature.setAttribute("Desc", desc)
     feature.setAttribute("To", to_txt)
     
-    #Update the data file and add the updated data to the QGIS project
-    layer.dataProvider().addFeatures([feature])     #add output feature to layer's data provider
-    layer.updateExtents()                           #update layer extents based on the new info in the data provider
-    proj_inst.addMapLayers([layer])     #add updated layer to the qgis project instance
-
-def reproject_layer(layer, out_crs, proj_inst, add_to_iface=False):
-    """
-    Returns a copy of `layer` reprojected into `out_crs`
-    If `add_to_iface` is True, also loads the reprojected layer into the active
-    interface
-    """
-    # Input features
-    in_feats = layer.getFeatures()
-    
-    # Initialize transformation
-    t = QgsCoordinateTransform(layer.crs(), out_crs, proj_inst)
-    
-    # Initialize output layer
-    geomtype = QgsWkbTypes.displayString(layer.wkbType())
-    uri = geomtype+'?crs='+proj_inst.crs().authid()
-    name = layer.name()+'_reprojected'
-    layer_rpj = QgsVectorLayer(uri, name, 'memory')
-    out_feats = []
-    
-    # Copy fields over
-    layer_rpj.dataProvider().addAttributes(layer.fields())
-    layer_rpj.updateFields()
-
-    # Reproject
-    for f in in_feats:
-        geom = f.geometry()
-        geom.transform(t)
-        f.setGeometry(geom)
-        out_feats.append(f)
-    
-    layer_rpj.dataProvider().addFeatures(out_feats)
-    
-    if add_to_iface:
-        proj_inst.addMapLayer(layer_rpj, addToLegend=True)
-    
-    return layer_rpj
+    #Add the feature to the sink (features are written to the layer in chunks)
+    sink.add_feature(feature)
 
 # User inputs
 feat_layer_name = "New scratch layer"
 feat_id_field = "name"
 ref_layer_name = "ReferencePoints2"
 ref_id_field = "RPID"
+tie_mode = 'selected'   #'selected', 'nearest' or 'within'
+k = 1                   #reference points per feature ('nearest' mode)
+max_tie_distance = 0    #maximum hard-tie length ('within' mode; 0 = no limit in 'nearest' mode)
+output_path = None      #e.g. "C:\\foo\\bar\\HardTies.gpkg" to write the hard-ties straight to a file
 
 # Project variables
 proj_inst =  QgsProject.instance()
 proj_crs = proj_inst.crs()
 proj_crs_code = str(proj_crs)[-10:-1]
+geometry_context = GeometryContext(proj_inst)     #reuses transforms and distance measurements
 
 # Get feature layer
 feature_layer = proj_inst.mapLayersByName(feat_layer_name)[0]
@@ -185,33 +151,65 @@ feature_layer = proj_inst.mapLayersByName(feat_layer_name)[0]
 # Get reference point layer
 reference_layer = proj_inst.mapLayersByName(ref_layer_name)[0]
 
-# Make sure feature and reference point layers are in the project CRS
-# (reproject if necessary)
+# Read the feature and reference point layers in the project CRS (features
+# are transformed on the fly if necessary) with only the id fields
 if reference_layer.crs() != proj_crs:
-    print("Warning: reference point layer not in project crs. Reprojecting and continuing...")
-    select_id = reference_layer.selectedFeatures()[0][ref_id_field]
-    reference_layer = reproject_layer(reference_layer, proj_crs, proj_inst)
-    reference_layer.selectByExpression(f"\"{ref_id_field}\" = '{select_id}'")
-
+    print("Warning: reference point layer not in project crs. Transforming on the fly and continuing...")
 if feature_layer.crs() != proj_crs:
-    print("Warning: feature layer not in project crs. Reprojecting and continuing...")
-    feature_layer = reproject_layer(feature_layer, proj_crs, proj_inst)
+    print("Warning: feature layer not in project crs. Transforming on the fly and continuing...")
+ref_request = layer_request(reference_layer, [ref_id_field], proj_crs, proj_inst.transformContext())
+feat_request = layer_request(feature_layer, [feat_id_field], proj_crs, proj_inst.transformContext())
 
 # Get features
-print(f"Hard-ties will be determined for all features in '{feature_layer_name}'")
-features = feature_layer.getFeatures()
+print(f"Hard-ties will be determined for all features in '{feat_layer_name}'")
+features = list(feature_layer.getFeatures(feat_request))
 
 # Get reference points
-ref_pt = reference_layer.selectedFeatures()[0]
-ref_pt_name = ref_pt[ref_id_field]
+if tie_mode == 'selected':
+    ref_pts = list(reference_layer.getSelectedFeatures(ref_request))[:1]
+    layer_title = f"Hard-ties from {ref_pts[0][ref_id_field]}"
+elif tie_mode in ('nearest', 'within'):
+    ref_pts = list(reference_layer.getFeatures(ref_request))
+    layer_title = "Hard-ties"
+else:
+    raise ValueError(f"Unknown tie_mode '{tie_mode}' (use 'selected', 'nearest' or 'within')")
 
 # Create output layer
 url = f"Linestring?crs={proj_crs_code}&field=To:string(100)&field=From:string(100)&field=Desc:string(200)"
-output_layer = QgsVectorLayer(url, f"Hard-ties from {ref_pt_name}", "memory")
-
-# Calculate hard-ties
-for f in features:
-    desc = calculate_hard_tie(ref_pt, ref_id_field, f, proj_inst)
-    from_txt = ref_pt_name
-    to_txt = f[feat_id_field]
-    create_hard_tie(ref_pt, f, desc, from_txt, to_txt, output_layer, proj_inst)
\ No newline at end of file
+output_layer = QgsVectorLayer(url, layer_title, "memory")
+if output_path:
+    output_sink = FileFeatureSink(output_path, output_layer.fields(), output_layer.wkbType(), proj_crs,
+                                  proj_inst.transformContext(), output_layer.name(), project=proj_inst)
+else:
+    output_sink = BufferedFeatureSink(output_layer, project=proj_inst)
+
+# Pair each feature with its reference point(s)
+feat_points = [f.geometry().asPoint() for f in features]
+ref_points = [r.geometry().asPoint() for r in ref_pts]
+if tie_mode == 'selected':
+    feat_idx = np.arange(len(features))
+    ref_idx = np.zeros(len(features), dtype=int)
+elif tie_mode == 'nearest':
+    feat_idx, ref_idx = nearest_reference_pairs(feat_points, ref_points, k, max_tie_distance)
+else:
+    feat_idx, ref_idx = nearest_reference_pairs(feat_points, ref_points, None, max_tie_distance)
+print(f"Calculating {len(feat_idx)} hard-ties from {len(ref_points)} reference point(s)")
+
+# Calculate the distances and bearings of all hard-ties in one pass
+feat_x = np.array([p.x() for p in feat_points], dtype=float)
+feat_y = np.array([p.y() for p in feat_points], dtype=float)
+ref_x = np.array([p.x() for p in ref_points], dtype=float)
+ref_y = np.array([p.y() for p in ref_points], dtype=float)
+distances, bearings = hard_tie_inverse(ref_x[ref_idx], ref_y[ref_idx], feat_x[feat_idx], feat_y[feat_idx],
+                                       proj_crs, geometry_context)
+
+# Create hard-ties
+for i, j, distance, bearing in zip(feat_idx, ref_idx, distances, bearings):
+    ref_pt = ref_pts[j]
+    f = features[i]
+    desc = hard_tie_description(distance, bearing, ref_pt[ref_id_field])
+    create_hard_tie(ref_pt, f, desc, ref_pt[ref_id_field], f[feat_id_field], output_sink)
+
+# Write the remaining hard-ties and add the output layer to the project
+output_sink.close()
+print(geometry_context.cache_info())
@@ -9,6 +9,10 @@
 # -  You must adjust the following inputs before running:
 #    -  path_to_input_layer
 #    -  input_layer
+# -  To write the grid straight to a GeoPackage or Shapefile instead of a
+#    scratch layer (for very large grids), set output_path.
+# -  The helper modules feature_sink.py, grid_subdivision.py and
+#    oriented_rectangles.py must be in the same folder as this script.
 
 # Imports
 from qgis.core import (
@@ -23,6 +27,7 @@ from qgis.core import (
     QgsFields,
     QgsFeature,
     QgsFeatureRequest,
+    QgsFeedback,
     QgsFeatureRenderer,
     QgsGeometry,
     QgsGraduatedSymbolRenderer,
@@ -39,6 +44,20 @@ from qgis.core import (
     QgsSpatialIndex,
     QgsVectorLayerUtils,
 )
+import os
+import sys
+
+# Make the helper modules next to this script importable
+try:
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+except NameError:   #__file__ is not defined when the script is run from the python console
+    scripts_dir = os.path.join(QgsApplication.qgisSettingsDirPath(), 'processing', 'scripts')
+if scripts_dir not in sys.path:
+    sys.path.append(scripts_dir)
+
+from feature_sink import BufferedFeatureSink, FileFeatureSink
+from grid_subdivision import ring_quads, subdivide_parallel
+import numpy as np
 
 # Inputs
 path_to_input_layer = "C:\\foo\\bar\\...\\VectorData\\"
@@ -47,6 +66,13 @@ input_features = input_layer.getFeatures()
 
 sides = 4
 
+# Set `workers` above 1 (e.g. os.cpu_count()) to calculate the small grid in a
+# pool of worker processes. The workers are spawned, which re-launches python:
+# grid_subdivision.starting_workers sets the python executable and hides this
+# script from them while they start.
+workers = 1                 #number of worker processes used to calculate the small grid (1 to run without workers)
+parent_chunk_size = 500     #number of input features sent to a worker at a time
+
 # Outputs
 output_layer = QgsVectorLayer("Polygon?crs=epsg:22391", "OutputLayer", "memory")   #make a scratch layer so there is no risk of overwriting a file accidentally
 output_fields = input_layer.fields()
@@ -54,68 +80,24 @@ output_fields = input_layer.fields()
 output_layer.dataProvider().addAttributes(output_fields)    #add same fields to output layer's data provider as are in input layer
 output_layer.updateFields()                                 #after adding data to the provider, the layer must be updated manually
 
-# Functions
-def extent_point_in_position(extents: list, vert: str, horz: str):
-    """
-    Returns the point whose coordinates correspond to the given vertical and horizontal descriptions
-    
-    Extents must be a list of nested [x,y] lists
-    """
-    # Sort points into ascending order of y values
-    extents.sort(key=lambda point: point[1])     #on lambda keyword, see https://dbader.org/blog/python-min-max-and-nested-lists#fn:2
-    
-    if vert == "bottom":
-        bottom_points = [extents[0], extents[1]]         #the two points with the lowest y values
-        bottom_points.sort(key=lambda point: point[0])   #points are now in ascending order of x values
-        
-        if horz == "left":
-            return bottom_points[0]
-        elif horz == "right":
-            return bottom_points[1]
-        
-    elif vert == "top":
-        top_points = [extents[-2], extents[-1]]         #the two points with the highest y values
-        top_points.sort(key=lambda point: point[0])     #points are now in ascending order of x values
-        
-        if horz == "left":
-            return top_points[0]
-        elif horz == "right":
-            return top_points[1]
-        
-    else:
-        print("Error: input directions must be top, bottom, left, or right\nExiting...")
-        return
-
-
-def small_grid_point(extents: list, n, i, k):
-    """
-    Calculates the position of a point in the given row and column with the given extents
-    
-    Extents must be a list of nested [x,y] lists
-    """    
-    # Check for too many extents
-    if len(extents) != 4:
-        print("Error: extents must be a list of 4 points!\nExiting...")
-        return
-    
-    # separate extents list into the correct order
-    A = extent_point_in_position(extents, "bottom", "left")
-    B = extent_point_in_position(extents, "top", "left")
-    C = extent_point_in_position(extents, "top", "right")
-    D = extent_point_in_position(extents, "bottom", "right")
-    
-    # Calculate x and y coordinates
-    x = (((n-i)*(n-k)/n)*A[0] + ((i)*(n-k)/n)*B[0] + ((i)*(k)/n)*C[0] + ((n-i)*(k)/n)*D[0])/n
-    y = (((n-i)*(n-k)/n)*A[1] + ((i)*(n-k)/n)*B[1] + ((i)*(k)/n)*C[1] + ((n-i)*(k)/n)*D[1])/n
-    return [x, y]
+output_path = None          #e.g. path_to_input_layer + "SmallGrid.gpkg" to stream the grid to a file
+chunk_size = 10000          #number of grid cells written to the output at a time
 
-def create_small_rectangle(extents: list,  attribute1, value1, attribute2, value2, layer):
+if output_path:
+    output_sink = FileFeatureSink(output_path, output_layer.fields(), output_layer.wkbType(), output_layer.crs(),
+                                  QgsProject.instance().transformContext(), chunk_size=chunk_size)
+else:
+    output_sink = BufferedFeatureSink(output_layer, chunk_size=chunk_size)
+
+# Functions
+def create_small_rectangle(extents: list,  attribute1, value1, attribute2, value2, sink):
     """
-    Makes a small rectangle in the given layer with the given extents
+    Makes a small rectangle with the given extents and adds it to the given sink
     
     extents must be a list of nested [x,y] lists
     attribute is the name of the attribute that will be used to identify the output feature
     value is the value to assign to the output feature's identifying attribute
+    sink is a BufferedFeatureSink or FileFeatureSink (see feature_sink.py)
     """
     #Re-format extents into a list of GqsPoint objects
     extents = [QgsPointXY(x,y) for x,y in extents]
@@ -125,52 +107,53 @@ def create_small_rectangle(extents: list,  attribute1, value1, attribute2, value
     feature.setGeometry(QgsGeometry.fromPolygonXY([extents])) #ref: https://gis.stackexchange.com/questions/86812/how-to-draw-polygons-from-the-python-console/86901
 
     #Set the new feature's attributes
-    feature.setFields(layer.fields())             #enables fields to be referenced by name in the setAttributes method below
+    feature.setFields(sink.fields())             #enables fields to be referenced by name in the setAttributes method below
     feature[attribute1] = value1                    #can also use output_feature.setAttribute(attribute, value)
     feature[attribute2] = value2
     
-    #Update the data file and add the updated data to the QGIS project
-    layer.dataProvider().addFeatures([feature])     #add output feature to layer's data provider
-    layer.updateExtents()                           #update layer extents based on the new info in the data provider
-    QgsProject.instance().addMapLayers([layer])     #add updated layer to the qgis project instance
+    #Add the feature to the sink (features are written to the output in chunks)
+    sink.add_feature(feature)
     return
 
-# Make list of grid point indices (this will be used for each
-indices = [[i,k] for i in range(sides+1) for k in range(sides+1)] #indices that will be used to create the small grid points (this could be more elegant if I used numpy)
-
-# Make small grid in each big grid rectangle
+# Read the vertices of each big grid rectangle
+input_names = []
+input_xs = []
+input_ys = []
+input_counts = []
 for input_feature in input_features:
-    #Print the name of the current big grid square
-    print("Creating small grid in " + input_feature.attribute("GridID"))
-    
-    #Get info for the current big grid rectangle
     input_feature_name = input_feature.attribute("GridID")
     input_geom = input_feature.geometry().asMultiPolygon()
     input_feature_extents = [[point.x(),point.y()] for point in input_geom[0][0]]   #unwrap the QgsPoint objects (unclear why input_geom is several nested lists)
     input_feature_extents = input_feature_extents[:-1]                              #remove the last point, which is always a duplicate
-    
-    #Calculate the locations of the small grid vertices
-    small_grid_points = [small_grid_point(extents=input_feature_extents, n=sides, i=i, k=k) for i,k in indices]
-    
-    #Create small grid rectangles
-    for i in range(sides):      #iterate over rows
-        for k in range(sides):  #iterate over columns
-            #Determine ID of current rectangle
-            rect_num = i*(sides)+k+1
-            grid_id = input_feature_name + "." + str(rect_num)   #full id of the current rectangle
-            print("Creating small grid rectangle " + grid_id)
-            
-            #Get the points for the current rectangle (this could be more elegant)
-            p1 = small_grid_points[i*(sides+1)+k]
-            p2 = small_grid_points[(i+1)*(sides+1)+k]
-            p3 = small_grid_points[(i+1)*(sides+1)+(k+1)]
-            p4 = small_grid_points[(i)*(sides+1)+(k+1)]
-            output_feature_extents = [p1, p2, p3, p4]
-            
-            #Make the current rectangle
-            create_small_rectangle(extents=output_feature_extents, attribute1="GridID", value1=grid_id, attribute2="id", value2=rect_num, layer=output_layer)
-            
-            print("Finished with " + input_feature_name)
+
+    if len(input_feature_extents) < 4:
+        print("Skipping " + input_feature_name + ": extents must be a list of at least 4 points!")
+        continue
+    input_names.append(input_feature_name)
+    input_xs.extend(x for x, y in input_feature_extents)
+    input_ys.extend(y for x, y in input_feature_extents)
+    input_counts.append(len(input_feature_extents))
+
+# Find the A, B, C and D corners of all big grid rectangles at once (rectangles
+# may be rotated and may have extra vertices along their sides)
+input_counts = np.array(input_counts, dtype=int)
+input_quads = ring_quads(np.array(input_xs, dtype=float), np.array(input_ys, dtype=float),
+                         np.cumsum(input_counts) - input_counts, input_counts)
+
+# Report progress to the console
+feedback = QgsFeedback()
+feedback.progressChanged.connect(lambda progress: print(f"Small grid {progress:.0f}% complete"))
+
+# Make small grid in each big grid rectangle (the rectangles are split into
+# chunks of parent_chunk_size, which are subdivided in a pool of worker
+# processes and returned in input order)
+for grid_ids, rect_nums, rings in subdivide_parallel(input_names, input_quads, sides,
+                                                      workers=workers, chunk_size=parent_chunk_size, feedback=feedback):
+    for grid_id, rect_num, output_feature_extents in zip(grid_ids, rect_nums, rings.tolist()):
+        create_small_rectangle(extents=output_feature_extents, attribute1="GridID", value1=grid_id, attribute2="id", value2=rect_num, sink=output_sink)
+
+#Write the remaining grid cells and add the output layer to the project
+output_sink.close()
 
 print("Small grid completed!")
     
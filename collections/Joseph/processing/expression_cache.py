@@ -0,0 +1,200 @@
+"""
+Result cache for the expression functions in the Custom group
+(max_side_length.py, top_left_rotation.py).
+
+QGIS evaluates expression functions again on every redraw, label placement
+and layout export. ExpressionCache keeps their results keyed by (layer id,
+feature id, function name), so a lookup costs the same for any size of
+geometry. The results of a feature are dropped when the layer's
+geometryChanged, attributeValueChanged or featureDeleted signals fire for it,
+and all of a layer's results when the layer is deleted. Results are therefore
+only cached for the layers the cache watches (see watch and track_project),
+and they belong to the features as stored in the layer. At most `maxsize`
+results are kept; the least recently used one is dropped when the cache is
+full.
+
+`hits` and `misses` count the lookups (see cache_info). Map layers are drawn
+and labelled in worker threads, so the cache is guarded by a lock, and the
+functions only take the layer id from the expression context: a
+QgsVectorLayer may only be used on the main thread. `track_project` (called on
+the main thread when the functions are registered) connects the signals of the
+project's vector layers and keeps a QgsVectorLayerFeatureSource of each, which
+the worker threads iterate to calculate a whole layer at once.
+"""
+from collections import OrderedDict
+import threading
+
+_MISSING = object()
+
+def context_layer_id(context):
+    """Returns the id of the layer of an expression context (its 'layer_id' variable), or None"""
+    if context is None or not context.hasVariable('layer_id'):
+        return None
+    return context.variable('layer_id') or None
+
+class ExpressionCache:
+    """Least recently used cache of expression function results (see above)"""
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.bulk_loaded = set()    #(layer id, function name) of results that were calculated for whole layers
+        self._entries = OrderedDict()
+        self._feature_keys = {}     #(layer id, feature id) -> keys of the feature's results
+        self._watched = set()       #ids of the layers whose signals are connected
+        self._sources = {}          #layer id -> QgsVectorLayerFeatureSource, created on the main thread
+        self._projects = set()      #ids of the tracked projects
+        self._lock = threading.RLock()
+
+    def key(self, layer_id, feature, name):
+        """Returns the cache key of the result of function `name` for `feature`"""
+        return (layer_id, feature.id(), name)
+
+    def watching(self, layer_id):
+        """Returns True if the results of layer `layer_id` are cached (its signals are connected)"""
+        with self._lock:
+            return layer_id in self._watched
+
+    def peek(self, key):
+        """Returns the result stored under `key` (or None) without counting a lookup"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def get(self, key, default=None):
+        """Returns the result stored under `key`, or `default`"""
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Stores a result"""
+        with self._lock:
+            self._feature_keys.setdefault(key[:2], set()).add(key)
+
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                old_key, _ = self._entries.popitem(last=False)
+                old_keys = self._feature_keys.get(old_key[:2])
+                if old_keys is not None:
+                    old_keys.discard(old_key)
+                    if not old_keys:
+                        del self._feature_keys[old_key[:2]]
+
+    def track_project(self, project):
+        """
+        Watches the vector layers of `project` (e.g. QgsProject.instance()) and
+        the layers added to it later. Must be called on the main thread.
+        """
+        with self._lock:
+            if id(project) in self._projects:
+                return
+            self._projects.add(id(project))
+        project.layersAdded.connect(self._watch_layers)
+        self._watch_layers(project.mapLayers().values())
+
+    def _watch_layers(self, layers):
+        from qgis.core import QgsVectorLayer
+        for layer in layers:
+            if isinstance(layer, QgsVectorLayer):
+                self.watch(layer)
+
+    def watch(self, layer):
+        """
+        Connects the signals of `layer` that invalidate its results and keeps a
+        feature source of it, renewed when its data changes (once per layer).
+        Must be called on the main thread.
+        """
+        layer_id = layer.id()
+        with self._lock:
+            if layer_id in self._watched:
+                return
+            self._watched.add(layer_id)
+        layer.geometryChanged.connect(lambda fid, geometry: self.invalidate_feature(layer_id, fid))
+        layer.attributeValueChanged.connect(lambda fid, index, value: self.invalidate_feature(layer_id, fid))
+        layer.featureDeleted.connect(lambda fid: self.invalidate_feature(layer_id, fid))
+        layer.dataChanged.connect(lambda: self._update_source(layer))
+        layer.willBeDeleted.connect(lambda: self._forget_layer(layer_id))
+        self._update_source(layer)
+
+    def _update_source(self, layer):
+        from qgis.core import QgsVectorLayerFeatureSource
+        source = QgsVectorLayerFeatureSource(layer)
+        with self._lock:
+            self._sources[layer.id()] = source
+
+    def _forget_layer(self, layer_id):
+        with self._lock:
+            self.clear(layer_id)
+            self._watched.discard(layer_id)
+            self._sources.pop(layer_id, None)
+
+    def claim_bulk_load(self, layer_id, name):
+        """
+        Returns the feature source of a layer for calculating the results of
+        function `name` for all of its features, and marks them as loaded, so
+        that only one thread loads a layer. Returns None if they were already
+        claimed or the layer is not watched.
+        """
+        with self._lock:
+            source = self._sources.get(layer_id)
+            if source is None or (layer_id, name) in self.bulk_loaded:
+                return None
+            self.bulk_loaded.add((layer_id, name))
+            return source
+
+    def invalidate_feature(self, layer_id, fid):
+        """Drops all results of one feature"""
+        with self._lock:
+            for key in self._feature_keys.pop((layer_id, fid), ()):
+                self._entries.pop(key, None)
+
+    def clear(self, layer_id=None):
+        """Drops the results of one layer, or all results (and resets the counters)"""
+        with self._lock:
+            if layer_id is None:
+                self._entries.clear()
+                self._feature_keys.clear()
+                self.bulk_loaded.clear()
+                self.hits = 0
+                self.misses = 0
+                return
+            for feature_key in [k for k in self._feature_keys if k[0] == layer_id]:
+                self.invalidate_feature(*feature_key)
+            self.bulk_loaded = {loaded for loaded in self.bulk_loaded if loaded[0] != layer_id}
+
+    def feature_value(self, feature, context, name, compute):
+        """
+        Returns the result of function `name` for `feature`, calling
+        compute(feature) on a miss. Results are only cached for features of a
+        watched layer (the layer of the expression context).
+        """
+        layer_id = context_layer_id(context)
+        if layer_id is None or not self.watching(layer_id):
+            return compute(feature)
+
+        key = self.key(layer_id, feature, name)
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute(feature)
+            self.put(key, value)
+        return value
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits/lookups if lookups else 0.0
+
+    def cache_info(self):
+        """Returns a summary of the cache, like functools.lru_cache"""
+        return (f"ExpressionCache(hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate:.1%}, "
+                f"maxsize={self.maxsize}, currsize={len(self._entries)})")
+
+# The cache shared by the Custom expression functions
+EXPRESSION_CACHE = ExpressionCache()
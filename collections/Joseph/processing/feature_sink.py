@@ -0,0 +1,150 @@
+"""
+Buffered feature sinks used by the scripts that create output layers
+(calculate_hard_ties.py, create-small-grid.py).
+
+Instead of adding each new feature to the data provider, updating the layer
+extents and re-adding the layer to the project one feature at a time, the
+sinks collect features and write them in chunks:
+
+-  BufferedFeatureSink adds the features to an existing (e.g. memory) layer,
+   updates its extents once and adds it to the project once when closed.
+-  FileFeatureSink streams the features straight to a GeoPackage or Shapefile
+   with QgsVectorFileWriter, for outputs too large to hold in a memory layer.
+
+Both sinks can be used as context managers, which closes them on exit.
+"""
+from abc import ABC, abstractmethod
+import os
+
+# OGR drivers for the supported output file extensions
+DRIVERS = {
+    '.gpkg': 'GPKG',
+    '.shp': 'ESRI Shapefile',
+}
+
+class ChunkedFeatureSink(ABC):
+    """
+    Base class for the sinks: buffers features and passes them to
+    `write_chunk` every `chunk_size` features. Subclasses must implement
+    `write_chunk`.
+    """
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.count = 0          #number of features written so far
+        self._buffer = []
+
+    def add_feature(self, feature):
+        """Adds a feature to the buffer, writing the buffer when it is full"""
+        self._buffer.append(feature)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def add_features(self, features):
+        """Adds an iterable of features to the buffer"""
+        for feature in features:
+            self.add_feature(feature)
+
+    def flush(self):
+        """Writes all buffered features"""
+        if self._buffer:
+            self.write_chunk(self._buffer)
+            self.count += len(self._buffer)
+            self._buffer = []
+
+    @abstractmethod
+    def write_chunk(self, features):
+        """Writes a list of features to the output"""
+
+    def close(self):
+        """Writes the remaining features and finishes the output"""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+class BufferedFeatureSink(ChunkedFeatureSink):
+    """
+    Adds features to the data provider of `layer` in chunks. When the sink is
+    closed, the layer extents are updated and (if `add_to_project` is True) the
+    layer is added to `project` (the current project by default), once each.
+    """
+    def __init__(self, layer, chunk_size=1000, project=None, add_to_project=True):
+        super().__init__(chunk_size)
+        self.layer = layer
+        self.project = project
+        self.add_to_project = add_to_project
+
+    def fields(self):
+        return self.layer.fields()
+
+    def write_chunk(self, features):
+        ok, _ = self.layer.dataProvider().addFeatures(features)
+        if not ok:
+            raise RuntimeError(f"Could not add features to {self.layer.name()}: {self.layer.dataProvider().lastError()}")
+
+    def close(self):
+        """Writes the remaining features, updates the extents and adds the layer to the project"""
+        self.flush()
+        self.layer.updateExtents()
+        if self.add_to_project:
+            project = self.project
+            if project is None:
+                from qgis.core import QgsProject
+                project = QgsProject.instance()
+            if project.mapLayer(self.layer.id()) is None:
+                project.addMapLayer(self.layer)
+        return self.layer
+
+class FileFeatureSink(ChunkedFeatureSink):
+    """
+    Streams features to a GeoPackage (.gpkg) or Shapefile (.shp) at `path` in
+    chunks. When the sink is closed, the file is loaded as a layer named
+    `layer_name` and (if `add_to_project` is True) added to `project`.
+    """
+    def __init__(self, path, fields, wkb_type, crs, transform_context=None, layer_name=None,
+                 chunk_size=10000, project=None, add_to_project=True):
+        super().__init__(chunk_size)
+        self.path = path
+        self._fields = fields
+        self.layer_name = layer_name or os.path.splitext(os.path.basename(path))[0]
+        self.project = project
+        self.add_to_project = add_to_project
+
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in DRIVERS:
+            raise ValueError(f"Unsupported output format '{extension}', use one of {list(DRIVERS)}")
+
+        from qgis.core import QgsCoordinateTransformContext, QgsVectorFileWriter
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = DRIVERS[extension]
+        options.fileEncoding = 'UTF-8'
+        options.layerName = self.layer_name
+        self.writer = QgsVectorFileWriter.create(path, fields, wkb_type, crs,
+                                                 transform_context or QgsCoordinateTransformContext(), options)
+        if self.writer.hasError() != QgsVectorFileWriter.NoError:
+            raise RuntimeError(f"Could not create {path}: {self.writer.errorMessage()}")
+
+    def fields(self):
+        return self._fields
+
+    def write_chunk(self, features):
+        if not self.writer.addFeatures(features):
+            raise RuntimeError(f"Could not write features to {self.path}: {self.writer.errorMessage()}")
+
+    def close(self):
+        """Writes the remaining features, closes the file and loads it as a layer"""
+        if self.writer is None:
+            return None
+        self.flush()
+        del self.writer     #deleting the writer flushes and closes the file
+        self.writer = None
+
+        from qgis.core import QgsProject, QgsVectorLayer
+        layer = QgsVectorLayer(self.path, self.layer_name, 'ogr')
+        if self.add_to_project:
+            (self.project or QgsProject.instance()).addMapLayer(layer)
+        return layer
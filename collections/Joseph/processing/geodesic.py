@@ -0,0 +1,77 @@
+"""
+Vectorized solution of the inverse geodesic problem on an ellipsoid: the
+distance between two points and the azimuth (bearing from True North) of the
+line between them, for whole arrays of point pairs at once.
+
+Used by hard_ties.py, so that the distance and the bearing of a hard-tie come
+from one calculation on the ellipsoid instead of a QgsDistanceArea measurement
+plus a planar angle corrected for grid convergence.
+
+The module only depends on numpy.
+Ref: Vincenty, T. (1975). Direct and inverse solutions of geodesics on the
+     ellipsoid with application of nested equations. Survey Review 23(176).
+"""
+import numpy as np
+
+# Semi-major axis (m) and flattening of the WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1/298.257223563
+
+def geodesic_inverse(lon1, lat1, lon2, lat2, a=WGS84_A, f=WGS84_F, tolerance=1e-12, max_iterations=200):
+    """
+    Returns the ellipsoidal distances (in the units of `a`) and the forward
+    azimuths (degrees clockwise from True North, 0 to 360) at the first and at
+    the second point of the geodesics from (lon1, lat1) to (lon2, lat2), given
+    as arrays of degrees on an ellipsoid with semi-major axis `a` and
+    flattening `f`.
+
+    Raises a ValueError if the solution does not converge, which only happens
+    for nearly antipodal points.
+    """
+    lon1, lat1, lon2, lat2 = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (lon1, lat1, lon2, lat2)))
+    b = (1 - f)*a
+
+    # Reduced latitudes and the difference in longitude
+    L = np.radians((lon2 - lon1 + 180) % 360 - 180)
+    U1 = np.arctan((1 - f)*np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f)*np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    # Iterate the longitude on the auxiliary sphere until it stops changing. The
+    # terms below are always those of the final longitude, so the results do
+    # not depend on how many other pairs are solved at the same time.
+    lam = L
+    lam_prev = None
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for iteration in range(max_iterations+1):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2*sin_lam, cos_u1*sin_u2 - sin_u1*cos_u2*cos_lam)
+            cos_sigma = sin_u1*sin_u2 + cos_u1*cos_u2*cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1*cos_u2*sin_lam/sin_sigma)
+            cos2_alpha = 1 - sin_alpha*sin_alpha
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2*sin_u1*sin_u2/cos2_alpha)    #0 on the equator
+
+            if lam_prev is not None and np.all(np.abs(lam - lam_prev) <= tolerance):
+                break
+            if iteration == max_iterations:
+                unconverged = np.flatnonzero(np.abs(lam - lam_prev) > tolerance)
+                raise ValueError(f"Geodesic did not converge for {len(unconverged)} nearly antipodal point pair(s)")
+
+            C = f/16*cos2_alpha*(4 + f*(4 - 3*cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C)*f*sin_alpha*(sigma + C*sin_sigma*(cos_2sigma_m + C*cos_sigma*(-1 + 2*cos_2sigma_m**2)))
+
+    # Distances
+    u2 = cos2_alpha*(a*a - b*b)/(b*b)
+    A = 1 + u2/16384*(4096 + u2*(-768 + u2*(320 - 175*u2)))
+    B = u2/1024*(256 + u2*(-128 + u2*(74 - 47*u2)))
+    delta_sigma = B*sin_sigma*(cos_2sigma_m + B/4*(cos_sigma*(-1 + 2*cos_2sigma_m**2)
+                               - B/6*cos_2sigma_m*(-3 + 4*sin_sigma**2)*(-3 + 4*cos_2sigma_m**2)))
+    distances = b*A*(sigma - delta_sigma)
+
+    # Azimuths at both ends (the direction of travel from point 1 to point 2)
+    azimuths1 = np.degrees(np.arctan2(cos_u2*sin_lam, cos_u1*sin_u2 - sin_u1*cos_u2*cos_lam))
+    azimuths2 = np.degrees(np.arctan2(cos_u1*sin_lam, cos_u1*sin_u2*cos_lam - sin_u1*cos_u2))
+    return distances, np.mod(azimuths1, 360.0), np.mod(azimuths2, 360.0)
@@ -0,0 +1,102 @@
+"""
+A cache of the coordinate transforms and distance calculators used by the
+scripts in this folder (calculate_hard_ties.py, calculate_utm_coordinates.py
+and their helper modules).
+
+Building a QgsCoordinateTransform or configuring a QgsDistanceArea is much
+slower than using one, so a GeometryContext builds each of them once and hands
+out the same object on later calls:
+
+-  transforms are keyed by (source crs, destination crs, transform context)
+-  distance calculators are keyed by (source crs, ellipsoid, transform context)
+
+At most `maxsize` objects are kept; the least recently used one is dropped
+when the cache is full. `hits` and `misses` count the lookups, so a run can
+check that the setup cost is paid once per crs rather than once per feature.
+"""
+from collections import OrderedDict
+
+from qgis.core import QgsCoordinateTransform, QgsCoordinateTransformContext, QgsDistanceArea
+
+def crs_key(crs):
+    """Returns a hashable key for a QgsCoordinateReferenceSystem"""
+    return crs.authid() or crs.toWkt()
+
+class GeometryContext:
+    """
+    Memoizes QgsCoordinateTransform and QgsDistanceArea objects (see above).
+
+    The transform context is taken from `project` (e.g. QgsProject.instance())
+    unless `transform_context` is given. `ellipsoid` (e.g. 'EPSG:7019') is used
+    for distances; by default the ellipsoid of the crs being measured is used.
+    """
+    def __init__(self, project=None, transform_context=None, ellipsoid=None, maxsize=32):
+        if transform_context is None:
+            transform_context = project.transformContext() if project is not None else QgsCoordinateTransformContext()
+        self.project = project
+        self.transform_context = transform_context
+        self.ellipsoid = ellipsoid
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._contexts = []     #transform contexts seen so far; their positions are used in the keys
+
+    def _context_key(self, transform_context):
+        """Returns the position of `transform_context` in the list of known contexts"""
+        for i, known in enumerate(self._contexts):
+            if known is transform_context or known == transform_context:
+                return i
+        self._contexts.append(transform_context)
+        return len(self._contexts) - 1
+
+    def _get(self, key, build):
+        """Returns the cached object for `key`, calling `build` to create it on a miss"""
+        value = self._cache.get(key)
+        if value is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return value
+
+        self.misses += 1
+        value = build()
+        self._cache[key] = value
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return value
+
+    def transform(self, source_crs, dest_crs, transform_context=None):
+        """Returns a QgsCoordinateTransform from `source_crs` to `dest_crs`"""
+        if transform_context is None:
+            transform_context = self.transform_context
+        key = ('transform', crs_key(source_crs), crs_key(dest_crs), self._context_key(transform_context))
+        return self._get(key, lambda: QgsCoordinateTransform(source_crs, dest_crs, transform_context))
+
+    def distance_area(self, crs, ellipsoid=None, transform_context=None):
+        """
+        Returns a QgsDistanceArea that measures in `crs` on `ellipsoid` (the
+        ellipsoid of the context, or else of `crs`)
+        """
+        if transform_context is None:
+            transform_context = self.transform_context
+        ellipsoid = ellipsoid or self.ellipsoid or crs.ellipsoidAcronym()
+
+        def build():
+            distance = QgsDistanceArea()
+            distance.setSourceCrs(crs, transform_context)
+            distance.setEllipsoid(ellipsoid)
+            return distance
+
+        key = ('distance', crs_key(crs), ellipsoid, self._context_key(transform_context))
+        return self._get(key, build)
+
+    def clear(self):
+        """Empties the cache and resets the counters"""
+        self._cache.clear()
+        self._contexts = []
+        self.hits = 0
+        self.misses = 0
+
+    def cache_info(self):
+        """Returns a summary of the cache, like functools.lru_cache"""
+        return f"GeometryContext(hits={self.hits}, misses={self.misses}, maxsize={self.maxsize}, currsize={len(self._cache)})"
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+This script runs the three grid cell location steps (clean, sort and shorten) on a csv file
+of intersections between two layers from QGIS in a single pass, instead of running
+clean-grid-cell-location-list.py, sort-long-grid-cell-location.py and
+shorten-grid-cell-location.py one after another.
+
+The input is read once. Rows are sorted by the FeatureID column (with an external merge
+sort if the file is larger than --memory-budget), merged into one row per feature, and
+written in long form (<row>.<col>.<num>; ...) and/or short form
+(<row>.<col>.<num>,<num>; ...) in the same pass.
+
+Usage:
+    python grid-cell-location-pipeline.py FeatureTraceAndGrid5mIntersections.csv
+    python grid-cell-location-pipeline.py input.csv --cola 1 --colb 2 --outputs short --compress
+
+By default the outputs are written next to the input as <input>_sortedlong.csv and
+<input>_sortedshort.csv (and <input>_cleaned.csv with --cleaned). The helper modules
+grid_cell_locations.py and grid_cell_codec.py must be in the same folder as this script.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from grid_cell_locations import process_locations
+
+def output_path(input_path, suffix):
+    """Returns <input name>_<suffix>.csv in the folder of the input"""
+    stem = os.path.splitext(input_path)[0]
+    return f"{stem}_{suffix}.csv"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean, sort and shorten grid cell location lists in one pass.")
+    parser.add_argument('input', help="csv file of intersections exported from QGIS")
+    parser.add_argument('--cola', type=int, default=1, help="index of the column with duplicate values (e.g. FeatureID) (default: 1)")
+    parser.add_argument('--colb', type=int, default=2, help="index of the column with the grid cell ids (default: 2)")
+    parser.add_argument('--outputs', nargs='+', choices=['long', 'short'], default=['long', 'short'],
+                        help="forms of the sorted list to write (default: long short)")
+    parser.add_argument('--cleaned', action='store_true', help="also write the cleaned (merged but unsorted) list")
+    parser.add_argument('--long-output', help="path of the long form output (default: <input>_sortedlong.csv)")
+    parser.add_argument('--short-output', help="path of the short form output (default: <input>_sortedshort.csv)")
+    parser.add_argument('--cleaned-output', help="path of the cleaned output (default: <input>_cleaned.csv)")
+    parser.add_argument('--compress', action='store_true', help="write consecutive nums as ranges in the short form (e.g. A.III.1-4)")
+    parser.add_argument('--presorted', action='store_true', help="the input is already sorted by cola")
+    parser.add_argument('--memory-budget', type=float, default=256, help="memory (MB) used to sort the input before spilling to disk (default: 256)")
+    args = parser.parse_args(argv)
+
+    paths = {}
+    if args.cleaned:
+        paths['cleaned'] = args.cleaned_output or output_path(args.input, 'cleaned')
+    if 'long' in args.outputs:
+        paths['long'] = args.long_output or output_path(args.input, 'sortedlong')
+    if 'short' in args.outputs:
+        paths['short'] = args.short_output or output_path(args.input, 'sortedshort')
+
+    start = time.perf_counter()
+    count = 0
+    with ExitStack() as stack:
+        infile = stack.enter_context(open(args.input, newline='', encoding='utf-8-sig'))
+        csvreader = csv.reader(infile, delimiter=',')
+        header = next(csvreader, None)
+        if header is None:
+            sys.exit(f"Error: {args.input} is empty (expected a header row and intersections)")
+
+        # Open the outputs and write their headers
+        writers = {}
+        for form, path in paths.items():
+            outfile = stack.enter_context(open(path, newline='', encoding='utf-8-sig', mode='w'))
+            writers[form] = csv.writer(outfile, delimiter=',')
+            writers[form].writerow(header)
+
+        # Run the stages and write each form of every row
+        for cleaned, long_row, short_row in process_locations(csvreader, args.cola, args.colb, compress=args.compress,
+                                                              presorted=args.presorted,
+                                                              memory_budget=int(args.memory_budget*1024*1024)):
+            rows = {'cleaned': cleaned, 'long': long_row, 'short': short_row}
+            for form, writer in writers.items():
+                writer.writerow(rows[form])
+            count += 1
+
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {count} features to {', '.join(paths.values())} in {elapsed:.2f} s")
+
+if __name__ == '__main__':
+    main()
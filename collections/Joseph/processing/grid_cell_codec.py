@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Parsing and sort keys for grid cell ids of the form <row>.<col>.<num> (e.g.
+'C.XIV.3'), shared by the grid cell location scripts.
+
+-  Rows are letters, ordered like spreadsheet columns: A ... Z, AA, AB, ...
+-  Columns are Roman numerals: I, II, ... XX, XXI, ...
+-  Nums are integers.
+
+Each cell id is parsed once into a Cell (the three parts as strings) or
+straight into a sort key, a tuple of three integers. The ranks of the usual
+rows and columns are precomputed, and any other row or column is parsed (and
+cached) on first use, so there is no limit on the size of the grid.
+"""
+from collections import namedtuple
+from functools import lru_cache
+import string
+
+Cell = namedtuple('Cell', ['row', 'col', 'num'])
+
+ROMAN_NUMERALS = [(1000, 'M'), (900, 'CM'), (500, 'D'), (400, 'CD'), (100, 'C'), (90, 'XC'),
+                  (50, 'L'), (40, 'XL'), (10, 'X'), (9, 'IX'), (5, 'V'), (4, 'IV'), (1, 'I')]
+ROMAN_VALUES = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
+
+def int_to_roman(number):
+    """Returns the Roman numeral for a positive integer (e.g. 14 -> 'XIV')"""
+    if number < 1:
+        raise ValueError(f"{number} has no Roman numeral")
+    numeral = ''
+    for value, symbols in ROMAN_NUMERALS:
+        count, number = divmod(number, value)
+        numeral += symbols*count
+    return numeral
+
+def roman_to_int(numeral):
+    """Returns the value of a Roman numeral (e.g. 'XIV' -> 14)"""
+    total = 0
+    previous = 0
+    for symbol in reversed(numeral):
+        if symbol not in ROMAN_VALUES:
+            raise ValueError(f"'{numeral}' is not a Roman numeral")
+        value = ROMAN_VALUES[symbol]
+        total = total - value if value < previous else total + value
+        previous = max(previous, value)
+
+    # Reject non-standard numerals such as 'IIII' or 'IC'
+    if total < 1 or int_to_roman(total) != numeral:
+        raise ValueError(f"'{numeral}' is not a Roman numeral")
+    return total
+
+def letters_to_int(letters):
+    """Returns the rank of a row name (A -> 1, Z -> 26, AA -> 27, ...)"""
+    if not letters or not all(letter in string.ascii_uppercase for letter in letters):
+        raise ValueError(f"'{letters}' is not a row name")
+    rank = 0
+    for letter in letters:
+        rank = rank*26 + (ord(letter) - ord('A') + 1)
+    return rank
+
+# Precomputed ranks of the usual rows and columns
+ROW_RANKS = {letter: rank for rank, letter in enumerate(string.ascii_uppercase, 1)}
+COLUMN_RANKS = {int_to_roman(rank): rank for rank in range(1, 51)}
+
+@lru_cache(maxsize=None)
+def _parsed_row_rank(row):
+    return letters_to_int(row)
+
+@lru_cache(maxsize=None)
+def _parsed_column_rank(col):
+    return roman_to_int(col)
+
+def row_rank(row):
+    """Returns the sort rank of a row name"""
+    rank = ROW_RANKS.get(row)
+    return rank if rank is not None else _parsed_row_rank(row)
+
+def column_rank(col):
+    """Returns the sort rank (value) of a Roman numeral column name"""
+    rank = COLUMN_RANKS.get(col)
+    return rank if rank is not None else _parsed_column_rank(col)
+
+def parse_cell(cell_id):
+    """Splits a cell id '<row>.<col>.<num>' into a Cell"""
+    parts = cell_id.split('.')
+    if len(parts) != 3:
+        raise ValueError(f"'{cell_id}' is not a cell id of the form <row>.<col>.<num>")
+    return Cell(*parts)
+
+@lru_cache(maxsize=65536)
+def cell_key(cell_id):
+    """
+    Returns the sort key of a cell id: a tuple of the row rank, column rank and
+    num, so cells sort first by row, then by column and finally by num. Keys
+    are cached, since the same cell ids appear in many rows of a grid.
+    """
+    try:
+        row, col, num = cell_id.split('.')
+    except ValueError:
+        raise ValueError(f"'{cell_id}' is not a cell id of the form <row>.<col>.<num>") from None
+
+    # The usual rows and columns are looked up directly (this is the hot path
+    # when sorting long lists)
+    r = ROW_RANKS.get(row) or _parsed_row_rank(row)
+    c = COLUMN_RANKS.get(col) or _parsed_column_rank(col)
+    return (r, c, int(num))
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Functions used by the grid cell location scripts (clean-grid-cell-location-list.py,
+sort-long-grid-cell-location.py and shorten-grid-cell-location.py).
+
+merge_locations condenses the rows of an intersection export (one row per
+feature and grid cell) into one row per feature, in a single pass over the rows.
+sort_locations and sort_and_shorten_locations sort the list of grid cell ids of
+one row, using the cell id parsing in grid_cell_codec.py.
+
+process_locations chains these stages (clean -> sort -> shorten) as generators
+over a single read of the export, sorting the rows with an external merge sort
+when they do not fit in a memory budget. It is used by
+grid-cell-location-pipeline.py.
+"""
+from itertools import groupby
+from operator import itemgetter
+import csv
+import heapq
+import os
+import tempfile
+
+from grid_cell_codec import cell_key, column_rank, parse_cell, row_rank
+
+def merge_locations(rows, cola, colb, delim=', ', presorted=False):
+    """
+    Merges rows that have the same value in column `cola` (e.g. FeatureID) into
+    one row whose column `colb` (e.g. GridID) lists the `colb` values of all of
+    them, joined by `delim`. The other columns are taken from the first row of
+    each group, and values that repeat the first row's `colb` value are left
+    out. Yields the merged rows in ascending order of `cola`.
+
+    If `presorted` is True, the rows must already be sorted by `cola`; they are
+    then grouped as they stream past, so only one group is held in memory at a
+    time. Otherwise the rows are aggregated in a dictionary (the first row and
+    the `colb` values of each `cola` value) and yielded in sorted order at the end.
+    """
+    if presorted:
+        for _, group in groupby(rows, key=itemgetter(cola)):
+            first = list(next(group))
+            first[colb] = delim.join([first[colb]] + [r[colb] for r in group if r[colb] != first[colb]])
+            yield first
+        return
+
+    groups = {}     #cola value -> [first row, list of colb values]
+    for row in rows:
+        group = groups.get(row[cola])
+        if group is None:
+            groups[row[cola]] = [list(row), [row[colb]]]
+        elif row[colb] != group[0][colb]:
+            group[1].append(row[colb])
+
+    for key in sorted(groups):
+        first, values = groups.pop(key)
+        first[colb] = delim.join(values)
+        yield first
+
+def sort_locations(locations, delim_in, delim_out):
+    """Takes a string that is list of grid cell ids and returns a string listing the same cell ids
+    but with a newly defined delimiter and sorted first by row, then col, and finally num"""
+    return delim_out.join(sorted(locations.split(delim_in), key=cell_key))
+
+def compress_nums(nums):
+    """Takes a list of num strings and returns them sorted, without duplicates, and with runs of
+    3 or more consecutive nums written as ranges (e.g. ['4', '1', '2', '3', '7'] -> ['1-4', '7'])"""
+    values = sorted(set(int(n) for n in nums))
+    compressed = []
+    start = 0
+    for i in range(1, len(values)+1):
+        # Close the current run at the end of the list or at a gap
+        if i == len(values) or values[i] != values[i-1] + 1:
+            if i - start >= 3:
+                compressed.append(f"{values[start]}-{values[i-1]}")
+            else:
+                compressed.extend(str(v) for v in values[start:i])
+            start = i
+    return compressed
+
+def sort_and_shorten_locations(locations, delim_in, delim_out, compress=False):
+    """Takes a string that is list of grid cell ids and returns a string listing the same cell ids
+    but with a newly defined delimiter, sorted by row and col, and with the nums of each row and
+    col listed together (<row>.<col>.<num>,<num>,...). The nums keep their input order unless
+    `compress` is True, in which case they are sorted and consecutive nums are written as ranges
+    (<row>.<col>.<num>-<num>,...)"""
+    # Sort the cells by row and col (the sort is stable, so nums stay in input order)
+    loc_cells = [parse_cell(c) for c in locations.split(delim_in)]
+    loc_cells.sort(key=lambda cell: (row_rank(cell.row), column_rank(cell.col)))
+    
+    # Join the nums of each row and col
+    loc_short = []
+    for (r, c), cells in groupby(loc_cells, key=lambda cell: (cell.row, cell.col)):
+        nums = [cell.num for cell in cells]
+        if compress:
+            nums = compress_nums(nums)
+        loc_short.append(r + '.' + c + '.' + ','.join(nums))
+    
+    return delim_out.join(loc_short)
+
+def row_size(row):
+    """Returns a rough estimate of the memory (bytes) used by a csv row"""
+    return 56 + sum(49 + len(value) for value in row)
+
+def _read_run(path):
+    """Yields the rows of a sorted run written by external_sort"""
+    with open(path, newline='', encoding='utf-8') as infile:
+        yield from csv.reader(infile)
+
+def external_sort(rows, key, memory_budget=256*1024*1024):
+    """
+    Yields `rows` sorted by `key` (stable, like sorted()). Rows are sorted in
+    memory until they exceed `memory_budget` bytes (see row_size); beyond
+    that, each full buffer is sorted and written to a temporary file (a run),
+    and the runs are merged as the rows are yielded.
+    """
+    with tempfile.TemporaryDirectory(prefix='gridcells_') as tmpdir:
+        runs = []
+        buffer = []
+        buffer_size = 0
+        for row in rows:
+            buffer.append(row)
+            buffer_size += row_size(row)
+            if buffer_size > memory_budget:
+                buffer.sort(key=key)
+                path = os.path.join(tmpdir, f"run{len(runs)}.csv")
+                with open(path, newline='', encoding='utf-8', mode='w') as outfile:
+                    csv.writer(outfile).writerows(buffer)
+                runs.append(path)
+                buffer = []
+                buffer_size = 0
+
+        buffer.sort(key=key)
+        if not runs:
+            yield from buffer
+            return
+
+        # Merge the runs and the last buffer (heapq.merge keeps ties in run
+        # order, so the sort stays stable)
+        yield from heapq.merge(*[_read_run(path) for path in runs], buffer, key=key)
+
+def process_locations(rows, cola, colb, delim_in=', ', delim_out='; ', compress=False,
+                      presorted=False, memory_budget=256*1024*1024):
+    """
+    Runs the clean, sort and shorten stages over the rows of an intersection
+    export in one pass. Yields (cleaned row, long row, short row) for each
+    value of `cola`, in ascending order of `cola`:
+
+    -  cleaned: `colb` lists all grid cell ids of the feature, joined by `delim_in`
+    -  long: the grid cell ids sorted by row, col and num (sort_locations)
+    -  short: the grid cell ids sorted and shortened (sort_and_shorten_locations)
+
+    Unless `presorted` is True, the rows are first sorted by `cola` with
+    external_sort, using at most about `memory_budget` bytes of memory.
+    """
+    if not presorted:
+        rows = external_sort(rows, itemgetter(cola), memory_budget)
+
+    for cleaned in merge_locations(rows, cola, colb, delim_in, presorted=True):
+        long_row = list(cleaned)
+        long_row[colb] = sort_locations(cleaned[colb], delim_in, delim_out)
+        short_row = list(cleaned)
+        short_row[colb] = sort_and_shorten_locations(cleaned[colb], delim_in, delim_out, compress)
+        yield cleaned, long_row, short_row
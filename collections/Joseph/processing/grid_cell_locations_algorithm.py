@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Processing algorithm that lists the grid cells each feature intersects, without
+exporting the intersections to csv first.
+
+This replaces the export -> clean-grid-cell-location-list.py ->
+sort-long/shorten-grid-cell-location.py -> re-import round trip. Candidate grid
+cells are found with a QgsSpatialIndex, the exact intersections are tested with
+a prepared geometry, and the sorted (and optionally shortened) GridID list is
+written to a new field on a copy of each feature.
+
+The helper modules grid_cell_locations.py and grid_cell_codec.py must be in the
+same folder as this script.
+"""
+import os
+import sys
+
+from qgis.PyQt.QtCore import QCoreApplication, QVariant
+from qgis.core import (
+    QgsFeatureRequest,
+    QgsFeatureSink,
+    QgsField,
+    QgsGeometry,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterField,
+    QgsProcessingParameterString,
+    QgsSpatialIndex,
+)
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from grid_cell_locations import sort_and_shorten_locations, sort_locations
+
+
+class GridCellLocationsAlgorithm(QgsProcessingAlgorithm):
+    """
+    Writes the sorted list of GridIDs of the grid cells that intersect each
+    feature to a new field
+    """
+    INPUT = 'INPUT'
+    GRID = 'GRID'
+    GRID_ID_FIELD = 'GRID_ID_FIELD'
+    OUTPUT_FIELD = 'OUTPUT_FIELD'
+    FORMAT = 'FORMAT'
+    COMPRESS = 'COMPRESS'
+    OUTPUT = 'OUTPUT'
+
+    FORMATS = ['Short (<row>.<col>.<num>,<num>; ...)', 'Long (<row>.<col>.<num>; ...)']
+
+    def tr(self, string):
+        return QCoreApplication.translate('Processing', string)
+
+    def createInstance(self):
+        return GridCellLocationsAlgorithm()
+
+    def name(self):
+        return 'gridcelllocations'
+
+    def displayName(self):
+        return self.tr('Grid cell locations')
+
+    def group(self):
+        return self.tr('Archaeology')
+
+    def groupId(self):
+        return 'archaeology'
+
+    def shortHelpString(self):
+        return self.tr("Lists the grid cells (e.g. the output of create-small-grid.py) that each "
+                       "feature intersects. GridIDs must have the form <row>.<col>.<num>; the list "
+                       "is sorted by row, col and num and written to a new field.")
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.INPUT, self.tr('Features'), [QgsProcessing.TypeVectorAnyGeometry]))
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.GRID, self.tr('Grid'), [QgsProcessing.TypeVectorPolygon]))
+        self.addParameter(QgsProcessingParameterField(
+            self.GRID_ID_FIELD, self.tr('Grid ID field'), 'GridID', self.GRID))
+        self.addParameter(QgsProcessingParameterString(
+            self.OUTPUT_FIELD, self.tr('Output field name'), 'GridCells'))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.FORMAT, self.tr('List format'), self.FORMATS, defaultValue=0))
+        self.addParameter(QgsProcessingParameterBoolean(
+            self.COMPRESS, self.tr('Write consecutive nums as ranges (short format only)'), False))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.OUTPUT, self.tr('Features with grid cell locations')))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        grid = self.parameterAsSource(parameters, self.GRID, context)
+        grid_id_field = self.parameterAsString(parameters, self.GRID_ID_FIELD, context)
+        output_field = self.parameterAsString(parameters, self.OUTPUT_FIELD, context)
+        short_format = self.parameterAsEnum(parameters, self.FORMAT, context) == 0
+        compress = self.parameterAsBoolean(parameters, self.COMPRESS, context)
+
+        if source.fields().indexFromName(output_field) != -1:
+            raise QgsProcessingException(self.tr(f"The features already have a field named '{output_field}'"))
+
+        # Index the grid cells (in the crs of the features), keeping their geometries
+        feedback.pushInfo(self.tr('Indexing grid cells...'))
+        request = QgsFeatureRequest().setSubsetOfAttributes([grid_id_field], grid.fields())
+        request.setDestinationCrs(source.sourceCrs(), context.transformContext())
+        index = QgsSpatialIndex(QgsSpatialIndex.FlagStoreFeatureGeometries)
+        grid_ids = {}
+        for cell in grid.getFeatures(request):
+            if feedback.isCanceled():
+                return {}
+            index.addFeature(cell)
+            grid_ids[cell.id()] = str(cell[grid_id_field])
+
+        # Create the output
+        fields = source.fields()
+        fields.append(QgsField(output_field, QVariant.String))
+        sink, dest_id = self.parameterAsSink(parameters, self.OUTPUT, context, fields,
+                                             source.wkbType(), source.sourceCrs())
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+
+        # Find the cells that intersect each feature
+        total = 100.0/source.featureCount() if source.featureCount() else 0
+        for current, feature in enumerate(source.getFeatures()):
+            if feedback.isCanceled():
+                break
+
+            cells = []
+            geom = feature.geometry()
+            if not geom.isNull() and not geom.isEmpty():
+                engine = QgsGeometry.createGeometryEngine(geom.constGet())
+                engine.prepareGeometry()
+                for cell_id in index.intersects(geom.boundingBox()):
+                    if engine.intersects(index.geometry(cell_id).constGet()):
+                        cells.append(grid_ids[cell_id])
+
+            # Sort (and shorten) the list of GridIDs
+            value = None
+            if cells:
+                try:
+                    if short_format:
+                        value = sort_and_shorten_locations(', '.join(cells), ', ', '; ', compress)
+                    else:
+                        value = sort_locations(', '.join(cells), ', ', '; ')
+                except ValueError as e:
+                    raise QgsProcessingException(self.tr(f"Could not sort the grid cells of feature {feature.id()}: {e}"))
+
+            feature.setAttributes(feature.attributes() + [value])
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+            feedback.setProgress(int(current*total))
+
+        return {self.OUTPUT: dest_id}
@@ -0,0 +1,133 @@
+"""
+Functions used by calculate_hard_ties.py to find the bearing of True North
+relative to Grid North (grid convergence) for many points at once.
+
+For Transverse Mercator crs (including UTM) the convergence is calculated with
+the closed-form series from the central meridian and the latitude of each
+point. For any other crs, each point is moved a short distance north along its
+meridian and the angle of that line is measured in the crs (the numeric
+method). Either way only one or two QgsCoordinateTransform objects are needed,
+however many points there are, and they are reused across calls when a
+GeometryContext (geometry_context.py) is passed in.
+Ref: Snyder, J. P. (1987). Map Projections - A Working Manual, p. 67
+"""
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsEllipsoidUtils,
+)
+import numpy as np
+
+from batch_transform import transform_xy
+from geometry_context import GeometryContext
+
+# Second eccentricity squared of the WGS84/GRS80 ellipsoid, used when the
+# ellipsoid of a crs cannot be determined
+DEFAULT_EP2 = 0.00673949674227
+
+def proj_parameters(crs):
+    """
+    Returns the parameters of the proj string of `crs` as a dictionary (e.g.
+    {'proj': 'utm', 'zone': '10', ...})
+    """
+    proj = crs.toProj() if hasattr(crs, 'toProj') else crs.toProj4()
+    params = {}
+    for token in proj.split():
+        key, _, value = token.lstrip('+').partition('=')
+        params[key] = value
+    return params
+
+def transverse_mercator_parameters(crs):
+    """
+    Returns the central meridian (degrees) and the second eccentricity squared
+    of the ellipsoid if `crs` is a Transverse Mercator projection, or None if it
+    is not
+    """
+    params = proj_parameters(crs)
+    if params.get('proj') == 'utm':
+        lon_0 = int(params['zone'])*6 - 183
+    elif params.get('proj') in ('tmerc', 'etmerc'):
+        lon_0 = float(params.get('lon_0', 0))
+    else:
+        return None
+
+    ellipsoid = QgsEllipsoidUtils.ellipsoidParameters(crs.ellipsoidAcronym())
+    if ellipsoid.valid and ellipsoid.semiMinor > 0:
+        a = ellipsoid.semiMajor
+        b = ellipsoid.semiMinor
+        ep2 = (a*a - b*b)/(b*b)
+    else:
+        ep2 = DEFAULT_EP2
+
+    return lon_0, ep2
+
+def tm_convergence(lons, lats, lon_0, ep2=DEFAULT_EP2):
+    """
+    Returns the grid convergence (degrees, positive east of the central meridian
+    in the northern hemisphere) of a Transverse Mercator projection with central
+    meridian `lon_0` at arrays of longitudes and latitudes (degrees)
+    """
+    lats = np.radians(np.asarray(lats, dtype=float))
+    dlon = np.radians((np.asarray(lons, dtype=float) - lon_0 + 180) % 360 - 180)
+
+    sin_lat = np.sin(lats)
+    cos2 = np.cos(lats)**2
+    t2 = np.tan(lats)**2
+    eta2 = ep2*cos2
+    dlon2_cos2 = dlon*dlon*cos2
+
+    gamma = dlon*sin_lat*(1 + dlon2_cos2/3*(1 + 3*eta2 + 2*eta2*eta2) + dlon2_cos2*dlon2_cos2/15*(2 - t2))
+    return np.degrees(gamma)
+
+def line_angles(x1, y1, x2, y2):
+    """
+    Vectorized QgsGeometryUtils.lineAngle: returns the angles (degrees,
+    clockwise from the positive y axis, 0 to 360) of the lines from (x1, y1) to
+    (x2, y2)
+    """
+    dx = np.asarray(x2, dtype=float) - np.asarray(x1, dtype=float)
+    dy = np.asarray(y2, dtype=float) - np.asarray(y1, dtype=float)
+    return np.mod(np.degrees(np.pi/2 - np.arctan2(dy, dx)), 360.0)
+
+def numeric_true_north_bearings(xs, ys, source_crs, proj_inst, geometry_context=None):
+    """
+    Returns the bearing of True North relative to Grid North at each point by
+    shifting the points 0.001 degrees north along their meridians and measuring
+    the angle of the shift in `source_crs`
+    """
+    geometry_context = geometry_context or GeometryContext(proj_inst)
+
+    # Transform the points to EPSG 4326 and shift them north
+    geo_crs = QgsCoordinateReferenceSystem(4326)
+    lons, lats = transform_xy(xs, ys, geometry_context.transform(source_crs, geo_crs))
+    lats = np.asarray(lats) + 0.001
+
+    # Transform the shifted points back to the source CRS and measure the angles
+    xs2, ys2 = transform_xy(lons, lats, geometry_context.transform(geo_crs, source_crs))
+    return line_angles(xs, ys, xs2, ys2)
+
+def true_north_bearings(xs, ys, source_crs, proj_inst, geometry_context=None):
+    """
+    Calculates the bearing (clockwise from Grid North, 0 to 360) of True North
+    at arrays of x and y coordinates in `source_crs`. Uses the analytic formula
+    for Transverse Mercator crs and the numeric method for all other crs.
+    Transforms are taken from `geometry_context` if it is given.
+    """
+    if len(xs) == 0:
+        return np.zeros(0)
+
+    geometry_context = geometry_context or GeometryContext(proj_inst)
+    tm_params = transverse_mercator_parameters(source_crs)
+    if tm_params is None:
+        return numeric_true_north_bearings(xs, ys, source_crs, proj_inst, geometry_context)
+
+    # Find the geographic coordinates of the points on the crs' own datum
+    lon_0, ep2 = tm_params
+    if hasattr(source_crs, 'toGeographicCrs'):
+        geo_crs = source_crs.toGeographicCrs()
+    else:
+        geo_crs = QgsCoordinateReferenceSystem(4326)
+    lons, lats = transform_xy(xs, ys, geometry_context.transform(source_crs, geo_crs))
+
+    # True North is rotated counter-clockwise from Grid North by the convergence
+    gamma = tm_convergence(lons, lats, lon_0, ep2)
+    return np.mod(-gamma, 360.0)
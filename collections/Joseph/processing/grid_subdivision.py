@@ -0,0 +1,236 @@
+"""
+Functions used by create-small-grid.py to subdivide quadrilateral grid cells
+into n by n smaller cells.
+
+`extent_point_in_position` and `small_grid_point` calculate one vertex at a
+time. The array kernel (`order_corners`, `subdivision_vertices` and
+`subdivision_rings`) orders the corners of each parent cell once and then
+calculates every vertex and every cell ring of a whole stack of parent cells,
+shaped (features, 4, 2), with array operations. Both give identical results.
+
+The corners of a cell are named as follows:
+
+    B ---- C
+    |      |
+    A ---- D
+
+Rows (i) run from the A-D side to the B-C side and columns (k) run from the
+A-B side to the D-C side. The corners are classified in the frame of each
+cell's minimum-area rectangle (oriented_rectangles.py), so rotated cells and
+cells with extra vertices along their sides are ordered correctly.
+
+`subdivide_parallel` splits a large set of parent cells into chunks and runs
+the kernel in a pool of worker processes. The module does not depend on QGIS,
+so the workers only need numpy.
+"""
+from contextlib import contextmanager
+import multiprocessing
+import multiprocessing.spawn
+import os
+import sys
+import threading
+
+import numpy as np
+
+from oriented_rectangles import quad_corners, rectangle_corners, ring_corners
+
+# Index of each corner in A, B, C, D order
+CORNER_POSITIONS = {('bottom', 'left'): 0, ('top', 'left'): 1, ('top', 'right'): 2, ('bottom', 'right'): 3}
+
+# Held while worker processes are started (see starting_workers)
+_START_LOCK = threading.Lock()
+
+def extent_point_in_position(extents: list, vert: str, horz: str):
+    """
+    Returns the point whose coordinates correspond to the given vertical and horizontal descriptions
+
+    Extents must be a list of nested [x,y] lists. The corners are found with
+    oriented_rectangles.ring_corners, so the cell may be rotated and may have
+    extra vertices along its sides.
+    """
+    position = CORNER_POSITIONS.get((vert, horz))
+    if position is None or not extents:
+        print("Error: input directions must be top, bottom, left, or right\nExiting...")
+        return
+
+    return extents[ring_corners(extents)[position]]
+
+
+def small_grid_point(extents: list, n, i, k):
+    """
+    Calculates the position of a point in the given row and column with the given extents
+
+    Extents must be a list of nested [x,y] lists
+    """
+    # Check for too few extents
+    if len(extents) < 4:
+        print("Error: extents must be a list of at least 4 points!\nExiting...")
+        return
+
+    # separate extents list into the correct order
+    A, B, C, D = (extents[c] for c in ring_corners(extents))     #same as extent_point_in_position for each corner
+
+    # Calculate x and y coordinates
+    x = (((n-i)*(n-k)/n)*A[0] + ((i)*(n-k)/n)*B[0] + ((i)*(k)/n)*C[0] + ((n-i)*(k)/n)*D[0])/n
+    y = (((n-i)*(n-k)/n)*A[1] + ((i)*(n-k)/n)*B[1] + ((i)*(k)/n)*C[1] + ((n-i)*(k)/n)*D[1])/n
+    return [x, y]
+
+def order_corners(quads):
+    """
+    Returns the corners of a stack of quadrilaterals, shaped (features, 4, 2),
+    in A, B, C, D order (see above), using the same corner classification as
+    extent_point_in_position (oriented_rectangles.quad_corners)
+    """
+    quads = np.asarray(quads, dtype=float)
+    if quads.ndim != 3 or quads.shape[1:] != (4, 2):
+        raise ValueError(f"quads must be shaped (features, 4, 2), not {quads.shape}")
+    return quad_corners(quads)
+
+def ring_quads(xs, ys, starts, counts):
+    """
+    Returns the A, B, C, D corners of polygon rings given as flat x and y
+    arrays with the index of the first vertex and the number of vertices of
+    each ring (see oriented_rectangles.py), shaped (rings, 4, 2). Rings may have
+    any number of vertices, e.g. extra vertices along the sides of a cell.
+    """
+    corners = rectangle_corners(xs, ys, starts, counts)
+    return np.stack([xs[corners], ys[corners]], axis=2)
+
+def subdivision_vertices(quads, n, ordered=False):
+    """
+    Returns all (n+1)^2 vertices of the n by n subdivision of each quadrilateral
+    in a stack shaped (features, 4, 2). The result is shaped
+    (features, n+1, n+1, 2) and vertex [f, i, k] equals
+    small_grid_point(quads[f], n, i, k).
+
+    Set `ordered` to True if the corners are already in A, B, C, D order.
+    """
+    corners = np.asarray(quads, dtype=float) if ordered else order_corners(quads)
+    A, B, C, D = (corners[:, None, None, c, :] for c in range(4))
+
+    # Bilinear weights, calculated in the same order as small_grid_point
+    i = np.arange(n+1, dtype=float)[:, None, None]
+    k = np.arange(n+1, dtype=float)[None, :, None]
+    w_a = (n-i)*(n-k)/n
+    w_b = i*(n-k)/n
+    w_c = i*k/n
+    w_d = (n-i)*k/n
+
+    return (w_a*A + w_b*B + w_c*C + w_d*D)/n
+
+def subdivision_rings(quads, n, ordered=False):
+    """
+    Returns the rings of all n^2 cells of the n by n subdivision of each
+    quadrilateral in a stack shaped (features, 4, 2). The result is shaped
+    (features, n^2, 4, 2); cell j of each feature has the number j+1 (row by
+    row, as in create-small-grid.py) and its corners are in A, B, C, D order.
+    """
+    vertices = subdivision_vertices(quads, n, ordered)
+    rings = np.stack([
+        vertices[:, :-1, :-1],      #row i, col k
+        vertices[:, 1:, :-1],       #row i+1, col k
+        vertices[:, 1:, 1:],        #row i+1, col k+1
+        vertices[:, :-1, 1:],       #row i, col k+1
+    ], axis=3)
+    return rings.reshape(len(vertices), n*n, 4, 2)
+
+def subdivide_chunk(names, quads, n):
+    """
+    Subdivides a chunk of parent cells. Returns the GridIDs
+    (<parent GridID>.<cell number>), the cell numbers and the rings (shaped
+    (cells, 4, 2)) of all cells, parent by parent and row by row.
+    """
+    rings = subdivision_rings(np.asarray(quads, dtype=float).reshape(-1, 4, 2), n)
+    rect_nums = list(range(1, n*n+1))
+    grid_ids = [f"{name}.{rect_num}" for name in names for rect_num in rect_nums]
+    return grid_ids, rect_nums*len(names), rings.reshape(-1, 4, 2)
+
+def python_executable():
+    """
+    Returns the python interpreter that worker processes should be started with.
+    Inside QGIS, sys.executable is the QGIS application rather than python.
+    """
+    if os.path.basename(sys.executable).lower().startswith('python'):
+        return sys.executable
+    for candidate in ('pythonw.exe', 'python.exe', os.path.join('bin', 'python3')):
+        path = os.path.join(sys.exec_prefix, candidate)
+        if os.path.exists(path):
+            return path
+    return sys.executable
+
+@contextmanager
+def starting_workers():
+    """
+    Sets the python executable of spawned processes and hides the file of the
+    __main__ module while worker processes are started. Spawned workers re-run
+    the __main__ file, and the scripts in this folder do all of their work at
+    the top level, so they must not be re-run. Both are process-wide, so they
+    are changed under a lock and restored as soon as the workers have started.
+    """
+    with _START_LOCK:
+        main = sys.modules.get('__main__')
+        saved = {name: getattr(main, name) for name in ('__file__', '__spec__') if hasattr(main, name)}
+        executable = multiprocessing.spawn.get_executable()
+        try:
+            multiprocessing.spawn.set_executable(python_executable())
+            if '__file__' in saved:
+                del main.__file__
+            main.__spec__ = None
+            yield
+        finally:
+            for name, value in saved.items():
+                setattr(main, name, value)
+            multiprocessing.spawn.set_executable(executable)
+
+def subdivide_parallel(names, quads, n, workers=None, chunk_size=500, feedback=None):
+    """
+    Subdivides parent cells (GridIDs `names`, corners `quads` shaped
+    (features, 4, 2)) into n by n cells using `workers` processes (all cpus by
+    default) and `chunk_size` parent cells per task.
+
+    Yields the results of subdivide_chunk one chunk at a time, in the same
+    order as the input, so the output is the same for any number of workers.
+    Progress is reported to `feedback` (e.g. a QgsFeedback) with
+    setProgress(), and the run stops early if feedback.isCanceled() is True.
+    """
+    chunks = [(names[start:start+chunk_size], quads[start:start+chunk_size])
+              for start in range(0, len(names), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+
+    def report(done):
+        if feedback is not None:
+            feedback.setProgress(100*done/len(chunks))
+
+    # Run in this process if there is nothing to parallelize
+    if workers <= 1:
+        for done, (chunk_names, chunk_quads) in enumerate(chunks, 1):
+            if feedback is not None and feedback.isCanceled():
+                return
+            yield subdivide_chunk(chunk_names, chunk_quads, n)
+            report(done)
+        return
+
+    # Spawn (rather than fork) the workers, which is safe inside a Qt application.
+    # A Pool starts all of its workers when it is created.
+    context = multiprocessing.get_context('spawn')
+    with starting_workers():
+        pool = context.Pool(workers)
+
+    # Leaving the block terminates the workers (also when canceled)
+    with pool:
+        # Keep at most 2 chunks per worker in flight, so that finished chunks
+        # do not pile up in memory while the output is being written
+        pending = []
+        next_chunk = 0
+        for done in range(1, len(chunks)+1):
+            while next_chunk < len(chunks) and len(pending) < 2*workers:
+                pending.append(pool.apply_async(subdivide_chunk, (*chunks[next_chunk], n)))
+                next_chunk += 1
+
+            result = pending.pop(0)
+            while not result.ready():
+                if feedback is not None and feedback.isCanceled():
+                    return
+                result.wait(0.1)
+            yield result.get()
+            report(done)
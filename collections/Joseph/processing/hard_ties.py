@@ -0,0 +1,112 @@
+"""
+Functions used by calculate_hard_ties.py to pair features with reference
+points and to calculate the distances and bearings of many hard-ties at once.
+
+Features can be tied to a single reference point, to their k nearest reference
+points, or to every reference point within a maximum tie distance. The nearest
+reference points are found with a QgsSpatialIndex that is built once for all
+features.
+
+The distance and the bearing of each hard-tie are both taken from the geodesic
+between the two points (geodesic.py), which is solved for all hard-ties at once
+after a single transformation of the points to geographic coordinates.
+"""
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsEllipsoidUtils,
+    QgsPointXY,
+)
+import numpy as np
+
+from batch_transform import transform_xy
+from geodesic import WGS84_A, WGS84_F, geodesic_inverse
+
+def nearest_reference_pairs(feat_points, ref_points, k=1, max_distance=0):
+    """
+    Pairs each feature point with its `k` nearest reference points (with
+    max_distance > 0, only those within `max_distance`). If `k` is None, each
+    feature is paired with every reference point within `max_distance`.
+
+    Points are QgsPointXY in the same crs. Returns two integer arrays: the
+    index of the feature point and the index of the reference point of each
+    pair, ordered by feature and then by distance.
+    """
+    if k is None and max_distance <= 0:
+        raise ValueError("max_distance must be greater than 0 when k is None")
+
+    from qgis.core import QgsRectangle, QgsSpatialIndex
+
+    # Index the reference points once
+    index = QgsSpatialIndex()
+    for i, p in enumerate(ref_points):
+        index.addFeature(i, QgsRectangle(p.x(), p.y(), p.x(), p.y()))
+    ref_xy = np.array([[p.x(), p.y()] for p in ref_points], dtype=float).reshape(-1, 2)
+
+    # Query the index for each feature point
+    neighbors = len(ref_points) if k is None else k
+    feat_indices = []
+    ref_indices = []
+    for i, p in enumerate(feat_points):
+        candidates = np.array(index.nearestNeighbor(QgsPointXY(p), neighbors, max_distance), dtype=int)
+        if len(candidates) == 0:
+            continue
+
+        # Order by distance and drop extra candidates returned for ties
+        distances = np.hypot(ref_xy[candidates, 0] - p.x(), ref_xy[candidates, 1] - p.y())
+        order = np.argsort(distances, kind='stable')
+        if max_distance > 0:
+            order = order[distances[order] <= max_distance]
+        candidates = candidates[order[:neighbors]]
+
+        feat_indices.extend([i]*len(candidates))
+        ref_indices.extend(candidates.tolist())
+
+    return np.array(feat_indices, dtype=int), np.array(ref_indices, dtype=int)
+
+def ellipsoid_parameters(acronym):
+    """
+    Returns the semi-major axis and the flattening of an ellipsoid (e.g.
+    'EPSG:7019'), or those of WGS84 if the ellipsoid is unknown
+    """
+    ellipsoid = QgsEllipsoidUtils.ellipsoidParameters(acronym)
+    if not ellipsoid.valid or ellipsoid.semiMajor <= 0 or ellipsoid.semiMinor <= 0:
+        return WGS84_A, WGS84_F
+    return ellipsoid.semiMajor, 1 - ellipsoid.semiMinor/ellipsoid.semiMajor
+
+def hard_tie_inverse(ref_x, ref_y, feat_x, feat_y, crs, geometry_context):
+    """
+    Returns the ellipsoidal distances and the compass bearings (relative to
+    True North, 0 to 360) of hard-ties from reference points to feature points,
+    given arrays of their coordinates in `crs`. Transforms are taken from
+    `geometry_context` (a GeometryContext from geometry_context.py).
+
+    The bearing is the azimuth of the geodesic where it reaches the feature
+    point, which is what measuring the angle in the crs and correcting it by
+    the grid convergence at the feature point approximates.
+    """
+    if len(ref_x) == 0:
+        return np.zeros(0), np.zeros(0)
+
+    # Transform all points to geographic coordinates on the datum of the crs
+    if hasattr(crs, 'toGeographicCrs'):
+        geo_crs = crs.toGeographicCrs()
+    else:
+        geo_crs = QgsCoordinateReferenceSystem(4326)
+    n = len(ref_x)
+    lons, lats = transform_xy(np.concatenate([ref_x, feat_x]), np.concatenate([ref_y, feat_y]),
+                              geometry_context.transform(crs, geo_crs))
+    lons = np.asarray(lons)
+    lats = np.asarray(lats)
+
+    # Solve the geodesics on the ellipsoid used for distances
+    a, f = ellipsoid_parameters(geometry_context.ellipsoid or crs.ellipsoidAcronym())
+    distances, _, bearings = geodesic_inverse(lons[:n], lats[:n], lons[n:], lats[n:], a, f)
+    return distances, bearings
+
+def hard_tie_description(distance, bearing, ref_name):
+    """
+    Returns a hard-tie description formatted as follows: '<distance> m @
+    <bearing> deg from <ref_pt name>' (distance to the nearest cm, bearing to
+    the nearest 0.1 degrees)
+    """
+    return f"{round(float(distance), 2)} m @ {round(float(bearing), 1) % 360} deg from {ref_name}"
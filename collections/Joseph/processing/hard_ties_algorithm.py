@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Processing algorithm version of calculate_hard_ties.py. The features are
+paired with their reference points and all hard-ties are solved at once
+(hard_ties.py).
+
+To tie every feature to one reference point (the 'selected' mode of the
+script), select it and tick 'Selected features only' for the reference points.
+
+The helper modules hard_ties.py, geodesic.py, batch_transform.py and
+geometry_context.py must be in the same folder as this script.
+"""
+import os
+import sys
+
+import numpy as np
+
+from qgis.PyQt.QtCore import QCoreApplication, QVariant
+from qgis.core import (
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingParameterDistance,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterField,
+    QgsProcessingParameterNumber,
+    QgsWkbTypes,
+)
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from geometry_context import GeometryContext
+from hard_ties import hard_tie_description, hard_tie_inverse, nearest_reference_pairs
+
+
+class HardTiesAlgorithm(QgsProcessingAlgorithm):
+    """
+    Creates a hard-tie line from reference points to each feature, described
+    by its distance and bearing relative to True North
+    """
+    INPUT = 'INPUT'
+    FEATURE_ID_FIELD = 'FEATURE_ID_FIELD'
+    REFERENCES = 'REFERENCES'
+    REFERENCE_ID_FIELD = 'REFERENCE_ID_FIELD'
+    TIE_MODE = 'TIE_MODE'
+    K = 'K'
+    MAX_DISTANCE = 'MAX_DISTANCE'
+    OUTPUT = 'OUTPUT'
+
+    TIE_MODES = ['First reference point', 'Nearest reference points', 'Reference points within the maximum distance']
+
+    def tr(self, string):
+        return QCoreApplication.translate('Processing', string)
+
+    def createInstance(self):
+        return HardTiesAlgorithm()
+
+    def name(self):
+        return 'hardties'
+
+    def displayName(self):
+        return self.tr('Hard-ties')
+
+    def group(self):
+        return self.tr('Archaeology')
+
+    def groupId(self):
+        return 'archaeology'
+
+    def shortHelpString(self):
+        return self.tr("Creates hard-tie lines from reference points to point features. Each "
+                       "hard-tie is described as '<distance> m @ <bearing> deg from <reference point>', "
+                       "with the bearing relative to True North. Features are tied to the first "
+                       "reference point (e.g. the selected one), to their k nearest reference points, "
+                       "or to every reference point within the maximum distance (in the units of the "
+                       "features' crs). The hard-ties are written in the features' crs.")
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.INPUT, self.tr('Features'), [QgsProcessing.TypeVectorPoint]))
+        self.addParameter(QgsProcessingParameterField(
+            self.FEATURE_ID_FIELD, self.tr('Feature id field'), 'name', self.INPUT))
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.REFERENCES, self.tr('Reference points'), [QgsProcessing.TypeVectorPoint]))
+        self.addParameter(QgsProcessingParameterField(
+            self.REFERENCE_ID_FIELD, self.tr('Reference point id field'), 'RPID', self.REFERENCES))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.TIE_MODE, self.tr('Tie each feature to'), self.TIE_MODES, defaultValue=0))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.K, self.tr('Number of reference points per feature (nearest)'),
+            QgsProcessingParameterNumber.Integer, 1, minValue=1))
+        self.addParameter(QgsProcessingParameterDistance(
+            self.MAX_DISTANCE, self.tr('Maximum hard-tie length (0 = no limit for nearest)'), 0, self.INPUT, minValue=0))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.OUTPUT, self.tr('Hard-ties'), QgsProcessing.TypeVectorLine))
+
+    def read_points(self, source, id_field, crs, context, feedback):
+        """Returns (QgsPointXY in `crs`, id) of each feature of a point source, or None if canceled"""
+        request = QgsFeatureRequest().setSubsetOfAttributes([id_field], source.fields())
+        request.setDestinationCrs(crs, context.transformContext())
+        points = []
+        for feature in source.getFeatures(request):
+            if feedback.isCanceled():
+                return None
+            if feature.hasGeometry():
+                points.append((feature.geometry().asPoint(), feature[id_field]))
+        return points
+
+    def processAlgorithm(self, parameters, context, feedback):
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        feat_id_field = self.parameterAsString(parameters, self.FEATURE_ID_FIELD, context)
+        references = self.parameterAsSource(parameters, self.REFERENCES, context)
+        ref_id_field = self.parameterAsString(parameters, self.REFERENCE_ID_FIELD, context)
+        tie_mode = self.parameterAsEnum(parameters, self.TIE_MODE, context)
+        k = self.parameterAsInt(parameters, self.K, context)
+        max_distance = self.parameterAsDouble(parameters, self.MAX_DISTANCE, context)
+        if tie_mode == 2 and max_distance <= 0:
+            raise QgsProcessingException(self.tr('The maximum hard-tie length must be greater than 0'))
+
+        # Read the features and reference points in the features' crs (the units of the
+        # maximum distance), with only the id fields
+        crs = source.sourceCrs()
+        feedback.pushInfo(self.tr(f'Reading features in {crs.authid()}...'))
+        features = self.read_points(source, feat_id_field, crs, context, feedback)
+        ref_pts = self.read_points(references, ref_id_field, crs, context, feedback)
+        if features is None or ref_pts is None:
+            return {}
+        if tie_mode == 0:
+            ref_pts = ref_pts[:1]
+        if not ref_pts:
+            raise QgsProcessingException(self.tr('There are no reference points'))
+        feedback.setProgress(10)
+
+        # Pair each feature with its reference point(s)
+        feat_points = [p for p, _ in features]
+        ref_points = [p for p, _ in ref_pts]
+        if tie_mode == 0:
+            feat_idx = np.arange(len(features))
+            ref_idx = np.zeros(len(features), dtype=int)
+        else:
+            feat_idx, ref_idx = nearest_reference_pairs(feat_points, ref_points, k if tie_mode == 1 else None, max_distance)
+        feedback.pushInfo(self.tr(f'Calculating {len(feat_idx)} hard-ties from {len(ref_points)} reference point(s)'))
+        if feedback.isCanceled():
+            return {}
+        feedback.setProgress(30)
+
+        # Calculate the distances and bearings of all hard-ties in one pass
+        geometry_context = GeometryContext(transform_context=context.transformContext())
+        feat_x = np.array([p.x() for p in feat_points], dtype=float)
+        feat_y = np.array([p.y() for p in feat_points], dtype=float)
+        ref_x = np.array([p.x() for p in ref_points], dtype=float)
+        ref_y = np.array([p.y() for p in ref_points], dtype=float)
+        distances, bearings = hard_tie_inverse(ref_x[ref_idx], ref_y[ref_idx], feat_x[feat_idx], feat_y[feat_idx],
+                                               crs, geometry_context)
+        feedback.setProgress(40)
+
+        # Write the hard-ties
+        fields = QgsFields()
+        fields.append(QgsField('To', QVariant.String, len=100))
+        fields.append(QgsField('From', QVariant.String, len=100))
+        fields.append(QgsField('Desc', QVariant.String, len=200))
+        sink, dest_id = self.parameterAsSink(parameters, self.OUTPUT, context, fields, QgsWkbTypes.LineString, crs)
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+
+        total = 60.0/len(feat_idx) if len(feat_idx) else 0
+        for current, (i, j, distance, bearing) in enumerate(zip(feat_idx.tolist(), ref_idx.tolist(), distances, bearings)):
+            if feedback.isCanceled():
+                break
+            ref_point, ref_name = ref_pts[j]
+            feat_point, feat_name = features[i]
+            feature = QgsFeature(fields)
+            feature.setGeometry(QgsGeometry.fromPolylineXY([ref_point, feat_point]))
+            feature.setAttributes([feat_name, ref_name, hard_tie_description(distance, bearing, ref_name)])
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+            feedback.setProgress(40 + int(current*total))
+
+        feedback.pushInfo(geometry_context.cache_info())
+        return {self.OUTPUT: dest_id}
@@ -0,0 +1,125 @@
+"""
+Functions used by calculate_hard_ties.py to read layers in another crs.
+
+-  `layer_request` builds a QgsFeatureRequest that fetches only the fields
+   that are needed and, if an output crs is given, transforms the geometries
+   on the fly, so a layer can be used in another crs without making a copy.
+-  `reproject_layer` streams the features of a layer through such a request,
+   transforms them in chunks and writes each chunk to a sink (feature_sink.py),
+   so the reprojected copy is never held in memory twice.
+"""
+from qgis.core import (
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFields,
+    QgsGeometry,
+    QgsPointXY,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+import time
+
+from batch_transform import transform_xy
+from feature_sink import BufferedFeatureSink, FileFeatureSink
+from geometry_context import GeometryContext
+
+def layer_request(layer, field_names=None, out_crs=None, transform_context=None, with_geometry=True):
+    """
+    Returns a QgsFeatureRequest for `layer` that fetches only the fields in
+    `field_names` (all fields if None, no attributes if empty) and no geometry
+    unless `with_geometry` is True. If `out_crs` is given, the geometries are
+    transformed to it on the fly using `transform_context`.
+    """
+    request = QgsFeatureRequest()
+    if field_names is not None:
+        if field_names:
+            request.setSubsetOfAttributes(list(field_names), layer.fields())
+        else:
+            request.setNoAttributes()
+    if not with_geometry:
+        request.setFlags(request.flags() | QgsFeatureRequest.NoGeometry)
+    elif out_crs is not None and out_crs != layer.crs():
+        request.setDestinationCrs(out_crs, transform_context)
+    return request
+
+def subset_fields(fields, field_names=None):
+    """Returns a copy of `fields` that only contains the fields in `field_names` (all if None)"""
+    if field_names is None:
+        return QgsFields(fields)
+    subset = QgsFields()
+    for name in field_names:
+        subset.append(fields.field(name))
+    return subset
+
+def _transform_chunk(features, transform, single_points):
+    """
+    Transforms the geometries of a chunk of features in place. Single-point
+    geometries are transformed together in one call; other geometries one at
+    a time.
+    """
+    if single_points:
+        points = [f.geometry().asPoint() for f in features if f.hasGeometry()]
+        xs, ys = transform_xy([p.x() for p in points], [p.y() for p in points], transform)
+        coords = iter(zip(xs, ys))
+        for f in features:
+            if f.hasGeometry():
+                x, y = next(coords)
+                f.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+    else:
+        for f in features:
+            if f.hasGeometry():
+                geom = f.geometry()
+                geom.transform(transform)
+                f.setGeometry(geom)
+
+def reproject_layer(layer, out_crs, proj_inst, add_to_iface=False, geometry_context=None, field_names=None,
+                    output_path=None, chunk_size=1000):
+    """
+    Returns a copy of `layer` reprojected into `out_crs`
+    If `add_to_iface` is True, also loads the reprojected layer into the active
+    interface
+
+    Only the fields in `field_names` are copied (all fields if None). The copy
+    is a memory layer, or a GeoPackage/Shapefile if `output_path` is given.
+    Features are transformed and written `chunk_size` at a time.
+    """
+    # Initialize transformation
+    geometry_context = geometry_context or GeometryContext(proj_inst)
+    t = geometry_context.transform(layer.crs(), out_crs)
+
+    # Initialize output layer
+    fields = subset_fields(layer.fields(), field_names)
+    geomtype = QgsWkbTypes.displayString(layer.wkbType())
+    name = layer.name()+'_reprojected'
+    if output_path:
+        sink = FileFeatureSink(output_path, fields, layer.wkbType(), out_crs, geometry_context.transform_context,
+                               name, chunk_size=chunk_size, project=proj_inst, add_to_project=add_to_iface)
+    else:
+        layer_rpj = QgsVectorLayer(geomtype+'?crs='+out_crs.authid(), name, 'memory')
+        layer_rpj.dataProvider().addAttributes(fields)
+        layer_rpj.updateFields()
+        sink = BufferedFeatureSink(layer_rpj, chunk_size, project=proj_inst, add_to_project=add_to_iface)
+
+    # Stream the features through the transformation, one chunk at a time
+    start = time.perf_counter()
+    single_points = layer.wkbType() == QgsWkbTypes.Point     #2D points are transformed in one call per chunk
+    names = fields.names()
+    chunk = []
+    for f in layer.getFeatures(layer_request(layer, field_names)):
+        out_feat = QgsFeature(fields, f.id())
+        out_feat.setAttributes([f[name] for name in names])
+        if f.hasGeometry():
+            out_feat.setGeometry(f.geometry())
+        chunk.append(out_feat)
+        if len(chunk) >= chunk_size:
+            _transform_chunk(chunk, t, single_points)
+            sink.add_features(chunk)
+            chunk = []
+    _transform_chunk(chunk, t, single_points)
+    sink.add_features(chunk)
+    layer_rpj = sink.close()
+
+    elapsed = time.perf_counter() - start
+    rate = sink.count/elapsed if elapsed > 0 else float('inf')
+    print(f"Reprojected {sink.count} features of '{layer.name()}' in {elapsed:.2f} s ({rate:.0f} features/s)")
+    return layer_rpj
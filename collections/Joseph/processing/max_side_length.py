@@ -1,18 +1,29 @@
 from qgis.core import *
 from qgis.gui import *
+import os
+import sys
 
-@qgsfunction(args='auto', group='Custom')
-def max_side_length(feature, parent):
+# Make the helper modules polygon_metrics.py, expression_cache.py and
+# oriented_rectangles.py (saved next to this file) importable
+try:
+    expressions_dir = os.path.dirname(os.path.abspath(__file__))
+except NameError:   #__file__ is not defined when the script is run from the function editor
+    expressions_dir = os.path.join(QgsApplication.qgisSettingsDirPath(), 'python', 'expressions')
+if expressions_dir not in sys.path:
+    sys.path.append(expressions_dir)
+
+from expression_cache import EXPRESSION_CACHE
+from polygon_metrics import feature_metric
+
+# Watch the project's layers (this runs on the main thread, when the function is registered)
+EXPRESSION_CACHE.track_project(QgsProject.instance())
+
+@qgsfunction(args='auto', group='Custom', usesgeometry=True)
+def max_side_length(feature, parent, context):
     """
     Calculates the length of the longest side of a polygon (feature must be a polygon)
-    """
-    geom = feature.geometry().asMultiPolygon()
-    points = geom[0][0]    #list of Qgspoint objects
-    lengths = []        #list for the side lengths
     
-    for i in range(len(points[:-1])):   #end the loop 1 point before the end
-        p1 = points[i]
-        p2 = points[i+1]
-        
-        lengths.append(p1.distance(p2))
-    return max(lengths)
\ No newline at end of file
+    The side lengths of all features of the layer are calculated at once on
+    the first call and reused until a feature's geometry changes.
+    """
+    return feature_metric(feature, 'max_side_length', context)
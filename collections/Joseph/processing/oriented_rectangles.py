@@ -0,0 +1,357 @@
+"""
+Minimum-area oriented rectangles and corner classification for arrays of
+polygon rings, shared by the grid subdivision (grid_subdivision.py,
+create-small-grid.py) and the polygon metrics (polygon_metrics.py,
+top_left_rotation.py).
+
+Rings are given as flat x and y arrays with the index of the first vertex and
+the number of vertices of each ring (without the closing vertex).
+
+-  convex_hulls: the convex hull of each ring, counter-clockwise and without
+   collinear vertices. Rings that are already convex (e.g. grid cells, even
+   with extra collinear vertices) are handled with array operations; other
+   rings use a monotone chain, O(n log n) per ring.
+-  minimum_area_rectangles: the smallest rectangle around each ring, found
+   with rotating calipers on the hull. The edge directions of a convex ring
+   increase monotonically, so the extreme vertices of all hull edges of all
+   rings are found with one binary search (np.searchsorted).
+-  rectangle_corners: the vertices of each ring closest to the corners of its
+   rectangle, labelled as follows in the frame of the rectangle whose sides
+   are closest to the x and y axes:
+
+       B ---- C
+       |      |
+       A ---- D
+
+ring_corners does the same for a single ring in plain python, for callers
+that handle one feature at a time (array operations cost more than they save
+on a handful of vertices).
+"""
+import math
+
+import numpy as np
+
+RECTANGLE_FIELDS = ('center_x', 'center_y', 'width', 'height', 'angle', 'area', 'ux', 'uy')
+
+def ring_ids(counts):
+    """Returns the index of the ring of every vertex"""
+    return np.repeat(np.arange(len(counts)), counts)
+
+def next_vertices(starts, counts):
+    """Returns the index of the next vertex around the ring for every vertex"""
+    nxt = np.arange(counts.sum()) + 1
+    closed = counts > 0
+    nxt[(starts + counts - 1)[closed]] = starts[closed]
+    return nxt
+
+def previous_vertices(starts, counts):
+    """Returns the index of the previous vertex around the ring for every vertex"""
+    prv = np.arange(counts.sum()) - 1
+    closed = counts > 0
+    prv[starts[closed]] = (starts + counts - 1)[closed]
+    return prv
+
+def _keep(index, rings, keep, n_rings):
+    """Returns the kept vertex indices with the starts and counts of their rings"""
+    index = index[keep]
+    counts = np.bincount(rings[keep], minlength=n_rings)
+    return index, np.cumsum(counts) - counts, counts
+
+def _monotone_chain(x, y):
+    """Returns the indices of the convex hull of points given as lists of x and y (see convex_hull)"""
+    order = sorted(range(len(x)), key=lambda i: (x[i], y[i]))
+    if len(order) < 3:
+        return order
+
+    def cross(o, a, b):
+        return (x[a] - x[o])*(y[b] - y[o]) - (y[a] - y[o])*(x[b] - x[o])
+
+    lower = []
+    for i in order:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], i) <= 0:
+            lower.pop()
+        lower.append(i)
+    upper = []
+    for i in reversed(order):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], i) <= 0:
+            upper.pop()
+        upper.append(i)
+    return lower[:-1] + upper[:-1]
+
+def convex_hull(x, y):
+    """
+    Returns the indices of the convex hull vertices of one set of points,
+    counter-clockwise from the lowest x (then y) vertex and without collinear
+    vertices (monotone chain)
+    """
+    return np.array(_monotone_chain(np.asarray(x).tolist(), np.asarray(y).tolist()), dtype=int)
+
+def convex_hulls(xs, ys, starts, counts):
+    """
+    Returns the convex hull of each ring as indices into xs and ys, with the
+    starts and counts of the hulls. Hulls are counter-clockwise, without
+    duplicate or collinear vertices; degenerate rings have fewer than 3.
+    """
+    n_rings = len(counts)
+    rings = ring_ids(counts)
+    index = np.arange(len(xs))
+
+    # Remove repeated vertices, then collinear vertices
+    nxt = next_vertices(starts, counts)
+    repeated = (xs[nxt] == xs) & (ys[nxt] == ys) & (nxt != index)
+    index, starts1, counts1 = _keep(index, rings, ~repeated, n_rings)
+    rings1 = ring_ids(counts1)
+    x1 = xs[index]
+    y1 = ys[index]
+    nxt = next_vertices(starts1, counts1)
+    prv = previous_vertices(starts1, counts1)
+    cross = (x1 - x1[prv])*(y1[nxt] - y1) - (y1 - y1[prv])*(x1[nxt] - x1)
+    index, starts2, counts2 = _keep(index, rings1, cross != 0, n_rings)
+    cross = cross[cross != 0]
+    rings2 = ring_ids(counts2)
+
+    # A ring is convex if it turns the same way at every vertex and only once
+    # around (a pentagram turns the same way at every vertex, but twice)
+    x2 = xs[index]
+    y2 = ys[index]
+    nxt = next_vertices(starts2, counts2)
+    heading = np.arctan2(y2[nxt] - y2, x2[nxt] - x2)
+    turn = (heading - heading[previous_vertices(starts2, counts2)] + np.pi) % (2*np.pi) - np.pi
+    total_turn = np.bincount(rings2, weights=turn, minlength=n_rings)
+    positive = np.bincount(rings2, weights=cross > 0, minlength=n_rings)
+    ccw = (positive == counts2) & np.isclose(total_turn, 2*np.pi)
+    cw = (positive == 0) & np.isclose(total_turn, -2*np.pi)
+    convex = (ccw | cw) & (counts2 >= 3)
+
+    # Reverse clockwise rings
+    position = np.arange(len(index)) - starts2[rings2]
+    reverse = cw[rings2]
+    position[reverse] = (counts2[rings2] - 1 - position)[reverse]
+    fast = np.empty_like(index)
+    fast[starts2[rings2] + position] = index
+
+    # Hulls of the other rings (concave or degenerate)
+    hull_parts = [fast[convex[rings2]]]
+    hull_rings = [rings2[convex[rings2]]]
+    for r in np.flatnonzero(~convex & (counts >= 3)).tolist():
+        ring = np.arange(starts[r], starts[r] + counts[r])
+        hull = ring[convex_hull(xs[ring], ys[ring])]
+        hull_parts.append(hull)
+        hull_rings.append(np.full(len(hull), r))
+
+    hull_index = np.concatenate(hull_parts)
+    hull_ring_ids = np.concatenate(hull_rings)
+    order = np.argsort(hull_ring_ids, kind='stable')
+    hull_counts = np.bincount(hull_ring_ids, minlength=n_rings)
+    return hull_index[order], np.cumsum(hull_counts) - hull_counts, hull_counts
+
+def minimum_area_rectangles(xs, ys, starts, counts):
+    """
+    Returns a dictionary of arrays with the minimum-area oriented rectangle of
+    each ring: center x and y, width (along the rectangle's first axis),
+    height, angle (direction of the first axis, degrees counter-clockwise from
+    the x axis, 0 to 180), area and the first axis as a unit vector (ux, uy).
+    The first axis is parallel to a side of the ring's convex hull. Values are
+    NaN for degenerate rings (fewer than 3 vertices that are not collinear).
+    """
+    n_rings = len(counts)
+    result = {name: np.full(n_rings, np.nan) for name in RECTANGLE_FIELDS}
+    hull, h_starts, h_counts = convex_hulls(xs, ys, starts, counts)
+    valid = h_counts >= 3
+    if not valid.any():
+        return result
+
+    # Keep the hulls of valid rings only
+    h_rings = ring_ids(h_counts)
+    keep = valid[h_rings]
+    hull, h_starts, h_counts = _keep(hull, h_rings, keep, n_rings)
+    h_rings = ring_ids(h_counts)
+    hx = xs[hull]
+    hy = ys[hull]
+
+    # Direction of each hull edge, unwrapped so that it increases around each hull
+    nxt = next_vertices(h_starts, h_counts)
+    dx = hx[nxt] - hx
+    dy = hy[nxt] - hy
+    length = np.sqrt(dx*dx + dy*dy)
+    ux = dx/length
+    uy = dy/length
+    theta = np.arctan2(dy, dx)
+    step = (theta - theta[previous_vertices(h_starts, h_counts)]) % (2*np.pi)
+    step[h_starts[valid]] = 0
+    first = theta[h_starts[h_rings]]
+    cumulative = np.cumsum(step)
+    theta = first + cumulative - cumulative[h_starts[h_rings]]
+
+    # Search keys: the edge directions of each hull twice around (+2 pi), offset
+    # by ring so that one sorted array covers all hulls
+    span = 8*np.pi
+    d_counts = 2*h_counts
+    d_starts = np.cumsum(d_counts) - d_counts
+    d_rings = ring_ids(d_counts)
+    d_pos = np.arange(d_counts.sum()) - d_starts[d_rings]
+    d_local = d_pos % h_counts[d_rings]
+    keys = d_rings*span + theta[h_starts[d_rings] + d_local] + 2*np.pi*(d_pos >= h_counts[d_rings])
+
+    def extreme_vertices(offset):
+        """Index of the hull vertex furthest in the direction of each edge rotated by offset - 90 degrees"""
+        p = np.searchsorted(keys, h_rings*span + theta + offset, side='left')
+        p = np.minimum(p - d_starts[h_rings], d_counts[h_rings] - 1)
+        return h_starts[h_rings] + p % h_counts[h_rings]
+
+    max_along = extreme_vertices(np.pi/2)
+    max_across = extreme_vertices(np.pi)
+    min_along = extreme_vertices(3*np.pi/2)
+
+    # Extents of the rectangle on each edge (the hull lies left of its edges)
+    def along(i):
+        return (hx[i] - hx)*ux + (hy[i] - hy)*uy
+    a_min = along(min_along)
+    a_max = along(max_along)
+    c_max = -(hx[max_across] - hx)*uy + (hy[max_across] - hy)*ux
+    area = (a_max - a_min)*c_max
+
+    # Smallest rectangle of each ring (of equal ones, the one whose side points
+    # furthest along the x axis, then the y axis)
+    best = np.lexsort((-uy, -ux, area, h_rings))[h_starts[valid]]
+    c_along = (a_min[best] + a_max[best])/2
+    c_across = c_max[best]/2
+    result['center_x'][valid] = hx[best] + c_along*ux[best] - c_across*uy[best]
+    result['center_y'][valid] = hy[best] + c_along*uy[best] + c_across*ux[best]
+    result['width'][valid] = a_max[best] - a_min[best]
+    result['height'][valid] = c_max[best]
+    result['angle'][valid] = np.mod(np.degrees(theta[best]), 180.0)
+    result['area'][valid] = area[best]
+    result['ux'][valid] = ux[best]
+    result['uy'][valid] = uy[best]
+    return result
+
+def _is_frame_axis(x, y):
+    """True for unit vectors between -45 (exclusive) and 45 degrees (inclusive) from the x axis"""
+    return (x > abs(y)) | ((x == y) & (y > 0))
+
+def rectangle_corners(xs, ys, starts, counts, rectangles=None):
+    """
+    Returns the indices of the A, B, C and D vertices of each ring (see
+    above), shaped (rings, 4), or -1 for rings without vertices.
+
+    The rectangle's axis closest to the x axis (within 45 degrees) becomes the
+    x axis of the ring's frame. The ring's vertices are scaled to the unit
+    square in that frame, and A, B, C and D are the vertices furthest towards
+    the bottom-left, top-left, top-right and bottom-right corners. Degenerate
+    rings use the x and y axes.
+    """
+    if rectangles is None:
+        rectangles = minimum_area_rectangles(xs, ys, starts, counts)
+    n_rings = len(counts)
+    corners = np.full((n_rings, 4), -1, dtype=int)
+    has_vertices = counts > 0
+    if not has_vertices.any():
+        return corners
+
+    # Frame of each ring: the rectangle's axis (u, v, -u or -v) between -45
+    # (exclusive) and 45 degrees (inclusive) from the x axis
+    ux = np.nan_to_num(rectangles['ux'], nan=1.0)
+    uy = np.nan_to_num(rectangles['uy'], nan=0.0)
+    candidates = [(ux, uy), (-uy, ux), (-ux, -uy), (uy, -ux)]
+    ex = np.select([_is_frame_axis(cx, cy) for cx, cy in candidates], [cx for cx, _ in candidates])
+    ey = np.select([_is_frame_axis(cx, cy) for cx, cy in candidates], [cy for _, cy in candidates])
+
+    # Vertex coordinates in the frame, scaled to the unit square
+    rings = ring_ids(counts)
+    s = xs*ex[rings] + ys*ey[rings]
+    t = -xs*ey[rings] + ys*ex[rings]
+    v_starts = starts[has_vertices]
+    s_min = np.minimum.reduceat(s, v_starts)[np.cumsum(has_vertices) - 1][rings]
+    s_max = np.maximum.reduceat(s, v_starts)[np.cumsum(has_vertices) - 1][rings]
+    t_min = np.minimum.reduceat(t, v_starts)[np.cumsum(has_vertices) - 1][rings]
+    t_max = np.maximum.reduceat(t, v_starts)[np.cumsum(has_vertices) - 1][rings]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.nan_to_num((s - s_min)/(s_max - s_min))
+        t = np.nan_to_num((t - t_min)/(t_max - t_min))
+
+    # The first vertex with the highest score in each ring
+    for c, score in enumerate((-(s + t), t - s, s + t, s - t)):
+        corners[has_vertices, c] = np.lexsort((-score, rings))[v_starts]
+    return corners
+
+def quad_corners(polygons):
+    """
+    Returns the A, B, C and D corners (see above) of a stack of polygons with
+    the same number of vertices, shaped (features, vertices, 2), as an array
+    shaped (features, 4, 2)
+    """
+    polygons = np.asarray(polygons, dtype=float)
+    if polygons.ndim != 3 or polygons.shape[2] != 2:
+        raise ValueError(f"polygons must be shaped (features, vertices, 2), not {polygons.shape}")
+    n, m = polygons.shape[:2]
+    counts = np.full(n, m)
+    starts = np.arange(n)*m
+    xs = polygons[:, :, 0].ravel()
+    ys = polygons[:, :, 1].ravel()
+    corners = rectangle_corners(xs, ys, starts, counts)
+    return np.stack([xs[corners], ys[corners]], axis=2)
+
+def ring_corners(points):
+    """
+    Returns the indices of the A, B, C and D vertices (see above) of one ring,
+    given as a list of [x, y] points, like rectangle_corners
+    """
+    if len(points) == 0:
+        return [-1, -1, -1, -1]
+    x = [float(p[0]) for p in points]
+    y = [float(p[1]) for p in points]
+
+    # Direction of the side of the minimum-area rectangle, with rotating
+    # calipers: the vertices furthest along, against and across each hull edge
+    # only move forward around the hull, so each one is advanced from where it
+    # was for the previous edge (O(h) for h hull vertices)
+    hull = _monotone_chain(x, y)
+    h = len(hull)
+    best = (math.inf, 0.0, 0.0)     #area, -ux, -uy (ties are broken as in minimum_area_rectangles)
+    if h >= 3:
+        hx = [x[v] for v in hull]
+        hy = [y[v] for v in hull]
+        for i in range(h):
+            dx = hx[(i + 1) % h] - hx[i]
+            dy = hy[(i + 1) % h] - hy[i]
+            length = math.sqrt(dx*dx + dy*dy)
+            ux = dx/length
+            uy = dy/length
+
+            def along(v):
+                return (hx[v] - hx[i])*ux + (hy[v] - hy[i])*uy
+
+            def across(v):
+                return -(hx[v] - hx[i])*uy + (hy[v] - hy[i])*ux     #the hull lies left of its edges
+
+            if i == 0:
+                a_max = max(range(h), key=along)
+                a_min = min(range(h), key=along)
+                c_max = max(range(h), key=across)
+            while along((a_max + 1) % h) >= along(a_max) and (a_max + 1) % h != i:
+                a_max = (a_max + 1) % h
+            while along((a_min + 1) % h) <= along(a_min) and a_min != i:
+                a_min = (a_min + 1) % h
+            while across((c_max + 1) % h) >= across(c_max) and (c_max + 1) % h != i:
+                c_max = (c_max + 1) % h
+            best = min(best, ((along(a_max) - along(a_min))*across(c_max), -ux, -uy))
+    ux, uy = (-best[1], -best[2]) if h >= 3 else (1.0, 0.0)
+
+    # Frame (see rectangle_corners)
+    ex, ey = next((cx, cy) for cx, cy in [(ux, uy), (-uy, ux), (-ux, -uy), (uy, -ux)] if _is_frame_axis(cx, cy))
+
+    # Vertex coordinates in the frame, scaled to the unit square
+    s = [xi*ex + yi*ey for xi, yi in zip(x, y)]
+    t = [-xi*ey + yi*ex for xi, yi in zip(x, y)]
+    s_min, s_range = min(s), max(s) - min(s)
+    t_min, t_range = min(t), max(t) - min(t)
+    s = [(si - s_min)/s_range if s_range else 0.0 for si in s]
+    t = [(ti - t_min)/t_range if t_range else 0.0 for ti in t]
+
+    # The first vertex with the highest score
+    vertices = range(len(points))
+    return [max(vertices, key=lambda v: -(s[v] + t[v])),
+            max(vertices, key=lambda v: t[v] - s[v]),
+            max(vertices, key=lambda v: s[v] + t[v]),
+            max(vertices, key=lambda v: s[v] - t[v])]
@@ -0,0 +1,174 @@
+"""
+Polygon metrics used by the expression functions max_side_length.py and
+top_left_rotation.py, calculated for whole layers at once.
+
+The exterior ring of each polygon (the first part of a multipolygon, without
+the closing vertex) is read into flat x and y arrays, with the index of the
+first vertex and the number of vertices of each ring, and the metrics of all
+rings are then calculated with array operations:
+
+-  side_lengths / max_side_lengths: the lengths of all sides of each ring
+-  top_left_rotations: the angle of the top side (B to C) of each ring, as in
+   top_left_rotation.py
+-  oriented_boxes: the minimum-area oriented bounding box of each ring
+
+The corners and bounding boxes come from oriented_rectangles.py, which is
+shared with the grid subdivision.
+
+feature_metrics calculates the metrics of a layer the first time one of its
+features is looked up and keeps them in the expression cache
+(expression_cache.py), so the expression functions only recalculate features
+whose geometry has changed. The layer is read through the feature source the
+cache keeps of it, and only one thread loads each layer.
+"""
+import numpy as np
+
+from expression_cache import EXPRESSION_CACHE, context_layer_id
+from oriented_rectangles import minimum_area_rectangles, next_vertices, rectangle_corners
+
+METRICS = ('max_side_length', 'top_left_rotation', 'obb_center_x', 'obb_center_y',
+           'obb_width', 'obb_height', 'obb_angle', 'obb_area')
+
+def exterior_ring_xy(geometry):
+    """
+    Returns the x and y coordinates of the exterior ring of a polygon geometry
+    (the first part of a multipolygon) without the closing vertex, as two lists
+    """
+    from qgis.core import QgsLineString, QgsWkbTypes
+    if geometry is None or geometry.isNull() or geometry.isEmpty():
+        return [], []
+    polygon = geometry.constGet()
+    if QgsWkbTypes.isMultiType(polygon.wkbType()):
+        polygon = polygon.geometryN(0)
+    if QgsWkbTypes.geometryType(polygon.wkbType()) != QgsWkbTypes.PolygonGeometry or polygon.exteriorRing() is None:
+        return [], []
+
+    ring = polygon.exteriorRing()
+    if not isinstance(ring, QgsLineString):
+        ring = ring.curveToLine()
+    xs = ring.xVector()
+    ys = ring.yVector()
+    if len(xs) > 1 and xs[0] == xs[-1] and ys[0] == ys[-1]:
+        xs = xs[:-1]
+        ys = ys[:-1]
+    return xs, ys
+
+def ring_arrays(geometries):
+    """
+    Returns the exterior ring vertices of an iterable of polygon geometries as
+    flat x and y arrays, with the index of the first vertex and the number of
+    vertices of each ring
+    """
+    xs = []
+    ys = []
+    counts = []
+    for geometry in geometries:
+        ring_x, ring_y = exterior_ring_xy(geometry)
+        xs.extend(ring_x)
+        ys.extend(ring_y)
+        counts.append(len(ring_x))
+    counts = np.array(counts, dtype=int)
+    starts = np.cumsum(counts) - counts
+    return np.array(xs, dtype=float), np.array(ys, dtype=float), starts, counts
+
+def side_lengths(xs, ys, starts, counts):
+    """Returns the length of the side from each vertex to the next vertex of its ring"""
+    nxt = next_vertices(starts, counts)
+    return np.hypot(xs[nxt] - xs, ys[nxt] - ys)
+
+def max_side_lengths(xs, ys, starts, counts):
+    """Returns the length of the longest side of each ring (NaN for rings with fewer than 2 vertices)"""
+    result = np.full(len(counts), np.nan)
+    valid = counts >= 2
+    if valid.any():
+        lengths = side_lengths(xs, ys, starts, counts)
+        result[valid] = np.maximum.reduceat(lengths, starts[valid])
+    return result
+
+def top_left_rotations(xs, ys, starts, counts):
+    """
+    Returns the angle (degrees, counter-clockwise negative) of the line from the
+    top-left (B) to the top-right (C) corner of each ring, with the corners
+    classified by oriented_rectangles.rectangle_corners. NaN for rings with
+    fewer than 3 vertices.
+    """
+    result = np.full(len(counts), np.nan)
+    valid = counts >= 3
+    if not valid.any():
+        return result
+
+    corners = rectangle_corners(xs, ys, starts, counts)[valid]
+    top_left = corners[:, 1]
+    top_right = corners[:, 2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (ys[top_right] - ys[top_left])/(xs[top_right] - xs[top_left])
+    result[valid] = np.degrees(-np.arctan(slope))
+    return result
+
+def oriented_boxes(xs, ys, starts, counts):
+    """
+    Returns the center x and y, width, height, angle and area of the
+    minimum-area oriented bounding box of each ring (rotating calipers, see
+    oriented_rectangles.py). The width is measured along the hull side the box
+    is aligned with and the angle (degrees, 0 to 180) is the direction of that
+    side, counter-clockwise from the x axis.
+    """
+    rectangles = minimum_area_rectangles(xs, ys, starts, counts)
+    return {name: rectangles[name] for name in ('center_x', 'center_y', 'width', 'height', 'angle', 'area')}
+
+def polygon_metrics(geometries):
+    """
+    Returns a dictionary of arrays with the metrics (see METRICS) of an
+    iterable of polygon geometries
+    """
+    xs, ys, starts, counts = ring_arrays(geometries)
+    metrics = {
+        'max_side_length': max_side_lengths(xs, ys, starts, counts),
+        'top_left_rotation': top_left_rotations(xs, ys, starts, counts),
+    }
+    for name, values in oriented_boxes(xs, ys, starts, counts).items():
+        metrics['obb_'+name] = values
+    return metrics
+
+def _load_layer(layer_id, source, cache):
+    """
+    Calculates the metrics of all features of a layer in one pass, reading
+    them from `source` (a QgsVectorLayerFeatureSource, which may be used in
+    any thread), and stores them in `cache`
+    """
+    from qgis.core import QgsFeatureRequest
+    request = QgsFeatureRequest().setNoAttributes()
+    features = list(source.getFeatures(request))
+    metrics = polygon_metrics([f.geometry() for f in features])
+    for i, f in enumerate(features):
+        cache.put(cache.key(layer_id, f, 'polygon_metrics'), {name: metrics[name][i] for name in METRICS})
+
+def feature_metrics(feature, context=None, cache=EXPRESSION_CACHE):
+    """
+    Returns the metrics of a feature as a dictionary. The layer is taken from
+    the expression context (its 'layer_id' variable). The first lookup for a
+    layer watched by the cache (see ExpressionCache.track_project) calculates
+    all of its features at once; afterwards only new or changed features are
+    calculated. Features of other layers, or without a layer, are calculated
+    on their own.
+    """
+    layer_id = context_layer_id(context)
+    if layer_id is None or not cache.watching(layer_id):
+        return {name: values[0] for name, values in polygon_metrics([feature.geometry()]).items()}
+
+    key = cache.key(layer_id, feature, 'polygon_metrics')
+    metrics = cache.get(key)
+    if metrics is None:
+        source = cache.claim_bulk_load(layer_id, 'polygon_metrics')
+        if source is not None:
+            _load_layer(layer_id, source, cache)
+            metrics = cache.peek(key)
+    if metrics is None:
+        metrics = {name: values[0] for name, values in polygon_metrics([feature.geometry()]).items()}
+        cache.put(key, metrics)
+    return metrics
+
+def feature_metric(feature, name, context=None):
+    """Returns one metric of a feature (see feature_metrics) for an expression function"""
+    value = feature_metrics(feature, context)[name]
+    return None if np.isnan(value) else float(value)
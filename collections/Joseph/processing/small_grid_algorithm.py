@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Processing algorithm version of create-small-grid.py. The corners of all
+parent cells are found at once and the cells are subdivided in chunks, in a
+pool of worker processes (grid_subdivision.subdivide_parallel).
+
+The helper modules grid_subdivision.py and oriented_rectangles.py must be in
+the same folder as this script.
+"""
+import os
+import sys
+
+import numpy as np
+
+from qgis.PyQt.QtCore import QCoreApplication, QVariant
+from qgis.core import (
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFeatureSink,
+    QgsField,
+    QgsGeometry,
+    QgsPointXY,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingMultiStepFeedback,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterField,
+    QgsProcessingParameterNumber,
+    QgsWkbTypes,
+)
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from grid_subdivision import ring_quads, subdivide_parallel
+
+
+class SmallGridAlgorithm(QgsProcessingAlgorithm):
+    """
+    Subdivides each parent grid cell into an n by n grid of small cells
+    """
+    INPUT = 'INPUT'
+    GRID_ID_FIELD = 'GRID_ID_FIELD'
+    SIDES = 'SIDES'
+    WORKERS = 'WORKERS'
+    CHUNK_SIZE = 'CHUNK_SIZE'
+    OUTPUT = 'OUTPUT'
+
+    def tr(self, string):
+        return QCoreApplication.translate('Processing', string)
+
+    def createInstance(self):
+        return SmallGridAlgorithm()
+
+    def name(self):
+        return 'smallgrid'
+
+    def displayName(self):
+        return self.tr('Small grid')
+
+    def group(self):
+        return self.tr('Archaeology')
+
+    def groupId(self):
+        return 'archaeology'
+
+    def shortHelpString(self):
+        return self.tr("Creates an n by n grid of equal small cells inside each parent grid cell. "
+                       "Parent cells may be rotated and may have extra vertices along their sides. "
+                       "The output has the fields of the parent grid; the GridID of each small cell is "
+                       "<parent GridID>.<number> and its id is the number (1 to n*n, row by row).")
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.INPUT, self.tr('Parent grid'), [QgsProcessing.TypeVectorPolygon]))
+        self.addParameter(QgsProcessingParameterField(
+            self.GRID_ID_FIELD, self.tr('Grid ID field'), 'GridID', self.INPUT))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.SIDES, self.tr('Cells per side (n)'), QgsProcessingParameterNumber.Integer, 4, minValue=1))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.WORKERS, self.tr('Worker processes (0 = all cpus, 1 = no workers)'),
+            QgsProcessingParameterNumber.Integer, 0, minValue=0))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.CHUNK_SIZE, self.tr('Parent cells per worker task'),
+            QgsProcessingParameterNumber.Integer, 500, minValue=1))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.OUTPUT, self.tr('Small grid'), QgsProcessing.TypeVectorPolygon))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        grid_id_field = self.parameterAsString(parameters, self.GRID_ID_FIELD, context)
+        sides = self.parameterAsInt(parameters, self.SIDES, context)
+        workers = self.parameterAsInt(parameters, self.WORKERS, context) or None
+        chunk_size = self.parameterAsInt(parameters, self.CHUNK_SIZE, context)
+        steps = QgsProcessingMultiStepFeedback(2, feedback)
+
+        # Read the vertices of each parent cell (without the closing vertex)
+        names = []
+        xs = []
+        ys = []
+        counts = []
+        total = 100.0/source.featureCount() if source.featureCount() else 0
+        for current, feature in enumerate(source.getFeatures(QgsFeatureRequest())):
+            if feedback.isCanceled():
+                return {}
+            geom = feature.geometry()
+            if geom.isNull() or geom.isEmpty():
+                continue
+            rings = geom.asMultiPolygon()[0] if geom.isMultipart() else geom.asPolygon()
+            ring = rings[0][:-1]
+            if len(ring) < 4:
+                feedback.reportError(self.tr(f"Skipping {feature[grid_id_field]}: a grid cell must have at least 4 vertices"))
+                continue
+            names.append(str(feature[grid_id_field]))
+            xs.extend(point.x() for point in ring)
+            ys.extend(point.y() for point in ring)
+            counts.append(len(ring))
+            steps.setProgress(int(current*total))
+
+        if not names:
+            raise QgsProcessingException(self.tr('There are no grid cells to subdivide'))
+
+        # Find the A, B, C and D corners of all parent cells at once
+        counts = np.array(counts, dtype=int)
+        quads = ring_quads(np.array(xs, dtype=float), np.array(ys, dtype=float), np.cumsum(counts) - counts, counts)
+
+        # Output fields: the parent's fields, with GridID and id added if it lacks them
+        fields = source.fields()
+        if fields.indexFromName(grid_id_field) == -1:
+            fields.append(QgsField(grid_id_field, QVariant.String))
+        if fields.indexFromName('id') == -1:
+            fields.append(QgsField('id', QVariant.Int))
+        grid_id_index = fields.indexFromName(grid_id_field)
+        id_index = fields.indexFromName('id')
+        sink, dest_id = self.parameterAsSink(parameters, self.OUTPUT, context, fields,
+                                             QgsWkbTypes.Polygon, source.sourceCrs())
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+
+        # Subdivide the parent cells in chunks (in worker processes) and write
+        # the small cells of each chunk as it arrives, in input order
+        steps.setCurrentStep(1)
+        feedback.pushInfo(self.tr(f'Subdividing {len(names)} grid cells into {sides} x {sides} cells...'))
+        for grid_ids, rect_nums, rings in subdivide_parallel(names, quads, sides, workers=workers,
+                                                             chunk_size=chunk_size, feedback=steps):
+            features = []
+            for grid_id, rect_num, ring in zip(grid_ids, rect_nums, rings.tolist()):
+                values = [None]*fields.count()
+                values[grid_id_index] = grid_id
+                values[id_index] = rect_num
+                feature = QgsFeature(fields)
+                feature.setGeometry(QgsGeometry.fromPolygonXY([[QgsPointXY(x, y) for x, y in ring]]))
+                feature.setAttributes(values)
+                features.append(feature)
+            sink.addFeatures(features, QgsFeatureSink.FastInsert)
+
+        if feedback.isCanceled():
+            return {}
+        return {self.OUTPUT: dest_id}
@@ -8,43 +8,24 @@ This is a script that sorts a list of grid cell values of the form <row>.<col>.<
 to make the list easier for humans to read. The sorted list is ordered first by 
 ascending <row>, then by ascending <col>, and finally by ascending <num>. All
 grid cell values are separated by semi-colons.
+
+Cell ids are parsed by grid_cell_codec.py (via grid_cell_locations.py), which must be in
+the same folder as this script. Rows may be any letters (A ... Z, AA, ...) and columns
+any Roman numerals.
 """
 import csv
-from collections import namedtuple
-
-def cell_order(cell):
-    """Returns a tuple that will be used to sort cells. Note that leftmost elements in a tuple are 
-    considered more important in comparisons
-    
-    Ref: https://stackoverflow.com/questions/16865372/how-to-do-hierarchical-sorting-in-python"""
-    return (cell.row, all_cols.index(cell.col), int(cell.num))
+import os
+import sys
 
-def sort_locations(locations, delim_in, delim_out):
-    """Takes a string that is list of grid cell ids and returns a string listing the same cell ids
-    but with a newly defined delimiter and sorted according to cell_order()"""
-    # Create structure with namedtuple (makes sorting easier)
-    Cell = namedtuple('Cell', ['row', 'col', 'num'])
-    loc_cells_unsorted = [Cell(c.split('.')[0], c.split('.')[1], c.split('.')[2]) for c in locations.split(delim_in)] #list comprehension
-    
-    # Sort the structured list in ascending order first according to row, then col, and finally num
-    loc_cells_sorted = sorted(loc_cells_unsorted, key=cell_order)
-    
-    # Create loc_sorted
-    loc_sorted = ''
-    for c in loc_cells_sorted:
-        #determine current end character for loc_sorted
-        if loc_cells_sorted.index(c) == (len(loc_cells_sorted)-1):
-            endchar = ''
-        else:
-            endchar = delim_out
-        loc_sorted = loc_sorted + (c.row + '.' + c.col + '.' + c.num) + endchar
-    
-    return loc_sorted
+# Make the helper modules next to this script importable
+try:
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+except NameError:   #__file__ is not defined when the script is run from the python console
+    scripts_dir = os.getcwd()
+if scripts_dir not in sys.path:
+    sys.path.append(scripts_dir)
 
-# Grid Row and Col information
-all_rows = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M', 'N', 'O', 'P', 'Q']
-all_cols = ['I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII', 'IX', 'X', 'XI', 'XII', 'XIII', 'XIV', 'XV',
-        'XVI', 'XVII', 'XVIII', 'XIX', 'XX']
+from grid_cell_locations import sort_locations
 
 # Columns of interest in the data
 cola = 1 #unique FeatureIDs
@@ -1,45 +1,32 @@
 from qgis.core import *
 from qgis.gui import *
-import math
+import os
+import sys
 
-@qgsfunction(args='auto', group='Custom')
-def top_left_rotation(feature, parent):
+# Make the helper modules polygon_metrics.py, expression_cache.py and
+# oriented_rectangles.py (saved next to this file) importable
+try:
+    expressions_dir = os.path.dirname(os.path.abspath(__file__))
+except NameError:   #__file__ is not defined when the script is run from the function editor
+    expressions_dir = os.path.join(QgsApplication.qgisSettingsDirPath(), 'python', 'expressions')
+if expressions_dir not in sys.path:
+    sys.path.append(expressions_dir)
+
+from expression_cache import EXPRESSION_CACHE
+from polygon_metrics import feature_metric
+
+# Watch the project's layers (this runs on the main thread, when the function is registered)
+EXPRESSION_CACHE.track_project(QgsProject.instance())
+
+@qgsfunction(args='auto', group='Custom', usesgeometry=True)
+def top_left_rotation(feature, parent, context):
     """
     Calculates the angle of the top-left line of a rectangular polygon
-    """
-    def extent_point_in_position(horz, vert, feature):
-        """
-        Returns the point whose coordinates correspond to the given vertical and horizontal descriptions
-        """
-        # Convert geometry into a list of points in simple [x,y] form
-        geom = feature.geometry().asPolygon()
-        extents = [[point.x(),point.y()] for point in geom[0]]   #unwrap the QgsPoint objects (unclear why geom is several nested lists)
-        
-        # Sort points into ascending order of x values
-        extents.sort(key=lambda point: point[0])     #on lambda keyword, see https://dbader.org/blog/python-min-max-and-nested-lists#fn:2
-        
-        if horz == "left":
-            left_points = [extents[0], extents[1]]         #the two points with the lowest x values
-            left_points.sort(key=lambda point: point[1])   #order points by ascending y values
-            
-            if vert == "bottom":
-                return left_points[0]
-            elif vert == "top":
-                return left_points[1]
-            
-        elif horz == "right":
-            right_points = [extents[-2], extents[-1]]         #the two points with the highest x values
-            right_points.sort(key=lambda point: point[1])     #order points by ascending y values
-            
-            if vert == "bottom":
-                return right_points[0]
-            elif vert == "top":
-                return right_points[1]
-    
-    # Get top left and right points
-    p1 = extent_point_in_position("left", "top", feature)
-    p2 = extent_point_in_position("right", "top", feature)
     
-    # Find angle
-    angle = (-1) * math.atan((p2[1] - p1[1]) / (p2[0] - p1[0]))
-    return math.degrees(angle)
\ No newline at end of file
+    The angle is measured from the top-left to the top-right corner, found in
+    the frame of the polygon's minimum-area rectangle, so rotated polygons and
+    polygons with extra vertices along their sides are handled. The angles of
+    all features of the layer are calculated at once on the first call and
+    reused until a feature's geometry changes.
+    """
+    return feature_metric(feature, 'top_left_rotation', context)
@@ -0,0 +1,446 @@
+"""
+Functions used by calculate_utm_coordinates.py and utm_coordinates_algorithm.py
+to find UTM zones and to calculate UTM coordinate strings for whole layers at
+once.
+
+The batch engine (`compute_utm_coordinates`) groups the features of a layer by
+UTM zone, transforms the coordinates of each zone in a single pass, and
+`write_utm_coordinates` then writes the whole output column with one call to
+the data provider.
+
+`refresh_utm_coordinates` is the incremental version: a fingerprint of each
+feature's point (and of the settings) is stored in a second field
+(<output field>FP, e.g. UTMCoordFP), and only the features whose fingerprint no
+longer matches, i.e. new and moved features, are transformed and written.
+Deleted features take their fingerprint with them, so they need no update.
+A full update (`update_utm_coordinates`) rewrites the fingerprints too if the
+layer has the field, so a fingerprint always matches the value next to it.
+"""
+from qgis.core import QgsCoordinateReferenceSystem     #the other QGIS classes are imported where they are used, so the module also loads with the qgis.core stand-in of the tests
+from collections import namedtuple
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import struct
+import time
+import numpy as np
+
+from batch_transform import point_coordinates, transform_xy
+from geometry_context import GeometryContext, crs_key
+from utm_zones import ZONES, UtmZoneError, latlong_to_utmzone, latlong_to_utmzone_array
+
+def find_latlong(output, feature, layer, project_instance, geometry_context=None):
+    """
+    Takes an input point geometry and returns a copy of it transformed to EPSG
+    4326 as latitude and longitude coordinates
+    Ref: https://gis.stackexchange.com/questions/349585/reprojecting-qgspointxy
+    Ref: https://gis.stackexchange.com/questions/215550/getting-parent-layer-of-feature-in-qgis-pyqgis-custom-function
+    Ref: https://github.com/qgis/QGIS/issues/41695
+
+    Pass the same `geometry_context` (a GeometryContext) to every call to reuse
+    the transformation instead of building a new one for each feature.
+    """
+    # Convert geometry into a point
+    geom = feature.geometry()
+
+    # Initialize crs and transformation instances
+    source_crs = layer.sourceCrs()
+    dest_crs = QgsCoordinateReferenceSystem(4326)
+    geometry_context = geometry_context or GeometryContext(project_instance)
+    tr = geometry_context.transform(source_crs, dest_crs)
+
+    # clone geometry and transform it
+    from qgis.core import QgsGeometry
+    geom2 = QgsGeometry(geom)
+    geom2.transform(tr)
+    latlong = geom2.asPoint()
+
+    # Return latitude and longitude as coordinates
+    if output=='return_string':
+        return str(latlong[0])+', '+str(latlong[1])
+    elif output=='return_list':
+        return [latlong[0], latlong[1]]
+    elif output=='return_point':
+        return latlong
+    else:
+        return 0
+
+# Datum names accepted by UtmCrsResolver, mapped to the datum as it is written
+# in the descriptions of the QGIS srs database ('<datum> / UTM zone <zone><hemi>')
+DATUM_FAMILIES = {
+    'CSRS': 'NAD83(CSRS)',
+    'NAD83(CSRS)': 'NAD83(CSRS)',
+    'NAD83': 'NAD83',
+    'WGS84': 'WGS 84',
+    'WGS 84': 'WGS 84',
+}
+
+def band_to_hemisphere(band):
+    """
+    Returns 'N' or 'S' for the given UTM latitude band
+    """
+    if band > 'M':
+        return 'N'
+    else:
+        return 'S'
+
+class UtmCrsResolver:
+    """
+    Looks up the crs of a UTM zone for a given datum.
+
+    The UTM rows of the QGIS srs database are read once, the first time a zone
+    is looked up, into an in-memory index keyed by (zone, hemisphere, datum).
+    If `cache_path` is given, the index is also saved to that file (JSON) so
+    that later runs can skip the database entirely. The cache is rebuilt
+    automatically when the srs database changes (e.g. after a QGIS upgrade).
+    """
+    description_pattern = re.compile(r"^(?P<datum>.+?) / UTM zone (?P<zone>\d{1,2})(?P<hemi>[NS])$")
+
+    def __init__(self, datum='NAD83(CSRS)', cache_path=None, db_path=None):
+        self.datum = DATUM_FAMILIES.get(datum, datum)
+        self.cache_path = cache_path
+        if db_path is None:
+            from qgis.core import QgsApplication
+            db_path = QgsApplication.srsDatabaseFilePath()
+        self.db_path = db_path
+        self._index = None      #(zone, hemi, datum) -> list of authids, filled by load()
+        self._crs = {}          #authid -> QgsCoordinateReferenceSystem
+
+    def _db_signature(self):
+        """Returns values that change whenever the srs database is replaced"""
+        stat = os.stat(self.db_path)
+        return [self.db_path, stat.st_size, int(stat.st_mtime)]
+
+    def _read_cache(self):
+        """Returns the index stored in the cache file, or None if it is missing or stale"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, encoding='utf-8') as infile:
+                cache = json.load(infile)
+        except (OSError, ValueError):
+            return None
+        if cache.get('db_signature') != self._db_signature():
+            return None
+        return cache['rows']
+
+    def _write_cache(self, rows):
+        """Saves the index rows to the cache file"""
+        cache = {'db_signature': self._db_signature(), 'rows': rows}
+        with open(self.cache_path, encoding='utf-8', mode='w') as outfile:
+            json.dump(cache, outfile)
+
+    def _read_database(self):
+        """Returns [datum, zone, hemi, authid] for every non-deprecated UTM crs in the srs database"""
+        con = sqlite3.connect(self.db_path)
+        try:
+            cur = con.cursor()
+            cur.execute("select description, auth_name, auth_id from vw_srs where description like '% / UTM zone %' and deprecated is 0")
+            db_rows = cur.fetchall()
+        finally:
+            con.close()
+
+        rows = []
+        for description, auth_name, auth_id in db_rows:
+            match = self.description_pattern.match(description)
+            if match:
+                rows.append([match['datum'], int(match['zone']), match['hemi'], f"{auth_name}:{auth_id}"])
+        return rows
+
+    def load(self):
+        """
+        Builds the in-memory index from the cache file or, if there is no valid
+        cache, from the srs database. Called automatically on first lookup.
+        """
+        rows = self._read_cache()
+        if rows is None:
+            rows = self._read_database()
+            if self.cache_path:
+                self._write_cache(rows)
+
+        self._index = {}
+        for datum, zone, hemi, authid in rows:
+            self._index.setdefault((zone, hemi, datum), []).append(authid)
+
+    def lookup(self, zone, hemi, datum=None):
+        """
+        Returns the authids (e.g. 'EPSG:2955') of all crs that match the given
+        zone number, hemisphere ('N' or 'S') and datum (defaults to the datum of
+        the resolver)
+        """
+        if self._index is None:
+            self.load()
+        datum = DATUM_FAMILIES.get(datum, datum) if datum else self.datum
+        return self._index.get((int(zone), hemi, datum), [])
+
+    def crs_for_utmzone(self, utmzone, datum=None):
+        """
+        Returns the crs for a [zone, band] pair as returned by
+        latlong_to_utmzone (the first match is used if there are several).
+        The zone may be given as a number or as a zero-padded string.
+        """
+        zone, band = utmzone
+        hemi = band_to_hemisphere(band)
+        authids = self.lookup(zone, hemi, datum)
+        if not authids:
+            raise LookupError(f"No {datum or self.datum} UTM crs found for zone {zone}{hemi}")
+
+        authid = authids[0]     #just use the first result
+        if authid not in self._crs:
+            self._crs[authid] = QgsCoordinateReferenceSystem(authid)
+        return self._crs[authid]
+
+def report(message, feedback=None):
+    """Prints a message, or pushes it to `feedback` (a QgsProcessingFeedback) if one is given"""
+    if feedback is not None:
+        feedback.pushInfo(message)
+    else:
+        print(message)
+
+def compute_utm_coordinates(layer, project_instance, p=1, resolver=None, geometry_context=None, feedback=None,
+                            points=None):
+    """
+    Returns a dictionary that maps the id of each point feature in `layer` to its
+    UTM coordinates, formatted as `<zone><band> <easting> E <northing> N` with
+    `p` decimal places. UTM crs are looked up through `resolver` (a
+    UtmCrsResolver; a new NAD83(CSRS) resolver is used if none is given) and
+    transforms through `geometry_context` (a GeometryContext).
+
+    All features are transformed to latitude and longitude in one pass, grouped
+    by UTM zone, and then each zone is transformed to its UTM crs in one pass.
+
+    `layer` may be any feature source with getFeatures() and sourceCrs(), e.g.
+    the QgsProcessingFeatureSource of a processing algorithm. If `feedback` (a
+    QgsProcessingFeedback) is given, messages and progress are reported to it,
+    and None is returned if it is canceled. If `points` (the ids and the x and
+    y coordinates of some features, in the crs of `layer`) is given, only those
+    features are transformed.
+    """
+    if resolver is None:
+        resolver = UtmCrsResolver()
+    geometry_context = geometry_context or GeometryContext(project_instance)
+
+    # Read all point coordinates (attributes are not needed)
+    if points is None:
+        from qgis.core import QgsFeatureRequest
+        request = QgsFeatureRequest().setNoAttributes()
+        points = point_coordinates(layer.getFeatures(request))
+    fids, xs, ys = points
+    if not fids:
+        return {}
+    source_crs = layer.sourceCrs()
+    if feedback is not None:
+        if feedback.isCanceled():
+            return None
+        feedback.setProgress(10)
+
+    # Find the latitude and longitude of every feature
+    tr = geometry_context.transform(source_crs, QgsCoordinateReferenceSystem(4326))
+    lons, lats = transform_xy(xs, ys, tr)
+
+    # Find the UTM zone of every feature, skipping features outside the UTM grid
+    lons = np.asarray(lons)
+    lats = np.asarray(lats)
+    try:
+        zones, bands = latlong_to_utmzone_array(lons, lats)
+        indices = np.arange(len(fids))
+    except UtmZoneError as e:
+        report(f"Skipping features {[fids[i] for i in e.indices]}: outside the UTM grid", feedback)
+        indices = np.setdiff1d(np.arange(len(fids)), e.indices)
+        zones, bands = latlong_to_utmzone_array(lons[indices], lats[indices])
+
+    # Group the features by UTM zone
+    zone_groups = {}
+    for i, zone, band in zip(indices.tolist(), zones.tolist(), bands.tolist()):
+        zone_groups.setdefault((ZONES[zone-1], band), []).append(i)
+
+    # Transform each zone into its UTM crs and construct the output strings
+    #   for help with string formatting, see these resources:
+    #       https://stackoverflow.com/questions/15238120/keep-trailing-zeroes-in-python
+    #       https://stackoverflow.com/questions/45310254/fixed-digits-after-decimal-with-f-strings
+    utm_coords = {}
+    for done, (utmzone, group) in enumerate(zone_groups.items()):
+        if feedback is not None:
+            if feedback.isCanceled():
+                return None
+            feedback.setProgress(10 + 90*done/len(zone_groups))
+        dest_crs = resolver.crs_for_utmzone(utmzone)
+        tr = geometry_context.transform(source_crs, dest_crs)
+        report(f"transforming {len(group)} features to {dest_crs.authid()}", feedback)
+
+        eastings, northings = transform_xy([xs[i] for i in group], [ys[i] for i in group], tr)
+        for i, x, y in zip(group, eastings, northings):
+            utm_coords[fids[i]] = f"{utmzone[0]}{utmzone[1]} {x:#.{p}f} E {y:#.{p}f} N"
+
+    return utm_coords
+
+def write_utm_coordinates(layer, utm_coords, output_field_name, fingerprints=None, fingerprint_field=None):
+    """
+    Writes the strings in `utm_coords` (feature id -> UTM coordinates) into the
+    field `output_field_name` of `layer` with a single provider call and commit.
+    The field is created first if the layer does not have it. If `fingerprints`
+    (feature id -> fingerprint) is given, they are written to
+    `fingerprint_field` in the same call.
+    """
+    from qgis.core import QgsField
+    from PyQt5.QtCore import QVariant
+    layer_provider = layer.dataProvider()
+
+    # Check if layer has the output fields, and if not then create them
+    layer.startEditing()
+    field_names = [output_field_name] + ([fingerprint_field] if fingerprints is not None else [])
+    missing = [QgsField(name, QVariant.String) for name in field_names if name not in layer.fields().names()]
+    if missing:
+        layer_provider.addAttributes(missing)
+        layer.updateFields()
+
+    output_field_id = layer.fields().indexFromName(output_field_name)
+
+    # Update the whole column at once
+    attr_value_dict = {fid: {output_field_id: value} for fid, value in utm_coords.items()}
+    if fingerprints is not None:
+        fingerprint_field_id = layer.fields().indexFromName(fingerprint_field)
+        for fid, fingerprint in fingerprints.items():
+            attr_value_dict.setdefault(fid, {})[fingerprint_field_id] = fingerprint
+    layer_provider.changeAttributeValues(attr_value_dict)
+    layer.commitChanges()
+
+FINGERPRINT_SUFFIX = 'FP'   #fingerprints of the output field <name> are stored in the field <name>FP
+
+# Result of changed_points: the ids, coordinates and new fingerprints of the
+# new and moved features, how many features are new, moved and unchanged, and
+# the ids of the features without a geometry that still have a fingerprint
+PointChanges = namedtuple('PointChanges', ['fids', 'xs', 'ys', 'fingerprints', 'new', 'moved', 'unchanged', 'cleared'])
+
+def fingerprint_settings(source_crs, p, datum):
+    """Returns the settings that the UTM coordinates depend on, as a string that is part of each fingerprint"""
+    return f"{crs_key(source_crs)}|{p}|{DATUM_FAMILIES.get(datum, datum)}"
+
+def geometry_fingerprint(x, y, settings=''):
+    """
+    Returns a compact fingerprint (16 hex digits) of the coordinates of a point
+    and the settings its UTM coordinates are calculated with
+    """
+    return hashlib.blake2b(struct.pack('<dd', x, y) + settings.encode('utf-8'), digest_size=8).hexdigest()
+
+def changed_points(layer, fingerprint_field, settings, recompute_all=False):
+    """
+    Compares the point of every feature in `layer` with the fingerprint stored
+    in its `fingerprint_field` (every feature is new if there is no such field)
+    and returns the changes as a PointChanges (see above). A feature counts as
+    moved if its fingerprint was made with other `settings`. With
+    `recompute_all`, unchanged features are returned as well (and counted as
+    unchanged).
+    """
+    from qgis.core import QgsFeatureRequest
+    field_id = layer.fields().indexFromName(fingerprint_field)
+    request = QgsFeatureRequest()
+    if field_id == -1:
+        request.setNoAttributes()
+    else:
+        request.setSubsetOfAttributes([field_id])
+
+    fids = []
+    xs = []
+    ys = []
+    fingerprints = []
+    cleared = []
+    new = moved = unchanged = 0
+    for f in layer.getFeatures(request):
+        stored = f.attribute(field_id) if field_id != -1 else None
+        geom = f.geometry()
+        if geom.isNull() or geom.isEmpty():
+            if stored:
+                cleared.append(f.id())
+            continue
+
+        point = geom.asPoint()
+        fingerprint = geometry_fingerprint(point.x(), point.y(), settings)
+        if fingerprint == stored:
+            unchanged += 1
+            if not recompute_all:
+                continue
+        elif stored:
+            moved += 1
+        else:
+            new += 1
+        fids.append(f.id())
+        xs.append(point.x())
+        ys.append(point.y())
+        fingerprints.append(fingerprint)
+
+    return PointChanges(fids, xs, ys, fingerprints, new, moved, unchanged, cleared)
+
+def compute_changed_utm_coordinates(layer, project_instance, fingerprint_field, p=1, resolver=None,
+                                    geometry_context=None, feedback=None, recompute_all=False):
+    """
+    Returns the UTM coordinates (feature id -> string, see
+    compute_utm_coordinates) and the fingerprints (feature id -> fingerprint)
+    of the features of `layer` that are new or have moved since their
+    fingerprint was written to `fingerprint_field` (of every feature with
+    `recompute_all`). Features without a geometry that still have a
+    fingerprint get None for both, and so do features outside the UTM grid for
+    their UTM coordinates. Returns None if `feedback` is canceled.
+    """
+    if resolver is None:
+        resolver = UtmCrsResolver()
+    settings = fingerprint_settings(layer.sourceCrs(), p, resolver.datum)
+    changes = changed_points(layer, fingerprint_field, settings, recompute_all)
+    report(f"{changes.new} new, {changes.moved} moved and {changes.unchanged} unchanged features, "
+           f"{len(changes.cleared)} features without a geometry to clear", feedback)
+
+    utm_coords = compute_utm_coordinates(layer, project_instance, p, resolver, geometry_context, feedback,
+                                         points=(changes.fids, changes.xs, changes.ys))
+    if utm_coords is None:
+        return None
+    fingerprints = dict(zip(changes.fids, changes.fingerprints))
+    for fid in changes.fids:
+        utm_coords.setdefault(fid, None)
+    for fid in changes.cleared:
+        utm_coords[fid] = None
+        fingerprints[fid] = None
+    return utm_coords, fingerprints
+
+def update_utm_coordinates(layer, project_instance, output_field_name='UTMCoord', p=1, resolver=None,
+                           geometry_context=None):
+    """
+    Calculates and writes UTM coordinates for every feature in `layer` and
+    prints the throughput of the run. If the layer has fingerprints from
+    refresh_utm_coordinates, they are rewritten as well. Returns the number of
+    updated features.
+    """
+    start = time.perf_counter()
+    fingerprint_field = output_field_name + FINGERPRINT_SUFFIX
+    if fingerprint_field in layer.fields().names():
+        utm_coords, fingerprints = compute_changed_utm_coordinates(layer, project_instance, fingerprint_field, p,
+                                                                   resolver, geometry_context, recompute_all=True)
+    else:
+        utm_coords = compute_utm_coordinates(layer, project_instance, p, resolver, geometry_context)
+        fingerprints = None
+    write_utm_coordinates(layer, utm_coords, output_field_name, fingerprints, fingerprint_field)
+    elapsed = time.perf_counter() - start
+
+    rate = len(utm_coords)/elapsed if elapsed > 0 else float('inf')
+    print(f"Updated {len(utm_coords)} features in {elapsed:.2f} s ({rate:.0f} features/s)")
+    return len(utm_coords)
+
+def refresh_utm_coordinates(layer, project_instance, output_field_name='UTMCoord', p=1, resolver=None,
+                            geometry_context=None):
+    """
+    Calculates and writes UTM coordinates only for the features of `layer` that
+    are new or have moved since the last refresh (see the module docstring) and
+    prints the throughput of the run. Returns the number of updated features.
+    """
+    start = time.perf_counter()
+    fingerprint_field = output_field_name + FINGERPRINT_SUFFIX
+    utm_coords, fingerprints = compute_changed_utm_coordinates(layer, project_instance, fingerprint_field, p,
+                                                               resolver, geometry_context)
+    if utm_coords:
+        write_utm_coordinates(layer, utm_coords, output_field_name, fingerprints, fingerprint_field)
+    elapsed = time.perf_counter() - start
+
+    rate = len(utm_coords)/elapsed if elapsed > 0 else float('inf')
+    print(f"Updated {len(utm_coords)} features in {elapsed:.2f} s ({rate:.0f} features/s)")
+    return len(utm_coords)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Processing algorithm version of calculate_utm_coordinates.py. The UTM
+coordinates are calculated from the feature source, and the UTM field of the
+input layer is written in postProcessAlgorithm, on the main thread.
+
+With 'Only update new and moved features', a fingerprint of each feature's
+point is stored in a second field (<output field>FP) and only the features
+whose fingerprint has changed are calculated and written (see
+utm_coordinates.refresh_utm_coordinates). Without it, the fingerprints are
+rewritten along with every feature if the layer has the field.
+
+The helper modules utm_coordinates.py, utm_zones.py, batch_transform.py and
+geometry_context.py must be in the same folder as this script.
+"""
+import os
+import sys
+
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.core import (
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingOutputNumber,
+    QgsProcessingOutputVectorLayer,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterString,
+    QgsProcessingParameterVectorLayer,
+)
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from geometry_context import GeometryContext
+from utm_coordinates import (
+    FINGERPRINT_SUFFIX,
+    UtmCrsResolver,
+    compute_changed_utm_coordinates,
+    compute_utm_coordinates,
+    write_utm_coordinates,
+)
+
+
+class UtmCoordinatesAlgorithm(QgsProcessingAlgorithm):
+    """
+    Writes the UTM coordinates of each point feature to a field of the input
+    layer
+    """
+    INPUT = 'INPUT'
+    OUTPUT_FIELD = 'OUTPUT_FIELD'
+    DECIMALS = 'DECIMALS'
+    DATUM = 'DATUM'
+    INCREMENTAL = 'INCREMENTAL'
+    OUTPUT = 'OUTPUT'
+    UPDATED = 'UPDATED'
+
+    DATUMS = ['NAD83(CSRS)', 'NAD83', 'WGS 84']
+
+    def tr(self, string):
+        return QCoreApplication.translate('Processing', string)
+
+    def createInstance(self):
+        return UtmCoordinatesAlgorithm()
+
+    def name(self):
+        return 'utmcoordinates'
+
+    def displayName(self):
+        return self.tr('UTM coordinates')
+
+    def group(self):
+        return self.tr('Archaeology')
+
+    def groupId(self):
+        return 'archaeology'
+
+    def shortHelpString(self):
+        return self.tr("Writes the UTM coordinates of each point feature, formatted as "
+                       "'<zone><band> <easting> E <northing> N', to a field of the input layer. "
+                       "The UTM zone of each feature is found from its latitude and longitude.")
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterVectorLayer(
+            self.INPUT, self.tr('Point layer'), [QgsProcessing.TypeVectorPoint]))
+        self.addParameter(QgsProcessingParameterString(
+            self.OUTPUT_FIELD, self.tr('Output field name'), 'UTMCoord'))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.DECIMALS, self.tr('Decimal places'), QgsProcessingParameterNumber.Integer, 1, minValue=0))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.DATUM, self.tr('Datum of the UTM coordinate systems'), self.DATUMS, defaultValue=0))
+        self.addParameter(QgsProcessingParameterBoolean(
+            self.INCREMENTAL, self.tr('Only update new and moved features'), False))
+        self.addOutput(QgsProcessingOutputVectorLayer(self.OUTPUT, self.tr('Updated layer')))
+        self.addOutput(QgsProcessingOutputNumber(self.UPDATED, self.tr('Number of updated features')))
+
+    def prepareAlgorithm(self, parameters, context, feedback):
+        # Runs on the main thread: keep the layer for postProcessAlgorithm
+        self._layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        if self._layer is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT))
+        self._output_field = self.parameterAsString(parameters, self.OUTPUT_FIELD, context)
+        self._fingerprint_field = self._output_field + FINGERPRINT_SUFFIX
+        self._utm_coords = None
+        self._fingerprints = None
+        return True
+
+    def processAlgorithm(self, parameters, context, feedback):
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        p = self.parameterAsInt(parameters, self.DECIMALS, context)
+        datum = self.DATUMS[self.parameterAsEnum(parameters, self.DATUM, context)]
+        incremental = self.parameterAsBoolean(parameters, self.INCREMENTAL, context)
+
+        resolver = UtmCrsResolver(datum)
+        geometry_context = GeometryContext(transform_context=context.transformContext())
+        if incremental or self._fingerprint_field in source.fields().names():
+            result = compute_changed_utm_coordinates(source, context.project(), self._fingerprint_field, p, resolver,
+                                                     geometry_context, feedback, recompute_all=not incremental)
+            if result is None:
+                return {}
+            self._utm_coords, self._fingerprints = result
+        else:
+            self._utm_coords = compute_utm_coordinates(source, context.project(), p, resolver, geometry_context, feedback)
+            if self._utm_coords is None:
+                return {}
+        feedback.pushInfo(geometry_context.cache_info())
+        return {self.OUTPUT: self._layer.id(), self.UPDATED: len(self._utm_coords)}
+
+    def postProcessAlgorithm(self, context, feedback):
+        # Runs on the main thread after processAlgorithm has finished
+        if self._utm_coords is None or feedback.isCanceled():
+            return {}
+        if self._utm_coords:
+            write_utm_coordinates(self._layer, self._utm_coords, self._output_field, self._fingerprints,
+                                  self._fingerprint_field)
+        return {self.OUTPUT: self._layer.id(), self.UPDATED: len(self._utm_coords)}
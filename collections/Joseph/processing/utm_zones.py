@@ -0,0 +1,95 @@
+"""
+Pure-math functions that find the UTM zone and latitude band of geographic
+coordinates, either one point at a time (`latlong_to_utmzone`) or for whole
+arrays of longitudes and latitudes at once (`latlong_to_utmzone_array`).
+
+Both functions apply the exceptions to the regular 6 degree zones: zone 32V is
+widened over south-western Norway, and band X is split into zones 31, 33, 35
+and 37 around Svalbard.
+Ref: https://en.wikipedia.org/wiki/Universal_Transverse_Mercator_coordinate_system#Exceptions
+
+Neither function depends on QGIS, so they can be used (and benchmarked)
+outside of the QGIS python console.
+"""
+import numpy as np
+
+ZONES = [str(item).zfill(2) for item in range(1,61)]
+BANDS = ["C","D","E","F","G","H","J","K","L","M","N","P","Q","R","S","T","U","V","W","X"]
+BAND_LETTERS = np.array(BANDS)
+
+# Svalbard zones in band X: (western edge, eastern edge, zone)
+SVALBARD_ZONES = [(0, 9, 31), (9, 21, 33), (21, 33, 35), (33, 42, 37)]
+
+class UtmZoneError(ValueError):
+    """
+    Raised when coordinates fall outside the UTM grid (longitude -180 to 180,
+    latitude -80 to 84). `indices` holds the positions of the offending points
+    when the error is raised for an array of points.
+    """
+    def __init__(self, message, indices=None):
+        super().__init__(message)
+        self.indices = indices
+
+def latlong_to_utmzone(point):
+    """Point x and y must be in degrees
+    negative indicates W and S
+    positive indicates E and N
+
+    Returns [zone, band], where zone is a zero-padded string (e.g. '09')"""
+    lon = point.x()
+    lat = point.y()
+
+    # Check that x and y are accepted
+    if not -180 <= lon <= 180:
+        raise UtmZoneError(f"x {lon} out of range -180 to 180!")
+    if not -80 <= lat <= 84:
+        raise UtmZoneError(f"y {lat} out of range -80 to 84!")
+
+    # Determine Zone and Band (band X is 12 degrees instead of 8 and lon 180 is
+    # the eastern edge of zone 60, so both indices are clamped)
+    zone_number = min(int((lon + 180)/6), 59) + 1     #always rounds down
+    band = BANDS[min(int((lat + 80)/8), 19)]
+
+    # Apply the Norway and Svalbard exceptions
+    if band == "V" and 3 <= lon < 12:
+        zone_number = 32
+    elif band == "X":
+        for west, east, zone in SVALBARD_ZONES:
+            if west <= lon < east:
+                zone_number = zone
+                break
+
+    return [ZONES[zone_number-1], band]
+
+def latlong_to_utmzone_array(lons, lats):
+    """
+    Vectorized version of latlong_to_utmzone for arrays of longitudes and
+    latitudes (in degrees).
+
+    Returns an integer array of zone numbers and an array of band letters.
+    Raises UtmZoneError (with the indices of the offending points) if any
+    point is outside the UTM grid or is not a number.
+    """
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+
+    # Check that x and y are accepted (comparisons with nan are False)
+    valid = (lons >= -180) & (lons <= 180) & (lats >= -80) & (lats <= 84)
+    if not valid.all():
+        indices = np.flatnonzero(~valid)
+        raise UtmZoneError(f"{len(indices)} points out of range (x -180 to 180, y -80 to 84), first at index {indices[0]}!", indices)
+
+    # Determine Zones and Bands (all values are non-negative, so truncating
+    # with astype rounds down)
+    zones = np.minimum(((lons + 180)/6).astype(np.int64), 59) + 1
+    band_indices = np.minimum(((lats + 80)/8).astype(np.int64), 19)
+
+    # Apply the Norway and Svalbard exceptions
+    zones[(band_indices == 17) & (lons >= 3) & (lons < 12)] = 32
+    band_x = np.flatnonzero(band_indices == 19)
+    if len(band_x):
+        band_x_lons = lons[band_x]
+        for west, east, zone in SVALBARD_ZONES:
+            zones[band_x[(band_x_lons >= west) & (band_x_lons < east)]] = zone
+
+    return zones, BAND_LETTERS[band_indices]
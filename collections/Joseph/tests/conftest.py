@@ -0,0 +1,14 @@
+"""
+Runs the tests of the processing helpers without QGIS: if QGIS is not
+installed, the qgis.core stand-in of the benchmarks (qgis_stand_in.py) is
+used instead.
+"""
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', 'benchmarks'))
+sys.path.append(os.path.join(HERE, '..', 'processing'))
+
+from qgis_stand_in import install
+install()
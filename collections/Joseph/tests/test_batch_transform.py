@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from qgis.core import QgsCoordinateReferenceSystem, QgsCoordinateTransform
+from batch_transform import transform_xy
+
+WGS84 = QgsCoordinateReferenceSystem('EPSG:4326')
+UTM10N = QgsCoordinateReferenceSystem('EPSG:32610')
+
+def test_transform_xy():
+    #the origin of zone 10N is on its central meridian (123 W) at the equator
+    eastings, northings = transform_xy([-123, -123], [0, 45], QgsCoordinateTransform(WGS84, UTM10N))
+    assert isinstance(eastings, list) and isinstance(northings, list)
+    assert eastings == pytest.approx([500000, 500000], abs=1e-6)
+    assert northings[0] == pytest.approx(0, abs=1e-6)
+    assert northings[1] == pytest.approx(4982950.4, abs=0.1)
+
+def test_transform_xy_round_trip():
+    rng = np.random.default_rng(0)
+    lons = rng.uniform(-126, -120, 100)
+    lats = rng.uniform(0, 80, 100)
+    xs, ys = transform_xy(lons, lats, QgsCoordinateTransform(WGS84, UTM10N))
+    back_lons, back_lats = transform_xy(xs, ys, QgsCoordinateTransform(UTM10N, WGS84))
+    assert back_lons == pytest.approx(lons.tolist(), abs=1e-8)
+    assert back_lats == pytest.approx(lats.tolist(), abs=1e-8)
+
+def test_transform_xy_without_points():
+    assert transform_xy([], [], QgsCoordinateTransform(WGS84, UTM10N)) == ([], [])
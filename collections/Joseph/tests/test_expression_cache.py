@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+from expression_cache import ExpressionCache, context_layer_id
+
+class Feature:
+    def __init__(self, fid):
+        self.fid = fid
+
+    def id(self):
+        return self.fid
+
+def context(layer_id):
+    """The variables of an expression context that the cache reads"""
+    variables = {} if layer_id is None else {'layer_id': layer_id}
+    return SimpleNamespace(hasVariable=variables.__contains__, variable=variables.get)
+
+def test_context_layer_id():
+    assert context_layer_id(context('L1')) == 'L1'
+    assert context_layer_id(context('')) is None
+    assert context_layer_id(context(None)) is None
+    assert context_layer_id(None) is None
+
+def test_results_are_keyed_by_feature_id():
+    cache = ExpressionCache()
+    assert cache.key('L1', Feature(7), 'max_side_length') == ('L1', 7, 'max_side_length')
+
+def test_least_recently_used_result_is_dropped():
+    cache = ExpressionCache(maxsize=2)
+    cache.put(('L1', 1, 'f'), 10)
+    cache.put(('L1', 2, 'f'), 20)
+    assert cache.get(('L1', 1, 'f')) == 10     #2 is now the least recently used
+    cache.put(('L1', 3, 'f'), 30)
+    assert cache.get(('L1', 2, 'f')) is None
+    assert cache.peek(('L1', 1, 'f')) == 10 and cache.peek(('L1', 3, 'f')) == 30
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.cache_info() == "ExpressionCache(hits=1, misses=1, hit_rate=50.0%, maxsize=2, currsize=2)"
+
+def test_invalidate_feature():
+    cache = ExpressionCache()
+    for name in ('f', 'g'):
+        cache.put(('L1', 1, name), 1)
+        cache.put(('L1', 2, name), 2)
+        cache.put(('L2', 1, name), 3)
+    cache.invalidate_feature('L1', 1)
+    assert cache.peek(('L1', 1, 'f')) is None and cache.peek(('L1', 1, 'g')) is None
+    assert cache.peek(('L1', 2, 'f')) == 2 and cache.peek(('L2', 1, 'g')) == 3
+    cache.invalidate_feature('L1', 99)      #features without results are ignored
+
+def test_clear_one_layer():
+    cache = ExpressionCache()
+    cache.put(('L1', 1, 'f'), 1)
+    cache.put(('L2', 1, 'f'), 2)
+    cache.bulk_loaded.update({('L1', 'f'), ('L2', 'f')})
+    cache.get(('L1', 1, 'f'))
+    cache.clear('L1')
+    assert cache.peek(('L1', 1, 'f')) is None and cache.peek(('L2', 1, 'f')) == 2
+    assert cache.bulk_loaded == {('L2', 'f')}
+    assert cache.hits == 1
+    cache.clear()
+    assert cache.peek(('L2', 1, 'f')) is None and not cache.bulk_loaded and cache.hits == 0
+
+def test_results_of_unwatched_layers_are_not_cached():
+    cache = ExpressionCache()
+    calls = []
+    compute = lambda feature: calls.append(feature.id()) or feature.id()*10
+    assert cache.feature_value(Feature(1), context('L1'), 'f', compute) == 10
+    assert cache.feature_value(Feature(1), context('L1'), 'f', compute) == 10
+    assert cache.feature_value(Feature(1), None, 'f', compute) == 10
+    assert calls == [1, 1, 1]
+    assert cache.claim_bulk_load('L1', 'f') is None
+    assert cache.cache_info().endswith('currsize=0)')
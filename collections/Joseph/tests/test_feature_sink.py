@@ -0,0 +1,88 @@
+import pytest
+
+from feature_sink import BufferedFeatureSink, ChunkedFeatureSink, FileFeatureSink
+
+class ListSink(ChunkedFeatureSink):
+    def __init__(self, chunk_size):
+        super().__init__(chunk_size)
+        self.chunks = []
+
+    def write_chunk(self, features):
+        self.chunks.append(list(features))
+
+class Provider:
+    def __init__(self, ok=True):
+        self.ok = ok
+        self.calls = []
+
+    def addFeatures(self, features):
+        self.calls.append(list(features))
+        return self.ok, features
+
+    def lastError(self):
+        return 'read-only'
+
+class Layer:
+    """The parts of a memory layer that BufferedFeatureSink uses"""
+    def __init__(self, provider):
+        self.provider = provider
+        self.extent_updates = 0
+
+    def id(self):
+        return 'points_1'
+
+    def name(self):
+        return 'points'
+
+    def dataProvider(self):
+        return self.provider
+
+    def updateExtents(self):
+        self.extent_updates += 1
+
+class Project:
+    def __init__(self):
+        self.layers = {}
+
+    def mapLayer(self, layer_id):
+        return self.layers.get(layer_id)
+
+    def addMapLayer(self, layer):
+        self.layers[layer.id()] = layer
+
+def test_features_are_written_in_chunks():
+    with ListSink(chunk_size=3) as sink:
+        sink.add_features(range(5))
+        sink.add_feature(5)
+        sink.add_feature(6)
+        assert sink.chunks == [[0, 1, 2], [3, 4, 5]]
+        assert sink.count == 6
+    assert sink.chunks == [[0, 1, 2], [3, 4, 5], [6]]
+    assert sink.count == 7
+
+def test_sink_is_closed_on_errors():
+    sink = ListSink(chunk_size=10)
+    with pytest.raises(KeyError):
+        with sink:
+            sink.add_features(range(4))
+            raise KeyError
+    assert sink.chunks == [[0, 1, 2, 3]]
+
+def test_buffered_sink_adds_the_layer_once():
+    project = Project()
+    layer = Layer(Provider())
+    for _ in range(2):
+        with BufferedFeatureSink(layer, chunk_size=2, project=project) as sink:
+            sink.add_features('abcde')
+    assert layer.provider.calls == [['a', 'b'], ['c', 'd'], ['e']]*2
+    assert layer.extent_updates == 2
+    assert project.layers == {'points_1': layer}
+
+def test_buffered_sink_raises_when_the_provider_fails():
+    sink = BufferedFeatureSink(Layer(Provider(ok=False)), chunk_size=1, add_to_project=False)
+    with pytest.raises(RuntimeError, match='read-only'):
+        sink.add_feature('a')
+
+def test_file_sink_rejects_unsupported_formats():
+    with pytest.raises(ValueError, match='.csv'):
+        FileFeatureSink('points.csv', None, None, None)
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from geodesic import WGS84_A, WGS84_F, geodesic_inverse
+
+def dms(degrees, minutes, seconds):
+    sign = -1 if degrees < 0 else 1
+    return sign*(abs(degrees) + minutes/60 + seconds/3600)
+
+def test_flinders_peak_to_buninyong():
+    #Vincenty reference pair on GRS80 (Geoscience Australia)
+    distance, az1, az2 = geodesic_inverse(dms(144, 25, 29.52440), dms(-37, 57, 3.72030),
+                                          dms(143, 55, 35.38390), dms(-37, 39, 10.15610),
+                                          a=6378137.0, f=1/298.257222101)
+    assert distance == pytest.approx(54972.271, abs=1e-3)
+    assert az1 == pytest.approx(dms(306, 52, 5.37), abs=0.01/3600)
+    assert az2 == pytest.approx(dms(307, 10, 25.07), abs=0.01/3600)
+
+def test_equator_and_meridian():
+    distance, az1, az2 = geodesic_inverse([0, 0], [0, 0], [1, 0], [0, 90])
+    assert distance[0] == pytest.approx(WGS84_A*np.pi/180, abs=1e-6)
+    assert distance[1] == pytest.approx(10001965.729, abs=1e-3)     #quarter meridian of WGS84
+    assert az1.tolist() == pytest.approx([90, 0])
+
+def test_coincident_points():
+    distance, az1, az2 = geodesic_inverse(10, 50, 10, 50)
+    assert distance == 0
+
+def test_pairs_are_independent():
+    #solving pairs together gives the same results (up to rounding) as solving them one at a time
+    rng = np.random.default_rng(0)
+    lon1, lat1 = rng.uniform(-180, 180, 50), rng.uniform(-80, 80, 50)
+    lon2, lat2 = lon1 + rng.uniform(-1, 1, 50), lat1 + rng.uniform(-1, 1, 50)
+    together = geodesic_inverse(lon1, lat1, lon2, lat2)
+    for i in range(50):
+        alone = geodesic_inverse(lon1[i], lat1[i], lon2[i], lat2[i])
+        assert [float(v) for v in alone] == pytest.approx([v[i] for v in together], rel=1e-12)
+
+def test_nearly_antipodal_points_raise():
+    with pytest.raises(ValueError):
+        geodesic_inverse(0, 0, 179.7, 0.5, f=WGS84_F)
@@ -0,0 +1,44 @@
+from qgis.core import QgsCoordinateReferenceSystem, QgsCoordinateTransformContext
+from geometry_context import GeometryContext
+
+WGS84 = QgsCoordinateReferenceSystem('EPSG:4326')
+UTM10N = QgsCoordinateReferenceSystem('EPSG:32610')
+UTM11N = QgsCoordinateReferenceSystem('EPSG:32611')
+
+def test_transforms_are_built_once():
+    context = GeometryContext()
+    first = context.transform(UTM10N, WGS84)
+    assert context.transform(QgsCoordinateReferenceSystem('EPSG:32610'), WGS84) is first
+    assert context.transform(WGS84, UTM10N) is not first
+    assert (context.hits, context.misses) == (1, 2)
+
+def test_equal_transform_contexts_share_objects():
+    context = GeometryContext()
+    first = context.transform(UTM10N, WGS84, QgsCoordinateTransformContext())
+    assert context.transform(UTM10N, WGS84, QgsCoordinateTransformContext()) is first
+
+def test_distance_areas_are_keyed_by_ellipsoid():
+    context = GeometryContext()
+    default = context.distance_area(UTM10N)
+    assert default.ellipsoid == UTM10N.ellipsoidAcronym()
+    assert context.distance_area(UTM10N) is default
+    assert context.distance_area(UTM10N, 'EPSG:7019') is not default
+    assert GeometryContext(ellipsoid='EPSG:7019').distance_area(UTM10N).ellipsoid == 'EPSG:7019'
+
+def test_least_recently_used_object_is_dropped():
+    context = GeometryContext(maxsize=2)
+    first = context.transform(UTM10N, WGS84)
+    context.transform(UTM11N, WGS84)
+    context.transform(UTM10N, WGS84)        #UTM11N is now the least recently used
+    context.transform(WGS84, UTM10N)
+    assert context.transform(UTM10N, WGS84) is first
+    context.transform(UTM11N, WGS84)
+    assert context.misses == 4
+    assert context.cache_info() == "GeometryContext(hits=2, misses=4, maxsize=2, currsize=2)"
+
+def test_clear():
+    context = GeometryContext()
+    first = context.transform(UTM10N, WGS84)
+    context.clear()
+    assert (context.hits, context.misses) == (0, 0)
+    assert context.transform(UTM10N, WGS84) is not first
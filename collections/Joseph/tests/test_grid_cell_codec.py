@@ -0,0 +1,50 @@
+import pytest
+
+from grid_cell_codec import Cell, cell_key, column_rank, int_to_roman, letters_to_int, parse_cell, roman_to_int, row_rank
+
+def test_roman_round_trip():
+    for number in range(1, 4000):
+        assert roman_to_int(int_to_roman(number)) == number
+
+@pytest.mark.parametrize('number, numeral', [(1, 'I'), (4, 'IV'), (14, 'XIV'), (49, 'XLIX'), (1994, 'MCMXCIV')])
+def test_int_to_roman(number, numeral):
+    assert int_to_roman(number) == numeral
+
+@pytest.mark.parametrize('numeral', ['', 'IIII', 'IC', 'VX', 'XIVI', 'xiv', 'A'])
+def test_roman_to_int_rejects_invalid_numerals(numeral):
+    with pytest.raises(ValueError):
+        roman_to_int(numeral)
+
+def test_int_to_roman_rejects_non_positive_numbers():
+    with pytest.raises(ValueError):
+        int_to_roman(0)
+
+@pytest.mark.parametrize('letters, rank', [('A', 1), ('Z', 26), ('AA', 27), ('AZ', 52), ('BA', 53), ('ZZ', 702), ('AAA', 703)])
+def test_letters_to_int(letters, rank):
+    assert letters_to_int(letters) == rank
+    assert row_rank(letters) == rank
+
+@pytest.mark.parametrize('letters', ['', 'a', 'A1', 'Ä'])
+def test_letters_to_int_rejects_invalid_rows(letters):
+    with pytest.raises(ValueError):
+        letters_to_int(letters)
+
+def test_column_rank_beyond_precomputed_columns():
+    assert column_rank('L') == 50
+    assert column_rank('LI') == 51
+    assert column_rank('CXX') == 120
+
+def test_parse_cell():
+    assert parse_cell('C.XIV.3') == Cell('C', 'XIV', '3')
+    with pytest.raises(ValueError):
+        parse_cell('C.XIV')
+
+def test_cell_key_order():
+    cells = ['AA.I.1', 'B.X.2', 'B.IX.10', 'B.IX.2', 'Z.LI.1', 'A.II.1', 'A.I.12']
+    assert sorted(cells, key=cell_key) == ['A.I.12', 'A.II.1', 'B.IX.2', 'B.IX.10', 'B.X.2', 'Z.LI.1', 'AA.I.1']
+    assert cell_key('C.XIV.3') == (3, 14, 3)
+
+@pytest.mark.parametrize('cell_id', ['C.XIV', 'C.XIV.3.1', 'C.XIIII.3', 'c.XIV.3'])
+def test_cell_key_rejects_invalid_cells(cell_id):
+    with pytest.raises(ValueError):
+        cell_key(cell_id)
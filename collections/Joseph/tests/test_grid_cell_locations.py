@@ -0,0 +1,69 @@
+from operator import itemgetter
+import random
+
+import pytest
+
+from grid_cell_locations import (compress_nums, external_sort, merge_locations, process_locations,
+                                 sort_and_shorten_locations, sort_locations)
+
+# FeatureID, GridID, Note: feature 2 crosses its first cell twice
+ROWS = [
+    ['2', 'B.I.1', 'x'],
+    ['1', 'A.II.3', 'y'],
+    ['2', 'A.I.4', 'z'],
+    ['2', 'B.I.1', 'w'],
+    ['1', 'A.I.2', 'v'],
+]
+
+@pytest.mark.parametrize('presorted', [False, True])
+def test_merge_locations(presorted):
+    rows = sorted(ROWS, key=itemgetter(0)) if presorted else ROWS
+    assert list(merge_locations(rows, 0, 1, presorted=presorted)) == [
+        ['1', 'A.II.3, A.I.2', 'y'],
+        ['2', 'B.I.1, A.I.4', 'x'],
+    ]
+
+def test_sort_locations():
+    assert sort_locations('B.I.1, A.X.2, A.IX.10, A.IX.2', ', ', '; ') == 'A.IX.2; A.IX.10; A.X.2; B.I.1'
+
+def test_compress_nums():
+    assert compress_nums(['4', '1', '2', '3', '7']) == ['1-4', '7']
+    assert compress_nums(['5', '6', '5', '9', '10', '11']) == ['5', '6', '9-11']
+    assert compress_nums([]) == []
+
+def test_sort_and_shorten_locations():
+    locations = 'B.I.3, A.II.2, B.I.1, A.II.1, B.I.2'
+    assert sort_and_shorten_locations(locations, ', ', '; ') == 'A.II.2,1; B.I.3,1,2'
+    assert sort_and_shorten_locations(locations, ', ', '; ', compress=True) == 'A.II.1,2; B.I.1-3'
+
+def test_external_sort_spills_and_stays_stable():
+    rng = random.Random(0)
+    rows = [[str(rng.randrange(50)), str(i)] for i in range(2000)]
+    expected = sorted(rows, key=itemgetter(0))
+    assert list(external_sort(rows, itemgetter(0), memory_budget=1000)) == expected     #many runs
+    assert list(external_sort(rows, itemgetter(0))) == expected                         #in memory
+
+def test_process_locations():
+    result = list(process_locations(ROWS, 0, 1, memory_budget=100))
+    assert result == [
+        (['1', 'A.II.3, A.I.2', 'y'], ['1', 'A.I.2; A.II.3', 'y'], ['1', 'A.I.2; A.II.3', 'y']),
+        (['2', 'B.I.1, A.I.4', 'x'], ['2', 'A.I.4; B.I.1', 'x'], ['2', 'A.I.4; B.I.1', 'x']),
+    ]
+
+def test_sort_and_shorten_locations_beyond_the_usual_grid():
+    locations = 'AA.LI.2, B.L.3, AA.LI.2, B.L.1, AA.I.1'
+    assert sort_and_shorten_locations(locations, ', ', '; ') == 'B.L.3,1; AA.I.1; AA.LI.2,2'
+    assert sort_and_shorten_locations(locations, ', ', '; ', compress=True) == 'B.L.1,3; AA.I.1; AA.LI.2'
+
+def test_external_sort_keeps_csv_special_characters():
+    rows = [[str(i % 7), f'note "{i}", with a comma\nand a newline', 'é'] for i in range(300)]
+    assert list(external_sort(rows, itemgetter(0), memory_budget=500)) == sorted(rows, key=itemgetter(0))
+
+def test_process_locations_presorted_or_not():
+    rng = random.Random(0)
+    rows = [[f"{rng.randrange(30):03}", f"{rng.choice('ABC')}.{rng.choice(['I', 'II', 'X'])}.{rng.randrange(1, 5)}", 'n']
+            for _ in range(500)]
+    unsorted = list(process_locations(rows, 0, 1, compress=True, memory_budget=2000))
+    presorted = list(process_locations(sorted(rows, key=itemgetter(0)), 0, 1, compress=True, presorted=True))
+    assert unsorted == presorted
+    assert [cleaned[0] for cleaned, _, _ in unsorted] == sorted({row[0] for row in rows})
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from qgis.core import QgsCoordinateReferenceSystem, QgsCoordinateTransform
+from batch_transform import transform_xy
+from geometry_context import GeometryContext
+from grid_convergence import (line_angles, numeric_true_north_bearings, proj_parameters, tm_convergence,
+                              transverse_mercator_parameters, true_north_bearings)
+
+WGS84 = QgsCoordinateReferenceSystem('EPSG:4326')
+
+def test_tm_convergence_sign():
+    gamma = tm_convergence([-123, -121, -125, -121, -121], [45, 45, 45, -45, 0], -123)
+    assert gamma[0] == 0                    #on the central meridian
+    assert gamma[1] > 0 and gamma[2] < 0    #east and west of it in the northern hemisphere
+    assert gamma[3] < 0                     #east of it in the southern hemisphere
+    assert gamma[4] == 0                    #on the equator
+    assert gamma[1] == pytest.approx(-gamma[2])
+
+def test_tm_convergence_on_the_sphere():
+    #with ep2 = 0 the leading terms agree with the spherical formula atan(tan(dlon) sin(lat))
+    gamma = tm_convergence(2, 50, 0, ep2=0)
+    assert gamma == pytest.approx(np.degrees(np.arctan(np.tan(np.radians(2))*np.sin(np.radians(50)))), abs=1e-6)
+
+def test_line_angles():
+    assert line_angles([0]*4, [0]*4, [0, 1, 0, -1], [1, 0, -1, 0]).tolist() == [0, 90, 180, 270]
+
+def test_transverse_mercator_parameters():
+    assert proj_parameters(QgsCoordinateReferenceSystem('EPSG:32610'))['zone'] == '10'
+    lon_0, ep2 = transverse_mercator_parameters(QgsCoordinateReferenceSystem('EPSG:32610'))
+    assert lon_0 == -123
+    assert ep2 == pytest.approx(0.00673949674227)
+    assert transverse_mercator_parameters(WGS84) is None
+
+@pytest.mark.parametrize('epsg', [32610, 32733])
+def test_true_north_bearings_match_numeric_method(epsg):
+    crs = QgsCoordinateReferenceSystem(f"EPSG:{epsg}")
+    rng = np.random.default_rng(0)
+    zone_lon_0 = (epsg % 100)*6 - 183
+    lons = zone_lon_0 + rng.uniform(-3, 3, 100)
+    lats = rng.uniform(1, 70, 100)*(-1 if epsg > 32700 else 1)
+    xs, ys = transform_xy(lons, lats, QgsCoordinateTransform(WGS84, crs))
+
+    context = GeometryContext()
+    analytic = true_north_bearings(xs, ys, crs, None, context)
+    numeric = numeric_true_north_bearings(xs, ys, crs, None, context)
+    difference = (analytic - numeric + 180) % 360 - 180
+    assert np.abs(difference).max() < 1e-3
+    assert np.all((analytic >= 0) & (analytic < 360))
+
+def test_true_north_bearings_without_points():
+    assert len(true_north_bearings([], [], QgsCoordinateReferenceSystem('EPSG:32610'), None)) == 0
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from grid_subdivision import (extent_point_in_position, order_corners, small_grid_point, subdivide_chunk,
+                              subdivide_parallel, subdivision_rings, subdivision_vertices)
+
+# A 10 by 5 cell rotated by 30 degrees, with its corners listed from C
+ANGLE = np.radians(30)
+ROTATION = np.array([[np.cos(ANGLE), np.sin(ANGLE)], [-np.sin(ANGLE), np.cos(ANGLE)]])
+A, B, C, D = (np.array(corner, dtype=float) @ ROTATION + [100, 200] for corner in ([0, 0], [0, 5], [10, 5], [10, 0]))
+CELL = [C.tolist(), D.tolist(), A.tolist(), B.tolist()]
+
+def test_extent_point_in_position():
+    assert extent_point_in_position(CELL, 'bottom', 'left') == A.tolist()
+    assert extent_point_in_position(CELL, 'top', 'left') == B.tolist()
+    assert extent_point_in_position(CELL, 'top', 'right') == C.tolist()
+    assert extent_point_in_position(CELL, 'bottom', 'right') == D.tolist()
+
+def test_small_grid_point():
+    assert small_grid_point(CELL, 4, 0, 0) == pytest.approx(A.tolist())
+    assert small_grid_point(CELL, 4, 4, 4) == pytest.approx(C.tolist())
+    assert small_grid_point(CELL, 4, 2, 2) == pytest.approx(((A + C)/2).tolist())
+    assert small_grid_point(CELL, 4, 1, 0) == pytest.approx((A + (B - A)/4).tolist())     #rows run from A-D to B-C
+
+def test_order_corners():
+    assert order_corners([CELL]).tolist() == [[A.tolist(), B.tolist(), C.tolist(), D.tolist()]]
+    with pytest.raises(ValueError):
+        order_corners([CELL[:3]])
+
+def test_subdivision_vertices_match_small_grid_point():
+    rng = np.random.default_rng(0)
+    quads = np.array([CELL]*20) + rng.uniform(-0.5, 0.5, (20, 4, 2))
+    vertices = subdivision_vertices(quads, 3)
+    assert vertices.shape == (20, 4, 4, 2)
+    for f in range(20):
+        for i in range(4):
+            for k in range(4):
+                assert vertices[f, i, k].tolist() == small_grid_point(quads[f].tolist(), 3, i, k)
+
+def test_subdivision_rings():
+    rings = subdivision_rings([CELL], 2)
+    assert rings.shape == (1, 4, 4, 2)
+    assert rings[0, 0] == pytest.approx(np.array([A, A + (B - A)/2, (A + C)/2, A + (D - A)/2]))     #cell 1 is at A
+    assert rings[0, 3, 2].tolist() == pytest.approx(C.tolist())                                   #cell 4 is at C
+
+def test_subdivide_chunk():
+    grid_ids, rect_nums, rings = subdivide_chunk(['A.I', 'A.II'], [CELL, CELL], 2)
+    assert grid_ids == ['A.I.1', 'A.I.2', 'A.I.3', 'A.I.4', 'A.II.1', 'A.II.2', 'A.II.3', 'A.II.4']
+    assert rect_nums == [1, 2, 3, 4, 1, 2, 3, 4]
+    assert rings.shape == (8, 4, 2)
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_subdivide_parallel_keeps_the_input_order(workers):
+    rng = np.random.default_rng(0)
+    quads = np.array([CELL]*50) + rng.uniform(0, 1000, (50, 1, 2))
+    names = [f"P{i}" for i in range(50)]
+    expected = subdivide_chunk(names, quads, 3)
+    chunks = list(subdivide_parallel(names, quads, 3, workers=workers, chunk_size=7))
+    assert len(chunks) == 8
+    assert sum((chunk[0] for chunk in chunks), []) == expected[0]
+    assert np.array_equal(np.concatenate([chunk[2] for chunk in chunks]), expected[2])
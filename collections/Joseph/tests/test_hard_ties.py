@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import qgis.core
+from qgis.core import QgsCoordinateReferenceSystem, QgsPointXY
+from geometry_context import GeometryContext
+from hard_ties import hard_tie_description, hard_tie_inverse, nearest_reference_pairs
+
+requires_qgis = pytest.mark.skipif(not hasattr(qgis.core, 'QgsSpatialIndex'),
+                                   reason="needs QGIS (the qgis.core stand-in has no spatial index)")
+
+@pytest.mark.parametrize('distance, bearing, description', [
+    (12.345, 45.04, '12.35 m @ 45.0 deg from RP1'),
+    (np.float64(3), np.float64(90), '3.0 m @ 90.0 deg from RP1'),
+    (0.004, 359.96, '0.0 m @ 0.0 deg from RP1'),       #bearings that round to 360 are written as 0
+    (1520.5, 359.94, '1520.5 m @ 359.9 deg from RP1'),
+])
+def test_hard_tie_description(distance, bearing, description):
+    assert hard_tie_description(distance, bearing, 'RP1') == description
+
+def test_hard_tie_inverse_on_the_central_meridian():
+    #100 m of grid northing on the central meridian of a UTM zone is 100/0.9996 m on the ellipsoid
+    crs = QgsCoordinateReferenceSystem('EPSG:32610')
+    ref = np.array([500000.0, 500000.0])
+    north = np.array([5000000.0, 5000100.0])
+    distances, bearings = hard_tie_inverse(ref[:1], north[:1], ref[1:], north[1:], crs, GeometryContext())
+    assert distances[0] == pytest.approx(100/0.9996, abs=1e-3)
+    assert hard_tie_description(distances[0], bearings[0], 'RP1') == '100.04 m @ 0.0 deg from RP1'
+
+def test_hard_tie_inverse_corrects_grid_convergence():
+    #east of the central meridian in the northern hemisphere, grid north is east of True North
+    crs = QgsCoordinateReferenceSystem('EPSG:32610')
+    distances, bearings = hard_tie_inverse(np.array([600000.0]), np.array([5000000.0]),
+                                           np.array([600000.0]), np.array([5000100.0]), crs, GeometryContext())
+    assert 0 < bearings[0] < 5
+
+def test_hard_tie_inverse_without_ties():
+    distances, bearings = hard_tie_inverse(np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0),
+                                           QgsCoordinateReferenceSystem('EPSG:32610'), GeometryContext())
+    assert len(distances) == len(bearings) == 0
+
+FEATURES = [QgsPointXY(0, 0), QgsPointXY(10, 0)]
+REFERENCES = [QgsPointXY(1, 0), QgsPointXY(3, 0), QgsPointXY(9, 0), QgsPointXY(20, 0)]
+
+@requires_qgis
+@pytest.mark.parametrize('k, max_distance, features, references', [
+    (1, 0, [0, 1], [0, 2]),
+    (2, 0, [0, 0, 1, 1], [0, 1, 2, 1]),         #ordered by feature, then by distance
+    (2, 2, [0, 1], [0, 2]),
+    (None, 5, [0, 0, 1], [0, 1, 2]),
+])
+def test_nearest_reference_pairs(k, max_distance, features, references):
+    feat_indices, ref_indices = nearest_reference_pairs(FEATURES, REFERENCES, k, max_distance)
+    assert feat_indices.tolist() == features
+    assert ref_indices.tolist() == references
+
+def test_nearest_reference_pairs_needs_a_distance_without_k():
+    with pytest.raises(ValueError):
+        nearest_reference_pairs(FEATURES, REFERENCES, k=None)
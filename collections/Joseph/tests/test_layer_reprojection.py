@@ -0,0 +1,62 @@
+import pytest
+
+import qgis.core
+if not hasattr(qgis.core, 'Qgis'):
+    pytest.skip("needs QGIS (the qgis.core stand-in has no layers or feature requests)", allow_module_level=True)
+
+from qgis.core import (
+    QgsApplication,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsCoordinateTransformContext,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsGeometry,
+    QgsPointXY,
+    QgsVectorLayer,
+)
+from layer_reprojection import _transform_chunk, layer_request, subset_fields
+
+WGS84 = 'EPSG:4326'
+UTM10N = 'EPSG:32610'
+
+@pytest.fixture(scope='module')
+def layer():
+    app = QgsApplication.instance()
+    if app is None:
+        app = QgsApplication([], False)
+        app.initQgis()
+    layer = QgsVectorLayer(f"Point?crs={WGS84}&field=name:string&field=depth:double&field=note:string", 'points', 'memory')
+    features = []
+    for i in range(5):
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes([f"P{i}", i/10, ''])
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(-123 + i/100, 49 + i/100)))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+def test_layer_request(layer):
+    request = layer_request(layer, ['depth'])
+    assert request.subsetOfAttributes() == [1]
+    assert not request.destinationCrs().isValid()
+    no_attributes = layer_request(layer, [])
+    assert no_attributes.flags() & QgsFeatureRequest.SubsetOfAttributes and no_attributes.subsetOfAttributes() == []
+    assert layer_request(layer, with_geometry=False).flags() & QgsFeatureRequest.NoGeometry
+    assert layer_request(layer, out_crs=QgsCoordinateReferenceSystem(UTM10N)).destinationCrs().authid() == UTM10N
+    assert not layer_request(layer, out_crs=layer.crs()).destinationCrs().isValid()
+
+def test_subset_fields(layer):
+    assert subset_fields(layer.fields()).names() == ['name', 'depth', 'note']
+    assert subset_fields(layer.fields(), ['note', 'name']).names() == ['note', 'name']
+
+def test_transform_chunk_points_match_single_geometries(layer):
+    transform = QgsCoordinateTransform(QgsCoordinateReferenceSystem(WGS84), QgsCoordinateReferenceSystem(UTM10N),
+                                       QgsCoordinateTransformContext())
+    together = list(layer.getFeatures())
+    one_by_one = list(layer.getFeatures())
+    _transform_chunk(together, transform, single_points=True)
+    _transform_chunk(one_by_one, transform, single_points=False)
+    for a, b in zip(together, one_by_one):
+        assert a.geometry().asPoint().x() == pytest.approx(b.geometry().asPoint().x(), abs=1e-6)
+        assert a.geometry().asPoint().y() == pytest.approx(b.geometry().asPoint().y(), abs=1e-6)
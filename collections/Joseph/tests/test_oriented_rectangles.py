@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from oriented_rectangles import (convex_hull, minimum_area_rectangles, next_vertices, previous_vertices,
+                                 rectangle_corners, ring_corners)
+
+def rings_arrays(rings):
+    """Returns rings given as lists of [x, y] points as flat x and y arrays with their starts and counts"""
+    counts = np.array([len(ring) for ring in rings], dtype=int)
+    points = np.array([p for ring in rings for p in ring], dtype=float).reshape(-1, 2)
+    return points[:, 0], points[:, 1], np.cumsum(counts) - counts, counts
+
+def rotated(points, degrees, offset=(0, 0)):
+    angle = np.radians(degrees)
+    rotation = np.array([[np.cos(angle), np.sin(angle)], [-np.sin(angle), np.cos(angle)]])
+    return (np.asarray(points, dtype=float) @ rotation + offset).tolist()
+
+def brute_force_area(x, y):
+    """Smallest area of the rectangles aligned with the hull edges, checking every point for every edge"""
+    hull = convex_hull(x, y)
+    best = np.inf
+    for a, b in zip(hull, np.roll(hull, -1)):
+        u = np.array([x[b] - x[a], y[b] - y[a]])/np.hypot(x[b] - x[a], y[b] - y[a])
+        along = (x - x[a])*u[0] + (y - y[a])*u[1]
+        across = -(x - x[a])*u[1] + (y - y[a])*u[0]
+        best = min(best, (along.max() - along.min())*(across.max() - across.min()))
+    return best
+
+# A 10 by 4 rectangle with an extra vertex along its long side, rotated by 30 degrees
+RECTANGLE = rotated([[0, 0], [5, 0], [10, 0], [10, 4], [0, 4]], 30, (100, 50))
+
+def test_next_and_previous_vertices():
+    starts, counts = np.array([0, 3, 3]), np.array([3, 0, 2])
+    assert next_vertices(starts, counts).tolist() == [1, 2, 0, 4, 3]
+    assert previous_vertices(starts, counts).tolist() == [2, 0, 1, 4, 3]
+
+def test_convex_hull():
+    x = [0, 2, 1, 2, 0, 1]
+    y = [0, 0, 1, 2, 2, 0]      #a square with a point inside and one along the bottom side
+    assert convex_hull(x, y).tolist() == [0, 1, 3, 4]
+
+def test_minimum_area_rectangle_of_a_rotated_rectangle():
+    rectangles = minimum_area_rectangles(*rings_arrays([RECTANGLE]))
+    assert rectangles['area'][0] == pytest.approx(40)
+    assert sorted([rectangles['width'][0], rectangles['height'][0]]) == pytest.approx([4, 10])
+    assert rectangles['angle'][0] % 90 == pytest.approx(30)
+    center = np.mean([RECTANGLE[0], RECTANGLE[3]], axis=0)
+    assert [rectangles['center_x'][0], rectangles['center_y'][0]] == pytest.approx(center.tolist())
+
+def test_minimum_area_rectangles_of_degenerate_rings():
+    rectangles = minimum_area_rectangles(*rings_arrays([[[0, 0], [1, 1], [2, 2]], [[0, 0], [1, 0]], [], RECTANGLE]))
+    assert np.isnan(rectangles['area'][:3]).all()
+    assert rectangles['area'][3] == pytest.approx(40)
+
+def test_minimum_area_rectangles_match_brute_force():
+    rng = np.random.default_rng(0)
+    rings = [rng.normal(0, 1, (int(n), 2)).tolist() for n in rng.integers(3, 40, 200)]
+    rectangles = minimum_area_rectangles(*rings_arrays(rings))
+    expected = [brute_force_area(*np.array(ring).T) for ring in rings]
+    assert rectangles['area'] == pytest.approx(expected)
+
+def test_rectangle_corners():
+    #the rectangle is rotated by 30 degrees, so its long side is the bottom A-D side
+    assert rectangle_corners(*rings_arrays([RECTANGLE])).tolist() == [[0, 4, 3, 2]]
+    assert ring_corners(RECTANGLE) == [0, 4, 3, 2]
+    assert ring_corners(rotated(RECTANGLE, 90)) == [4, 3, 2, 0]       #a quarter turn moves each label one corner on
+    assert ring_corners([]) == [-1, -1, -1, -1]
+
+def test_ring_corners_match_rectangle_corners():
+    rng = np.random.default_rng(1)
+    rings = [rng.normal(0, 1, (int(n), 2)).tolist() for n in rng.integers(1, 30, 300)]
+    rings += [rotated([[0, 0], [0, 1], [1, 1], [1, 0]], angle) for angle in range(0, 360, 15)]
+    expected = rectangle_corners(*rings_arrays(rings))
+    starts = rings_arrays(rings)[2]
+    for ring, start, corners in zip(rings, starts, expected):
+        assert [c + start for c in ring_corners(ring)] == corners.tolist()
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from polygon_metrics import max_side_lengths, oriented_boxes, side_lengths, top_left_rotations
+
+def rings_arrays(rings):
+    """Returns rings given as lists of [x, y] points as flat x and y arrays with their starts and counts"""
+    counts = np.array([len(ring) for ring in rings], dtype=int)
+    points = np.array([p for ring in rings for p in ring], dtype=float).reshape(-1, 2)
+    return points[:, 0], points[:, 1], np.cumsum(counts) - counts, counts
+
+def rotated(points, degrees):
+    angle = np.radians(degrees)
+    rotation = np.array([[np.cos(angle), np.sin(angle)], [-np.sin(angle), np.cos(angle)]])
+    return (np.asarray(points, dtype=float) @ rotation).tolist()
+
+CELL = [[0, 0], [0, 4], [10, 4], [10, 0]]      #10 by 4, listed from the bottom-left corner
+
+def test_side_lengths():
+    assert side_lengths(*rings_arrays([CELL])).tolist() == pytest.approx([4, 10, 4, 10])
+
+def test_max_side_lengths():
+    rings = [rotated(CELL, 30), [[0, 0], [3, 4], [0, 4]], [[1, 1]], []]
+    assert max_side_lengths(*rings_arrays(rings))[:2].tolist() == pytest.approx([10, 5])
+    assert np.isnan(max_side_lengths(*rings_arrays(rings))[2:]).all()
+
+@pytest.mark.parametrize('degrees', [-40, -10, 0, 10, 30, 40])
+def test_top_left_rotations(degrees):
+    #the angle of the top side, counter-clockwise negative
+    assert top_left_rotations(*rings_arrays([rotated(CELL, degrees)]))[0] == pytest.approx(-degrees)
+
+def test_top_left_rotations_of_degenerate_rings():
+    assert np.isnan(top_left_rotations(*rings_arrays([[[0, 0], [1, 1]], []]))).all()
+
+def test_oriented_boxes():
+    boxes = oriented_boxes(*rings_arrays([rotated(CELL, 30)]))
+    assert sorted(boxes) == ['angle', 'area', 'center_x', 'center_y', 'height', 'width']
+    assert boxes['area'][0] == pytest.approx(40)
+    assert [boxes['center_x'][0], boxes['center_y'][0]] == pytest.approx(rotated([[5, 2]], 30)[0])
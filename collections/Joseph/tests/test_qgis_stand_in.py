@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from qgis_stand_in import QgsCoordinateReferenceSystem, QgsCoordinateTransform, geographic_to_utm, utm_to_geographic
+
+@pytest.mark.parametrize('lon, lat, zone, south, easting, northing', [
+    (-123, 45, 10, False, 500000.0, 4982950.400),      #on the central meridian
+    (-123, -45, 10, True, 500000.0, 5017049.600),
+    (3, 0, 31, False, 500000.0, 0.0),
+    (0, 50, 31, False, 285015.763, 5542944.019),
+])
+def test_geographic_to_utm(lon, lat, zone, south, easting, northing):
+    assert geographic_to_utm(lon, lat, zone, south) == pytest.approx((easting, northing), abs=2e-3)
+
+def test_utm_round_trip():
+    rng = np.random.default_rng(0)
+    lons = rng.uniform(-3, 3, 500) + 3
+    lats = rng.uniform(-80, 84, 500)
+    eastings, northings = geographic_to_utm(lons, lats, 31, south=False)
+    back_lons, back_lats = utm_to_geographic(eastings, northings, 31, south=False)
+    assert np.abs(back_lons - lons).max() < 1e-8
+    assert np.abs(back_lats - lats).max() < 1e-8
+
+def test_crs():
+    assert QgsCoordinateReferenceSystem('epsg:32733').authid() == 'EPSG:32733'
+    assert QgsCoordinateReferenceSystem(4326).isGeographic()
+    invalid = QgsCoordinateReferenceSystem('EPSG:3857')
+    assert not invalid.isValid() and invalid.authid() == ''
+    assert QgsCoordinateReferenceSystem('EPSG:32733').toProj() == '+proj=utm +zone=33 +south +datum=WGS84 +units=m +no_defs'
+
+def test_transform_between_zones():
+    zone_10 = QgsCoordinateReferenceSystem('EPSG:32610')
+    zone_11 = QgsCoordinateReferenceSystem('EPSG:32611')
+    x, y = QgsCoordinateTransform(zone_10, zone_11).transform_arrays([500000.0], [4982950.400])
+    lon, lat = utm_to_geographic(x, y, 11)
+    assert (lon[0], lat[0]) == pytest.approx((-123, 45), abs=1e-8)
@@ -0,0 +1,30 @@
+import numpy as np
+
+from grid_cell_codec import cell_key
+import synthetic_data
+
+def test_int_to_letters():
+    assert [synthetic_data.int_to_letters(rank) for rank in (1, 26, 27, 52, 703)] == ['A', 'Z', 'AA', 'AZ', 'AAA']
+
+def test_excavation_grid():
+    names, quads = synthetic_data.excavation_grid(10, np.random.default_rng(0), cell_size=5.0)
+    assert names[:4] == ['A.I', 'A.II', 'A.III', 'B.I']       #4 rows of 3 cells
+    assert quads.shape == (10, 4, 2)
+    assert np.allclose(np.sort(quads[0] - [500000, 5000000], axis=0), [[0, 0], [0, 0], [5, 5], [5, 5]])
+
+def test_location_strings_are_cell_ids():
+    locations = synthetic_data.location_strings(100, np.random.default_rng(0))
+    for location in locations:
+        for cell in location.split(', '):
+            cell_key(cell)
+
+def test_intersection_rows():
+    rows = synthetic_data.intersection_rows(50, np.random.default_rng(0), duplication=0.2, shuffle=False)
+    assert [row[0] for row in rows] == [str(i) for i in range(1, len(rows)+1)]
+    assert [int(row[1]) for row in rows] == sorted(int(row[1]) for row in rows)
+    assert len({tuple(row[1:]) for row in rows}) < len(rows)
+
+def test_data_depends_only_on_the_seed():
+    first = synthetic_data.survey_points(100, np.random.default_rng(5))
+    second = synthetic_data.survey_points(100, np.random.default_rng(5))
+    assert all(np.array_equal(first[name], second[name]) for name in first)
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+
+import pytest
+
+from qgis.core import QgsCoordinateReferenceSystem
+from utm_coordinates import UtmCrsResolver, compute_utm_coordinates, fingerprint_settings, geometry_fingerprint
+
+class PointSource:
+    """The part of a point layer that compute_utm_coordinates uses when it is given the points"""
+    def __init__(self, crs):
+        self.crs = crs
+
+    def sourceCrs(self):
+        return self.crs
+
+@pytest.fixture
+def srs_db(tmp_path):
+    """A copy of the vw_srs view of the QGIS srs database with the WGS 84 UTM zones"""
+    path = tmp_path / 'srs.db'
+    con = sqlite3.connect(path)
+    con.execute("create table vw_srs (description text, auth_name text, auth_id text, deprecated integer)")
+    for zone in range(1, 61):
+        con.execute("insert into vw_srs values (?, 'EPSG', ?, 0)", (f"WGS 84 / UTM zone {zone}N", str(32600 + zone)))
+        con.execute("insert into vw_srs values (?, 'EPSG', ?, 0)", (f"WGS 84 / UTM zone {zone}S", str(32700 + zone)))
+    con.execute("insert into vw_srs values ('WGS 84 / UTM zone 10N', 'EPSG', '99999', 1)")
+    con.execute("insert into vw_srs values ('WGS 84 / Pseudo-Mercator', 'EPSG', '3857', 0)")
+    con.commit()
+    con.close()
+    return str(path)
+
+def test_compute_utm_coordinates(srs_db):
+    layer = PointSource(QgsCoordinateReferenceSystem('EPSG:4326'))
+    points = ([1, 2, 3, 4], [-123, 6, 10, 3], [45, 60, 89, -45])     #the third point is outside the UTM grid
+    utm_coords = compute_utm_coordinates(layer, None, p=2, resolver=UtmCrsResolver('WGS84', db_path=srs_db),
+                                         points=points)
+    assert sorted(utm_coords) == [1, 2, 4]
+    assert utm_coords[1] == '10T 500000.00 E 4982950.40 N'
+    assert utm_coords[2].startswith('32V ')
+    assert utm_coords[4] == '31G 500000.00 E 5017049.60 N'
+
+def test_compute_utm_coordinates_without_points(srs_db):
+    layer = PointSource(QgsCoordinateReferenceSystem('EPSG:4326'))
+    assert compute_utm_coordinates(layer, None, resolver=UtmCrsResolver('WGS84', db_path=srs_db),
+                                   points=([], [], [])) == {}
+
+def test_resolver_lookup(srs_db):
+    resolver = UtmCrsResolver('WGS84', db_path=srs_db)
+    assert resolver.datum == 'WGS 84'
+    assert resolver.lookup('09', 'N') == ['EPSG:32609']
+    assert resolver.lookup(10, 'N') == ['EPSG:32610']       #deprecated crs are left out
+    assert resolver.lookup(10, 'N', 'NAD83(CSRS)') == []
+    assert resolver.crs_for_utmzone(['33', 'X']).authid() == 'EPSG:32633'
+    assert resolver.crs_for_utmzone(['33', 'X']) is resolver.crs_for_utmzone([33, 'W'])
+    assert resolver.crs_for_utmzone(['31', 'M']).authid() == 'EPSG:32731'
+    with pytest.raises(LookupError):
+        resolver.crs_for_utmzone(['10', 'T'], datum='CSRS')
+
+def test_resolver_cache_file(srs_db, tmp_path):
+    cache_path = str(tmp_path / 'utm_crs.json')
+    UtmCrsResolver('WGS84', cache_path=cache_path, db_path=srs_db).load()
+
+    #a valid cache is used instead of the database
+    con = sqlite3.connect(srs_db)
+    con.execute("delete from vw_srs where auth_id = '32610'")
+    con.commit()
+    con.close()
+    assert UtmCrsResolver('WGS84', cache_path=cache_path, db_path=srs_db).lookup(10, 'N') == ['EPSG:32610']
+
+    #the cache is rebuilt when the database changes
+    os.utime(srs_db, (0, 0))
+    assert UtmCrsResolver('WGS84', cache_path=cache_path, db_path=srs_db).lookup(10, 'N') == []
+
+def test_fingerprint_settings():
+    crs = QgsCoordinateReferenceSystem('EPSG:4326')
+    assert fingerprint_settings(crs, 1, 'CSRS') == 'EPSG:4326|1|NAD83(CSRS)'
+    assert fingerprint_settings(crs, 1, 'CSRS') == fingerprint_settings(crs, 1, 'NAD83(CSRS)')
+    assert fingerprint_settings(crs, 1, 'WGS84') != fingerprint_settings(crs, 2, 'WGS84')
+
+def test_geometry_fingerprint():
+    settings = fingerprint_settings(QgsCoordinateReferenceSystem('EPSG:4326'), 1, 'WGS84')
+    fingerprint = geometry_fingerprint(-123.5, 45.25, settings)
+    assert len(fingerprint) == 16 and int(fingerprint, 16) >= 0
+    assert geometry_fingerprint(-123.5, 45.25, settings) == fingerprint
+    assert geometry_fingerprint(45.25, -123.5, settings) != fingerprint
+    assert geometry_fingerprint(-123.5, 45.25 + 1e-9, settings) != fingerprint
+    assert geometry_fingerprint(-123.5, 45.25) != fingerprint
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from qgis.core import QgsPointXY
+from utm_zones import UtmZoneError, latlong_to_utmzone, latlong_to_utmzone_array
+
+# (longitude, latitude, zone, band)
+EDGES = [
+    (-180, 0, 1, 'N'),
+    (180, 0, 60, 'N'),          #lon 180 is the eastern edge of zone 60
+    (0, -80, 31, 'C'),
+    (0, 84, 31, 'X'),           #band X is 12 degrees high
+    (2.99, 60, 31, 'V'),        #zone 32V is widened westwards to lon 3
+    (3, 60, 32, 'V'),
+    (11.99, 63.9, 32, 'V'),
+    (12, 60, 33, 'V'),
+    (6, 55.9, 32, 'U'),         #the exception only applies to band V
+    (3, 64, 31, 'W'),
+    (8.99, 72, 31, 'X'),        #Svalbard: zones 31, 33, 35 and 37 in band X
+    (9, 72, 33, 'X'),
+    (20.99, 80, 33, 'X'),
+    (21, 80, 35, 'X'),
+    (33, 84, 37, 'X'),
+    (41.99, 78, 37, 'X'),
+    (42, 78, 38, 'X'),
+    (9, 71.9, 32, 'W'),         #the exception only applies to band X
+]
+
+@pytest.mark.parametrize('lon, lat, zone, band', EDGES)
+def test_latlong_to_utmzone(lon, lat, zone, band):
+    assert latlong_to_utmzone(QgsPointXY(lon, lat)) == [str(zone).zfill(2), band]
+
+def test_latlong_to_utmzone_array_matches_scalar():
+    lons, lats, zones, bands = zip(*EDGES)
+    result_zones, result_bands = latlong_to_utmzone_array(lons, lats)
+    assert result_zones.tolist() == list(zones)
+    assert result_bands.tolist() == list(bands)
+
+    rng = np.random.default_rng(0)
+    lons = rng.uniform(-180, 180, 2000)
+    lats = rng.uniform(-80, 84, 2000)
+    result_zones, result_bands = latlong_to_utmzone_array(lons, lats)
+    expected = [latlong_to_utmzone(QgsPointXY(lon, lat)) for lon, lat in zip(lons, lats)]
+    assert [[str(z).zfill(2), b] for z, b in zip(result_zones.tolist(), result_bands.tolist())] == expected
+
+@pytest.mark.parametrize('lon, lat', [(0, 84.1), (0, -80.1), (180.1, 0), (-180.1, 0)])
+def test_latlong_to_utmzone_out_of_range(lon, lat):
+    with pytest.raises(UtmZoneError):
+        latlong_to_utmzone(QgsPointXY(lon, lat))
+
+def test_latlong_to_utmzone_array_out_of_range():
+    with pytest.raises(UtmZoneError) as error:
+        latlong_to_utmzone_array([0, 0, 200, 0, np.nan], [0, 85, 0, 0, 0])
+    assert error.value.indices.tolist() == [1, 2, 4]
@@ -0,0 +1,282 @@
+"""
+Batch export of the layout templates (collections/Sources/layout/*.qpt), one
+page per extent, in a pool of worker processes.
+
+The pages come from a csv of extents (columns name, xmin, ymin, xmax, ymax, in
+the CRS of the project) or from the features of a coverage layer, e.g. the grid
+written by create-small-grid.py (one page per grid cell, named by its GridID).
+For each page, the main map of the template is zoomed to the page extent (plus
+a margin), the overview map (in the templates with insets) to the extent of all
+pages, and the figure number label is set to the page number. The detail map
+keeps the extent it has in the template. The layout variables page_name and
+page_number can be used in label expressions.
+
+Each worker starts QGIS, reads the project (and any extra layers) and loads
+the template once, then only changes the extents and labels of that layout
+for each page it exports.
+
+Usage (in a python that can import QGIS, e.g. the OSGeo4W shell):
+    python layout_export.py <template.qpt> <output folder>
+        (--extents pages.csv | --coverage grid.gpkg [--name-field GridID])
+        [--project project.qgz] [--layer layer.gpkg ...] [--format pdf|png]
+        [--dpi 300] [--margin 0.05] [--workers N] [--timings timings.csv]
+
+Prints the throughput (pages per minute) and the per-page export times, and
+writes the time of every page to `--timings`.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import csv
+import multiprocessing
+import os
+import re
+import statistics
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+MAP_ITEM_TYPE = '65639'     #QgsLayoutItemRegistry.LayoutMap
+MAIN_MAP = 'Main Map'
+OVERVIEW_MAP = 'Overview Map'
+FIGURE_LABEL = 'Figure Number'
+FIGURE_TEXT = 'FIG <b>{}</b>'
+FORMATS = ('pdf', 'png')
+
+_worker = {}    #state of a worker process: QGIS application, project, layout and its items
+
+def template_maps(path):
+    """Returns the map items of a layout template as a dictionary {item id: (width, height)} in layout units"""
+    maps = {}
+    for item in ET.parse(path).getroot().iter('LayoutItem'):
+        if item.get('type') == MAP_ITEM_TYPE:
+            width, height = (float(v) for v in item.get('size', '0,0').split(',')[:2])
+            maps[item.get('id', '')] = (width, height)
+    return maps
+
+def read_extents(path):
+    """Reads the pages of a csv with the columns name, xmin, ymin, xmax and ymax"""
+    with open(path, newline='', encoding='utf-8-sig') as infile:
+        return [{'name': row['name'], 'extent': tuple(float(row[c]) for c in ('xmin', 'ymin', 'xmax', 'ymax'))}
+                for row in csv.DictReader(infile)]
+
+def page_extent(extent, margin):
+    """Grows an extent (xmin, ymin, xmax, ymax) by `margin` (a fraction of its larger side) on every side"""
+    xmin, ymin, xmax, ymax = extent
+    pad = margin*max(xmax - xmin, ymax - ymin)
+    return (xmin - pad, ymin - pad, xmax + pad, ymax + pad)
+
+def union_extent(pages):
+    """Returns the extent of all pages"""
+    extents = [page['extent'] for page in pages]
+    return (min(e[0] for e in extents), min(e[1] for e in extents),
+            max(e[2] for e in extents), max(e[3] for e in extents))
+
+def file_name(page, number, file_format):
+    """Returns the output file name of a page, e.g. '0007_A1.12.pdf'"""
+    name = re.sub(r'[^\w.-]+', '_', page['name']).strip('_') or 'page'
+    return f"{number:04d}_{name}.{file_format}"
+
+def summarize(seconds, wall_seconds):
+    """Returns the throughput and the statistics of the per-page export times as a dictionary"""
+    ordered = sorted(seconds)
+    return {
+        'pages': len(ordered),
+        'wall_seconds': wall_seconds,
+        'pages_per_minute': 60*len(ordered)/wall_seconds if wall_seconds > 0 else float('inf'),
+        'mean': statistics.fmean(ordered) if ordered else 0.0,
+        'median': statistics.median(ordered) if ordered else 0.0,
+        'p95': ordered[min(int(0.95*len(ordered)), len(ordered)-1)] if ordered else 0.0,
+        'max': ordered[-1] if ordered else 0.0,
+    }
+
+def start_qgis():
+    """Starts a QGIS application without a GUI (once per process)"""
+    if 'app' not in _worker:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from qgis.core import QgsApplication
+
+        app = QgsApplication([], False)
+        app.initQgis()
+        _worker['app'] = app
+    return _worker['app']
+
+def read_coverage(path, name_field, project_path=None):
+    """
+    Reads the pages of a coverage layer: the bounding box of each feature, in
+    the CRS of the project (or of the layer if there is no project)
+    """
+    start_qgis()
+    from qgis.core import QgsCoordinateTransform, QgsProject, QgsVectorLayer
+
+    layer = QgsVectorLayer(path, 'coverage', 'ogr')
+    if not layer.isValid():
+        raise ValueError(f"{path} is not a valid vector layer")
+    if name_field and layer.fields().indexOf(name_field) < 0:
+        raise ValueError(f"{path} has no field '{name_field}'")
+
+    crs = layer.crs()
+    if project_path:
+        project = QgsProject()
+        if not project.read(project_path, QgsProject.FlagDontResolveLayers):
+            raise ValueError(f"could not read the project {project_path}")
+        crs = project.crs()
+    transform = QgsCoordinateTransform(layer.crs(), crs, QgsProject.instance().transformContext())
+
+    pages = []
+    for feature in layer.getFeatures():
+        if not feature.hasGeometry():
+            continue
+        box = transform.transformBoundingBox(feature.geometry().boundingBox())
+        name = str(feature[name_field]) if name_field else str(feature.id())
+        pages.append({'name': name, 'extent': (box.xMinimum(), box.yMinimum(), box.xMaximum(), box.yMaximum())})
+    return pages
+
+def init_worker(template_path, project_path, layer_paths, overview_extent):
+    """Starts QGIS and loads the project, layers and template once per worker process"""
+    start_qgis()
+    from qgis.core import (QgsLayoutItemLabel, QgsLayoutItemMap, QgsPrintLayout, QgsProject,
+                           QgsRasterLayer, QgsReadWriteContext, QgsRectangle, QgsVectorLayer)
+    from qgis.PyQt.QtXml import QDomDocument
+
+    project = QgsProject.instance()
+    if project_path and not project.read(project_path):
+        raise ValueError(f"could not read the project {project_path}")
+    for path in layer_paths:
+        layer = QgsVectorLayer(path, os.path.splitext(os.path.basename(path))[0], 'ogr')
+        if not layer.isValid():
+            layer = QgsRasterLayer(path, os.path.splitext(os.path.basename(path))[0])
+        if not layer.isValid():
+            raise ValueError(f"{path} is not a valid layer")
+        project.addMapLayer(layer)
+
+    document = QDomDocument()
+    with open(template_path, 'rb') as infile:
+        document.setContent(infile.read())
+    layout = QgsPrintLayout(project)
+    _, ok = layout.loadFromTemplate(document, QgsReadWriteContext())
+    if not ok:
+        raise ValueError(f"could not load the template {template_path}")
+
+    main_map = layout.itemById(MAIN_MAP)
+    if not isinstance(main_map, QgsLayoutItemMap):
+        raise ValueError(f"{template_path} has no map item '{MAIN_MAP}'")
+    overview_map = layout.itemById(OVERVIEW_MAP)
+    if isinstance(overview_map, QgsLayoutItemMap) and overview_extent is not None:
+        overview_map.zoomToExtent(QgsRectangle(*overview_extent))
+    figure_label = layout.itemById(FIGURE_LABEL)
+
+    _worker.update({
+        'project': project,
+        'layout': layout,
+        'main_map': main_map,
+        'figure_label': figure_label if isinstance(figure_label, QgsLayoutItemLabel) else None,
+    })
+
+def export_page(page, number, path, file_format, dpi, margin):
+    """Exports one page with the layout of this worker. Returns (number, name, path, seconds, error)"""
+    from qgis.core import QgsExpressionContextUtils, QgsLayoutExporter, QgsRectangle
+
+    start = time.perf_counter()
+    layout = _worker['layout']
+    _worker['main_map'].zoomToExtent(QgsRectangle(*page_extent(page['extent'], margin)))
+    if _worker['figure_label'] is not None:
+        _worker['figure_label'].setText(FIGURE_TEXT.format(number))
+    QgsExpressionContextUtils.setLayoutVariable(layout, 'page_name', page['name'])
+    QgsExpressionContextUtils.setLayoutVariable(layout, 'page_number', number)
+
+    exporter = QgsLayoutExporter(layout)
+    if file_format == 'pdf':
+        settings = QgsLayoutExporter.PdfExportSettings()
+        settings.dpi = dpi
+        result = exporter.exportToPdf(path, settings)
+    else:
+        settings = QgsLayoutExporter.ImageExportSettings()
+        settings.dpi = dpi
+        result = exporter.exportToImage(path, settings)
+    error = None if result == QgsLayoutExporter.Success else f"export failed ({exporter.errorMessage() or result})"
+    return number, page['name'], path, time.perf_counter() - start, error
+
+def export_pages(pages, template_path, output_dir, project_path=None, layer_paths=(), file_format='pdf',
+                 dpi=300, margin=0.05, workers=None):
+    """
+    Exports every page with `workers` processes (all cpus by default). Yields
+    (number, name, path, seconds, error) as the pages finish, in any order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    overview_extent = page_extent(union_extent(pages), margin) if pages else None
+    initargs = (template_path, project_path, list(layer_paths), overview_extent)
+    tasks = [(page, number, os.path.join(output_dir, file_name(page, number, file_format)), file_format, dpi, margin)
+             for number, page in enumerate(pages, 1)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+
+    # Run in this process if there is nothing to parallelize
+    if workers <= 1:
+        init_worker(*initargs)
+        for task in tasks:
+            yield export_page(*task)
+        return
+
+    # Spawn (rather than fork) the workers, so each one starts its own QGIS application
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=init_worker, initargs=initargs) as executor:
+        for future in as_completed([executor.submit(export_page, *task) for task in tasks]):
+            yield future.result()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exports one layout page per extent or coverage feature.")
+    parser.add_argument('template', help="layout template (.qpt)")
+    parser.add_argument('output', help="folder to write the pages to")
+    pages_group = parser.add_mutually_exclusive_group(required=True)
+    pages_group.add_argument('--extents', help="csv with the columns name, xmin, ymin, xmax, ymax")
+    pages_group.add_argument('--coverage', help="vector layer with one feature per page")
+    parser.add_argument('--name-field', default='GridID', help="page name field of the coverage layer (default GridID)")
+    parser.add_argument('--project', help="QGIS project with the map layers (.qgz or .qgs)")
+    parser.add_argument('--layer', action='append', default=[], help="extra map layer (may be repeated)")
+    parser.add_argument('--format', choices=FORMATS, default='pdf', help="output format (default pdf)")
+    parser.add_argument('--dpi', type=float, default=300, help="export resolution (default 300)")
+    parser.add_argument('--margin', type=float, default=0.05, help="margin around each page extent, as a fraction of its larger side (default 0.05)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: all cpus)")
+    parser.add_argument('--timings', help="csv file to write the export time of each page to")
+    args = parser.parse_args(argv)
+
+    if MAIN_MAP not in template_maps(args.template):
+        parser.error(f"{args.template} has no map item '{MAIN_MAP}'")
+    if args.extents:
+        pages = read_extents(args.extents)
+    else:
+        pages = read_coverage(args.coverage, args.name_field, args.project)
+    if not pages:
+        print("No pages to export")
+        return 0
+
+    results = []
+    failed = 0
+    start = time.perf_counter()
+    for number, name, path, seconds, error in export_pages(pages, args.template, args.output, args.project, args.layer,
+                                                           args.format, args.dpi, args.margin, args.workers):
+        results.append((number, name, path, seconds, error))
+        if error:
+            failed += 1
+            print(f"Page {number} ({name}): {error}")
+        if len(results) % 50 == 0:
+            print(f"{len(results)}/{len(pages)} pages")
+    summary = summarize([r[3] for r in results if not r[4]], time.perf_counter() - start)
+
+    if args.timings:
+        with open(args.timings, 'w', newline='') as outfile:
+            csvwriter = csv.writer(outfile)
+            csvwriter.writerow(['number', 'name', 'path', 'seconds', 'error'])
+            csvwriter.writerows(sorted(results))
+
+    print(f"Exported {summary['pages']} pages in {summary['wall_seconds']:.1f} s "
+          f"({summary['pages_per_minute']:.1f} pages/min)")
+    print(f"Seconds per page: mean {summary['mean']:.2f}, median {summary['median']:.2f}, "
+          f"95th percentile {summary['p95']:.2f}, max {summary['max']:.2f}")
+    if failed:
+        print(f"{failed} pages failed")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
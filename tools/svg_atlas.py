@@ -0,0 +1,307 @@
+"""
+Pre-rendered sprite atlas of the SVG markers (collections/Sources/svg) and a
+cache that draws markers from it instead of rendering the SVGs again.
+
+Each SVG is rendered once for every marker size (mm) and resolution (DPI) in a
+set of buckets. Every distinct pixel width is one sprite, and all sprites are
+packed into one PNG image. A manifest (svg-atlas.json) records where each
+sprite is, with the SHA-256 hash of each SVG so that a stale atlas is
+detected.
+
+MarkerAtlas serves the sprite with the pixel width closest to the one asked
+for. With exact=True (e.g. for a layout export at a fixed scale), a sprite is
+only used if its width matches exactly; otherwise the SVG is rendered from
+vector (the parsed SVG and the rendered image are cached).
+
+MarkerAtlas is a standalone helper for scripts that draw markers with their
+own QPainter. QGIS map and layout rendering do not use it: SVG marker symbol
+layers draw from QGIS's own cache (QgsSvgCache), which also applies the fill
+and stroke colours of parametrized SVGs.
+
+Usage (in a python that can import QGIS, e.g. the OSGeo4W shell):
+    python svg_atlas.py build <output folder> [--svg-dir DIR] [--sizes 2,3,4,...] [--dpis 96,150,300]
+    python svg_atlas.py check <output folder> [--svg-dir DIR]
+
+check only needs python (it compares the hashes of the SVGs with the manifest).
+"""
+from collections import OrderedDict
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+
+MANIFEST_NAME = 'svg-atlas.json'
+IMAGE_NAME = 'svg-atlas.png'
+MANIFEST_VERSION = 1
+SIZES_MM = (2, 3, 4, 5, 6, 8, 10, 12)
+DPIS = (96, 150, 300)
+ATLAS_WIDTH = 2048      #pixels; sprites are packed in rows (shelves) of at most this width
+PADDING = 1             #transparent pixels around each sprite, so that scaled sprites do not bleed
+EXACT_TOLERANCE = 0.01  #pixels; largest difference between a sprite's width and an exact marker width
+SVG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'collections', 'Sources', 'svg')
+
+def svg_digest(path):
+    """Returns the SHA-256 hash of a file"""
+    with open(path, 'rb') as infile:
+        return hashlib.sha256(infile.read()).hexdigest()
+
+def _length(value):
+    """Returns the number in an SVG length (e.g. '37.01', '25px'), or None"""
+    match = re.match(r'\s*([0-9.]+)', value or '')
+    return float(match.group(1)) if match else None
+
+def svg_aspect(path):
+    """Returns the height/width ratio of an SVG, from its viewBox or its width and height"""
+    root = ET.parse(path).getroot()
+    view_box = root.get('viewBox')
+    if view_box:
+        _, _, width, height = (float(v) for v in re.split(r'[\s,]+', view_box.strip()))
+    else:
+        width = _length(root.get('width'))
+        height = _length(root.get('height'))
+    if not width or not height:
+        return 1.0
+    return height/width
+
+def bucket_widths(sizes_mm=SIZES_MM, dpis=DPIS):
+    """Returns the distinct pixel widths of all marker sizes (mm) at all resolutions (DPI)"""
+    return sorted({max(int(round(size/25.4*dpi)), 1) for size in sizes_mm for dpi in dpis})
+
+def pack_sprites(sprites, atlas_width=ATLAS_WIDTH, padding=PADDING):
+    """
+    Places sprites (dictionaries with 'w' and 'h') in rows from the tallest to
+    the shortest, adding their 'x' and 'y'. Returns the height of the atlas.
+    """
+    x = y = row_height = 0
+    for sprite in sorted(sprites, key=lambda s: (-s['h'], -s['w'])):
+        w = sprite['w'] + 2*padding
+        h = sprite['h'] + 2*padding
+        if w > atlas_width:
+            raise ValueError(f"a {sprite['w']} pixel wide sprite does not fit in a {atlas_width} pixel wide atlas")
+        if x + w > atlas_width:
+            x = 0
+            y += row_height
+            row_height = 0
+        sprite['x'] = x + padding
+        sprite['y'] = y + padding
+        x += w
+        row_height = max(row_height, h)
+    return y + row_height
+
+def plan_atlas(svg_dir=SVG_DIR, sizes_mm=SIZES_MM, dpis=DPIS):
+    """Returns the manifest of an atlas of all SVGs in `svg_dir`, without rendering it"""
+    svgs = {}
+    sprites = []
+    widths = bucket_widths(sizes_mm, dpis)
+    for name in sorted(os.listdir(svg_dir)):
+        if not name.lower().endswith('.svg'):
+            continue
+        path = os.path.join(svg_dir, name)
+        aspect = svg_aspect(path)
+        svgs[name] = {'sha256': svg_digest(path), 'aspect': aspect}
+        sprites.extend({'svg': name, 'w': w, 'h': max(int(round(w*aspect)), 1)} for w in widths)
+    height = pack_sprites(sprites)
+    return {
+        'version': MANIFEST_VERSION,
+        'image': IMAGE_NAME,
+        'width': ATLAS_WIDTH,
+        'height': height,
+        'sizes_mm': list(sizes_mm),
+        'dpis': list(dpis),
+        'svgs': svgs,
+        'sprites': sprites,
+    }
+
+def build_atlas(output_dir, svg_dir=SVG_DIR, sizes_mm=SIZES_MM, dpis=DPIS):
+    """Renders the atlas of all SVGs in `svg_dir` and writes it with its manifest to `output_dir` (requires QGIS)"""
+    from qgis.PyQt.QtCore import QRectF, Qt
+    from qgis.PyQt.QtGui import QImage, QPainter
+    from qgis.PyQt.QtSvg import QSvgRenderer
+
+    manifest = plan_atlas(svg_dir, sizes_mm, dpis)
+    image = QImage(manifest['width'], manifest['height'], QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform)
+    renderers = {}
+    for sprite in manifest['sprites']:
+        renderer = renderers.get(sprite['svg'])
+        if renderer is None:
+            renderer = renderers[sprite['svg']] = QSvgRenderer(os.path.join(svg_dir, sprite['svg']))
+        renderer.render(painter, QRectF(sprite['x'], sprite['y'], sprite['w'], sprite['h']))
+    painter.end()
+
+    os.makedirs(output_dir, exist_ok=True)
+    if not image.save(os.path.join(output_dir, IMAGE_NAME)):
+        raise OSError(f"could not write {os.path.join(output_dir, IMAGE_NAME)}")
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as outfile:
+        json.dump(manifest, outfile, indent=1)
+    return manifest
+
+def stale_svgs(manifest, svg_dir=SVG_DIR):
+    """Returns the names of the SVGs that were added, removed or changed since the atlas was built"""
+    current = {name for name in os.listdir(svg_dir) if name.lower().endswith('.svg')}
+    stale = sorted(current.symmetric_difference(manifest['svgs']))
+    stale.extend(name for name in sorted(current & set(manifest['svgs']))
+                 if svg_digest(os.path.join(svg_dir, name)) != manifest['svgs'][name]['sha256'])
+    return stale
+
+class MarkerAtlas:
+    """
+    Draws SVG markers from a pre-rendered atlas (see above). The atlas image
+    is loaded on first use; sprites and vector renderings are cached.
+    """
+    def __init__(self, atlas_dir, svg_dir=SVG_DIR, max_error=0.25, maxsize=256):
+        with open(os.path.join(atlas_dir, MANIFEST_NAME), encoding='utf-8') as infile:
+            self.manifest = json.load(infile)
+        self.atlas_dir = atlas_dir
+        self.svg_dir = svg_dir
+        self.max_error = max_error      #largest relative difference between the width asked for and the sprite's
+        self.maxsize = maxsize          #number of vector renderings kept
+        self.hits = 0
+        self.misses = 0
+        self._widths = {}               #svg name -> sorted sprite widths
+        self._sprites = {}              #(svg name, width) -> sprite
+        for sprite in self.manifest['sprites']:
+            self._sprites[(sprite['svg'], sprite['w'])] = sprite
+            self._widths.setdefault(sprite['svg'], []).append(sprite['w'])
+        for widths in self._widths.values():
+            widths.sort()
+        self._stale = set(stale_svgs(self.manifest, svg_dir))
+        self._image = None
+        self._sprite_images = {}
+        self._renderers = {}
+        self._rendered = OrderedDict()
+
+    def pixel_width(self, size_mm, dpi):
+        """Returns the width in pixels of a marker of `size_mm` millimetres at `dpi`"""
+        return size_mm/25.4*dpi
+
+    def bucket(self, name, width, exact=False):
+        """
+        Returns the sprite width to use for a marker `width` pixels wide, or
+        None if it has to be rendered from vector: when the SVG is not in the
+        atlas or has changed since, when `exact` is True and no sprite has
+        exactly that width, or when the nearest sprite is more than
+        max_error too large or too small.
+        """
+        widths = self._widths.get(name)
+        if not widths or name in self._stale:
+            return None
+        nearest = min(widths, key=lambda w: abs(w - width))
+        if exact:
+            return nearest if abs(width - nearest) <= EXACT_TOLERANCE else None
+        return nearest if abs(nearest - width) <= self.max_error*width else None
+
+    def _atlas_image(self):
+        if self._image is None:
+            from qgis.PyQt.QtGui import QImage
+
+            self._image = QImage(os.path.join(self.atlas_dir, self.manifest['image']))
+            if self._image.isNull():
+                raise OSError(f"could not read {os.path.join(self.atlas_dir, self.manifest['image'])}")
+        return self._image
+
+    def _render_vector(self, name, width):
+        """Returns an SVG rendered from vector at `width` pixels (cached)"""
+        key = (name, width)
+        image = self._rendered.get(key)
+        if image is not None:
+            self._rendered.move_to_end(key)
+            return image
+
+        from qgis.PyQt.QtCore import QRectF, Qt
+        from qgis.PyQt.QtGui import QImage, QPainter
+        from qgis.PyQt.QtSvg import QSvgRenderer
+
+        renderer = self._renderers.get(name)
+        if renderer is None:
+            renderer = self._renderers[name] = QSvgRenderer(os.path.join(self.svg_dir, name))
+        size = renderer.defaultSize()
+        height = max(int(round(width*size.height()/size.width())), 1) if size.width() > 0 else width
+        image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        renderer.render(painter, QRectF(0, 0, width, height))
+        painter.end()
+
+        self._rendered[key] = image
+        if len(self._rendered) > self.maxsize:
+            self._rendered.popitem(last=False)
+        return image
+
+    def image(self, name, size_mm, dpi, exact=False):
+        """Returns a QImage of marker `name` (an SVG file name) at `size_mm` millimetres and `dpi`"""
+        width = self.pixel_width(size_mm, dpi)
+        bucket = self.bucket(name, width, exact)
+        if bucket is None:
+            self.misses += 1
+            return self._render_vector(name, max(int(round(width)), 1))
+
+        self.hits += 1
+        image = self._sprite_images.get((name, bucket))
+        if image is None:
+            sprite = self._sprites[(name, bucket)]
+            image = self._atlas_image().copy(sprite['x'], sprite['y'], sprite['w'], sprite['h'])
+            self._sprite_images[(name, bucket)] = image
+        return image
+
+    def draw_markers(self, painter, name, points, size_mm, dpi, exact=False):
+        """
+        Draws marker `name` centred on each of `points` (QPointF, in painter
+        pixels). A sprite of a slightly different width is scaled to the width
+        asked for.
+        """
+        from qgis.PyQt.QtCore import QRectF
+
+        image = self.image(name, size_mm, dpi, exact)
+        width = self.pixel_width(size_mm, dpi)
+        height = width*image.height()/image.width()
+        source = QRectF(image.rect())
+        scaled = abs(image.width() - width) >= 0.5
+        for point in points:
+            target = QRectF(point.x() - width/2, point.y() - height/2, width, height)
+            if scaled:
+                painter.drawImage(target, image, source)
+            else:
+                painter.drawImage(target.topLeft(), image)
+
+    def cache_info(self):
+        """Returns a summary of the cache, like functools.lru_cache"""
+        return (f"MarkerAtlas(hits={self.hits}, misses={self.misses}, sprites={len(self._sprite_images)}, "
+                f"vector={len(self._rendered)}, maxsize={self.maxsize})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Builds and checks the SVG marker atlas.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build')
+    build_parser.add_argument('output', help="folder to write the atlas and its manifest to")
+    build_parser.add_argument('--svg-dir', default=SVG_DIR, help="folder of SVGs (default: the Sources collection)")
+    build_parser.add_argument('--sizes', default=','.join(str(s) for s in SIZES_MM), help="marker sizes in mm")
+    build_parser.add_argument('--dpis', default=','.join(str(d) for d in DPIS), help="resolutions in DPI")
+    check_parser = subparsers.add_parser('check')
+    check_parser.add_argument('output', help="folder of the atlas")
+    check_parser.add_argument('--svg-dir', default=SVG_DIR, help="folder of SVGs (default: the Sources collection)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        manifest = build_atlas(args.output, args.svg_dir, [float(s) for s in args.sizes.split(',')],
+                               [float(d) for d in args.dpis.split(',')])
+        print(f"Wrote {len(manifest['sprites'])} sprites of {len(manifest['svgs'])} SVGs "
+              f"({manifest['width']} x {manifest['height']} pixels) to {args.output}")
+        return 0
+
+    with open(os.path.join(args.output, MANIFEST_NAME), encoding='utf-8') as infile:
+        stale = stale_svgs(json.load(infile), args.svg_dir)
+    if stale:
+        print(f"The atlas in {args.output} is out of date ({', '.join(stale)}): run 'python svg_atlas.py build'")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
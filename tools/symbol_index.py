@@ -0,0 +1,248 @@
+"""
+Index of the symbol libraries (collections/<collection>/symbol/*.xml) and a
+loader that only parses the symbols that are used.
+
+The index of a collection (symbol/symbol-index.json) lists every symbol of its
+XML files with its name, tags, type and geometry type, the SVG files it
+references, and the byte offset and length of its <symbol> element. The size
+and SHA-256 hash of each XML file are stored as well, so a stale index is
+detected without parsing the XML. The hash and offsets are those of the bytes
+as committed: .gitattributes turns off line ending conversion for the symbol
+XML files.
+
+Usage:
+    python symbol_index.py build [collection folders]   #(re)write the indexes
+    python symbol_index.py check [collection folders]   #exit with an error if an index is stale
+    python symbol_index.py list <collection folder> [--tag TAG] [--geometry point|line|polygon]
+
+By default all collections in ../collections are indexed.
+
+In QGIS (e.g. from the python console), SymbolLibrary loads symbols by name
+on demand:
+
+    library = SymbolLibrary('.../collections/BCAB/symbol')
+    symbol = library.load_symbol('CMT (Post-1846)')
+    library.add_to_style(QgsStyle.defaultStyle(), library.names(tag='point'))
+
+If an XML file has changed since the index was written, the library indexes
+the collection again in memory and warns about it (run `build` to update the
+file on disk). The pre-commit hook in .pre-commit-config.yaml runs `check`
+when a symbol folder is committed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import warnings
+import xml.etree.ElementTree as ET
+import xml.parsers.expat
+
+INDEX_NAME = 'symbol-index.json'
+INDEX_VERSION = 1
+GEOMETRY_TYPES = {'marker': 'point', 'line': 'line', 'fill': 'polygon'}
+COLLECTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'collections')
+
+def file_digest(data):
+    """Returns the SHA-256 hash of the bytes of a file"""
+    return hashlib.sha256(data).hexdigest()
+
+def index_symbols(data, file_name):
+    """
+    Returns the index entries of the top-level symbols in the bytes of a QGIS
+    style XML file (<qgis_style><symbols><symbol .../>...), in file order
+    """
+    entries = []
+    path = []           #names of the open elements
+    current = None      #entry of the top-level symbol being read
+
+    def start(tag, attrs):
+        nonlocal current
+        path.append(tag)
+        if tag == 'symbol' and path[:-1] == ['qgis_style', 'symbols']:
+            current = {
+                'name': attrs.get('name', ''),
+                'file': file_name,
+                'type': attrs.get('type', ''),
+                'geometry': GEOMETRY_TYPES.get(attrs.get('type', ''), ''),
+                'tags': [t.strip() for t in attrs.get('tags', '').split(',') if t.strip()],
+                'svgs': [],
+                'offset': parser.CurrentByteIndex,
+            }
+        elif current is not None:
+            # SVG files are referenced by the value of a prop or Option
+            for value in attrs.values():
+                if value.lower().endswith('.svg') and not value.startswith('base64:') and value not in current['svgs']:
+                    current['svgs'].append(value)
+
+    def end(tag):
+        nonlocal current
+        path.pop()
+        if tag == 'symbol' and current is not None and path == ['qgis_style', 'symbols']:
+            # The end event is at the end tag, or just after '/>' for an empty element
+            end_offset = parser.CurrentByteIndex
+            if data.startswith(b'</', end_offset):
+                end_offset = data.index(b'>', end_offset) + 1
+            current['length'] = end_offset - current['offset']
+            entries.append(current)
+            current = None
+
+    parser = xml.parsers.expat.ParserCreate()
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.Parse(data, True)
+    return entries
+
+def build_index(symbol_dir):
+    """Returns the index of all XML files in a symbol folder as a dictionary"""
+    files = {}
+    symbols = []
+    for file_name in sorted(os.listdir(symbol_dir)):
+        if not file_name.lower().endswith('.xml'):
+            continue
+        with open(os.path.join(symbol_dir, file_name), 'rb') as infile:
+            data = infile.read()
+        files[file_name] = {'size': len(data), 'sha256': file_digest(data)}
+        symbols.extend(index_symbols(data, file_name))
+    return {'version': INDEX_VERSION, 'files': files, 'symbols': symbols}
+
+def dumps_index(index):
+    """Returns the JSON text of an index, with one line per symbol so that changes diff well"""
+    lines = [
+        '{',
+        f'"version": {index["version"]},',
+        f'"files": {json.dumps(index["files"], sort_keys=True)},',
+        '"symbols": [',
+    ]
+    lines.append(',\n'.join(json.dumps(entry, ensure_ascii=False) for entry in index['symbols']))
+    lines.append(']')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+def stale_files(symbol_dir, index):
+    """Returns the names of the XML files that were added, removed or changed since `index` was built"""
+    current = {name for name in os.listdir(symbol_dir) if name.lower().endswith('.xml')}
+    stale = sorted(current.symmetric_difference(index.get('files', {})))
+    for file_name in sorted(current & set(index.get('files', {}))):
+        with open(os.path.join(symbol_dir, file_name), 'rb') as infile:
+            if file_digest(infile.read()) != index['files'][file_name]['sha256']:
+                stale.append(file_name)
+    return stale
+
+class SymbolLibrary:
+    """
+    The symbols of one symbol folder, read through its index. Only the
+    <symbol> elements that are asked for are read from disk and parsed, and
+    parsed symbols are kept for the next lookup.
+    """
+    def __init__(self, symbol_dir):
+        self.symbol_dir = symbol_dir
+        self.index = self._read_index()
+        self._entries = {entry['name']: entry for entry in self.index['symbols']}
+        self._symbols = {}      #name -> QgsSymbol
+
+    def _read_index(self):
+        """Reads the index, indexing the XML files again if it is missing, outdated or stale"""
+        path = os.path.join(self.symbol_dir, INDEX_NAME)
+        try:
+            with open(path, encoding='utf-8') as infile:
+                index = json.load(infile)
+        except (OSError, ValueError):
+            warnings.warn(f"{path} is missing or unreadable, indexing {self.symbol_dir} in memory "
+                          "(run 'python symbol_index.py build')", stacklevel=3)
+            return build_index(self.symbol_dir)
+        if index.get('version') != INDEX_VERSION or stale_files(self.symbol_dir, index):
+            warnings.warn(f"{path} is outdated, indexing {self.symbol_dir} in memory "
+                          "(run 'python symbol_index.py build')", stacklevel=3)
+            return build_index(self.symbol_dir)
+        return index
+
+    def names(self, tag=None, geometry=None):
+        """Returns the names of the symbols, optionally only those with a tag and/or geometry type"""
+        return [entry['name'] for entry in self.index['symbols']
+                if (tag is None or tag in entry['tags']) and (geometry is None or entry['geometry'] == geometry)]
+
+    def entry(self, name):
+        """Returns the index entry of a symbol (raises KeyError if there is no such symbol)"""
+        return self._entries[name]
+
+    def symbol_xml(self, name):
+        """Returns the <symbol> element of a symbol as bytes, read straight from its offset"""
+        entry = self.entry(name)
+        with open(os.path.join(self.symbol_dir, entry['file']), 'rb') as infile:
+            infile.seek(entry['offset'])
+            return infile.read(entry['length'])
+
+    def symbol_element(self, name):
+        """Returns the <symbol> element of a symbol as an ElementTree Element"""
+        return ET.fromstring(self.symbol_xml(name))
+
+    def load_symbol(self, name):
+        """Returns a symbol as a QgsSymbol (requires QGIS)"""
+        symbol = self._symbols.get(name)
+        if symbol is None:
+            from qgis.core import QgsReadWriteContext, QgsSymbolLayerUtils
+            from qgis.PyQt.QtXml import QDomDocument
+
+            document = QDomDocument()
+            document.setContent(self.symbol_xml(name))
+            symbol = QgsSymbolLayerUtils.loadSymbol(document.documentElement(), QgsReadWriteContext())
+            if symbol is None:
+                raise ValueError(f"symbol '{name}' could not be loaded")
+            self._symbols[name] = symbol
+        return symbol.clone()
+
+    def add_to_style(self, style, names):
+        """Adds symbols (and their tags) to a QgsStyle, e.g. QgsStyle.defaultStyle() (requires QGIS)"""
+        from qgis.core import QgsStyle
+
+        for name in names:
+            style.addSymbol(name, self.load_symbol(name), True)
+            style.tagSymbol(QgsStyle.SymbolEntity, name, self.entry(name)['tags'])
+
+def symbol_dirs(collection_dirs):
+    """Returns the symbol folders of the given collection folders (all collections if empty)"""
+    if not collection_dirs:
+        collection_dirs = [os.path.join(COLLECTIONS_DIR, name) for name in sorted(os.listdir(COLLECTIONS_DIR))]
+    return [os.path.join(c, 'symbol') for c in collection_dirs if os.path.isdir(os.path.join(c, 'symbol'))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Builds and checks the symbol library indexes.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command in ('build', 'check'):
+        subparser = subparsers.add_parser(command)
+        subparser.add_argument('collections', nargs='*', help="collection folders (default: all)")
+    list_parser = subparsers.add_parser('list')
+    list_parser.add_argument('collection', help="collection folder")
+    list_parser.add_argument('--tag', help="only symbols with this tag")
+    list_parser.add_argument('--geometry', choices=sorted(GEOMETRY_TYPES.values()), help="only symbols of this geometry type")
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        library = SymbolLibrary(os.path.join(args.collection, 'symbol'))
+        for name in library.names(args.tag, args.geometry):
+            print(name)
+        return 0
+
+    failed = False
+    for symbol_dir in symbol_dirs(args.collections):
+        path = os.path.join(symbol_dir, INDEX_NAME)
+        text = dumps_index(build_index(symbol_dir))
+        try:
+            with open(path, encoding='utf-8') as infile:
+                current = infile.read()
+        except OSError:
+            current = None
+
+        if args.command == 'build':
+            if text != current:
+                with open(path, 'w', encoding='utf-8', newline='\n') as outfile:
+                    outfile.write(text)
+                print(f"Wrote {path}")
+        elif text != current:
+            print(f"{path} is out of date: run 'python symbol_index.py build'")
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+import glob
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from layout_export import MAIN_MAP, OVERVIEW_MAP, file_name, page_extent, read_extents, summarize, template_maps, union_extent
+
+TEMPLATES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..',
+                                          'collections', 'Sources', 'layout', '*.qpt')))
+
+@pytest.mark.parametrize('path', TEMPLATES, ids=os.path.basename)
+def test_templates_have_the_maps_the_exporter_sets(path):
+    maps = template_maps(path)
+    assert MAIN_MAP in maps
+    assert (OVERVIEW_MAP in maps) == path.endswith('_WithInsets.qpt')
+    assert all(width > 0 and height > 0 for width, height in maps.values())
+
+def test_read_extents(tmp_path):
+    path = tmp_path / 'pages.csv'     #with a byte order mark, as Excel writes it
+    path.write_text('\ufeffname,xmin,ymin,xmax,ymax\nA.I,0,0,10,5\nA.II,10,0,20,5.5\n', encoding='utf-8')
+    assert read_extents(str(path)) == [{'name': 'A.I', 'extent': (0, 0, 10, 5)},
+                                       {'name': 'A.II', 'extent': (10, 0, 20, 5.5)}]
+
+def test_page_and_union_extents():
+    assert page_extent((0, 0, 10, 5), 0.1) == pytest.approx((-1, -1, 11, 6))
+    pages = [{'name': 'a', 'extent': (0, 0, 10, 5)}, {'name': 'b', 'extent': (-5, 2, 3, 8)}]
+    assert union_extent(pages) == (-5, 0, 10, 8)
+
+def test_file_name():
+    assert file_name({'name': 'A1.12'}, 7, 'pdf') == '0007_A1.12.pdf'
+    assert file_name({'name': 'Trench 3 / north'}, 12, 'png') == '0012_Trench_3_north.png'
+    assert file_name({'name': '//'}, 1, 'pdf') == '0001_page.pdf'
+
+def test_summarize():
+    summary = summarize([2.0]*19 + [10.0], 20.0)
+    assert summary['pages'] == 20 and summary['pages_per_minute'] == 60
+    assert summary['median'] == 2 and summary['p95'] == 10 and summary['max'] == 10
+    assert summary['mean'] == pytest.approx(2.4)
+    assert summarize([], 0)['pages'] == 0
@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from svg_atlas import MANIFEST_NAME, MarkerAtlas, bucket_widths, pack_sprites, plan_atlas, stale_svgs, svg_aspect
+
+SQUARE = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 10 10"/>'
+TALL = '<svg xmlns="http://www.w3.org/2000/svg" width="20px" height="30"/>'
+
+@pytest.fixture
+def svg_dir(tmp_path):
+    folder = tmp_path / 'svg'
+    folder.mkdir()
+    (folder / 'square.svg').write_text(SQUARE)
+    (folder / 'tall.svg').write_text(TALL)
+    (folder / 'notes.txt').write_text('not an svg')
+    return str(folder)
+
+@pytest.fixture
+def atlas_dir(tmp_path, svg_dir):
+    folder = tmp_path / 'atlas'
+    folder.mkdir()
+    (folder / MANIFEST_NAME).write_text(json.dumps(plan_atlas(svg_dir, sizes_mm=(2, 4), dpis=(96, 300))))
+    return str(folder)
+
+def test_bucket_widths():
+    assert bucket_widths((2, 4), (96, 300)) == [8, 15, 24, 47]
+    assert bucket_widths((0.1,), (96,)) == [1]
+
+def test_svg_aspect(svg_dir):
+    assert svg_aspect(os.path.join(svg_dir, 'square.svg')) == 1
+    assert svg_aspect(os.path.join(svg_dir, 'tall.svg')) == 1.5
+
+def test_pack_sprites():
+    sprites = [{'w': w, 'h': h} for w, h in [(30, 10), (50, 40), (20, 40), (60, 5), (10, 10)]]
+    height = pack_sprites(sprites, atlas_width=100, padding=1)
+    boxes = [(s['x'] - 1, s['y'] - 1, s['x'] + s['w'] + 1, s['y'] + s['h'] + 1) for s in sprites]
+    for i, a in enumerate(boxes):
+        assert 0 <= a[0] and a[2] <= 100 and 0 <= a[1] and a[3] <= height
+        for b in boxes[i+1:]:
+            assert a[2] <= b[0] or b[2] <= a[0] or a[3] <= b[1] or b[3] <= a[1]      #no overlaps
+    with pytest.raises(ValueError):
+        pack_sprites([{'w': 99, 'h': 1}], atlas_width=100, padding=1)
+
+def test_plan_atlas(svg_dir):
+    manifest = plan_atlas(svg_dir, sizes_mm=(2, 4), dpis=(96, 300))
+    assert sorted(manifest['svgs']) == ['square.svg', 'tall.svg']
+    assert sorted((s['svg'], s['w'], s['h']) for s in manifest['sprites'] if s['svg'] == 'tall.svg') == [
+        ('tall.svg', 8, 12), ('tall.svg', 15, 22), ('tall.svg', 24, 36), ('tall.svg', 47, 70)]
+    assert stale_svgs(manifest, svg_dir) == []
+
+def test_stale_svgs(svg_dir):
+    manifest = plan_atlas(svg_dir)
+    with open(os.path.join(svg_dir, 'tall.svg'), 'a') as outfile:
+        outfile.write('\n')
+    os.remove(os.path.join(svg_dir, 'square.svg'))
+    with open(os.path.join(svg_dir, 'new.svg'), 'w') as outfile:
+        outfile.write(SQUARE)
+    assert stale_svgs(manifest, svg_dir) == ['new.svg', 'square.svg', 'tall.svg']
+
+def test_marker_atlas_bucket(atlas_dir, svg_dir):
+    atlas = MarkerAtlas(atlas_dir, svg_dir, max_error=0.25)
+    assert atlas.pixel_width(4, 300) == pytest.approx(47.24, abs=0.01)
+    assert atlas.bucket('square.svg', 25) == 24
+    assert atlas.bucket('square.svg', 12) == 15 and atlas.bucket('square.svg', 10) == 8
+    assert atlas.bucket('square.svg', 11) is None           #8 is the nearest, but more than 25% too small
+    assert atlas.bucket('square.svg', 100) is None          #more than 25% larger than any sprite
+    assert atlas.bucket('square.svg', 24, exact=True) == 24
+    assert atlas.bucket('square.svg', 24.5, exact=True) is None
+    assert atlas.bucket('missing.svg', 24) is None
+
+def test_marker_atlas_skips_changed_svgs(atlas_dir, svg_dir):
+    with open(os.path.join(svg_dir, 'tall.svg'), 'a') as outfile:
+        outfile.write('\n')
+    atlas = MarkerAtlas(atlas_dir, svg_dir)
+    assert atlas.bucket('tall.svg', 24) is None
+    assert atlas.bucket('square.svg', 24) == 24
@@ -0,0 +1,76 @@
+import os
+import sys
+import warnings
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from symbol_index import INDEX_NAME, SymbolLibrary, build_index, dumps_index, index_symbols, main, stale_files
+
+STYLE = '''<!DOCTYPE qgis_style>
+<qgis_style version="2">
+  <symbols>
+    <symbol name="Datum" type="marker" tags="point, survey">
+      <layer class="SvgMarker">
+        <prop k="name" v="survey/datum.svg"/>
+        <prop k="fill" v="base64:PHN2Zz4uc3ZnPC9zdmc+.svg"/>
+      </layer>
+    </symbol>
+    <symbol name="Trench" type="fill" tags="polygon">
+      <layer class="MarkerLine">
+        <symbol name="@Trench@0" type="marker"/>
+      </layer>
+    </symbol>
+    <symbol name="Édge" type="line"/>
+  </symbols>
+</qgis_style>
+'''.encode('utf-8')
+
+@pytest.fixture
+def symbol_dir(tmp_path):
+    (tmp_path / 'style.xml').write_bytes(STYLE)
+    return str(tmp_path)
+
+def test_index_symbols():
+    entries = index_symbols(STYLE, 'style.xml')
+    assert [(e['name'], e['type'], e['geometry']) for e in entries] == [
+        ('Datum', 'marker', 'point'), ('Trench', 'fill', 'polygon'), ('Édge', 'line', 'line')]
+    assert entries[0]['tags'] == ['point', 'survey']
+    assert entries[0]['svgs'] == ['survey/datum.svg']
+    assert entries[1]['svgs'] == []
+
+def test_offsets_cover_the_symbol_elements():
+    for entry in index_symbols(STYLE, 'style.xml'):
+        element = STYLE[entry['offset']:entry['offset'] + entry['length']]
+        assert element.startswith(b'<symbol name="' + entry['name'].encode('utf-8') + b'"')
+        assert element.endswith(b'</symbol>') or element.endswith(b'/>')
+    assert STYLE[entry['offset']:entry['offset'] + entry['length']] == '<symbol name="Édge" type="line"/>'.encode('utf-8')
+
+def test_stale_files(symbol_dir):
+    index = build_index(symbol_dir)
+    assert stale_files(symbol_dir, index) == []
+    with open(os.path.join(symbol_dir, 'style.xml'), 'ab') as outfile:
+        outfile.write(b'\n')
+    with open(os.path.join(symbol_dir, 'more.xml'), 'wb') as outfile:
+        outfile.write(b'<qgis_style><symbols/></qgis_style>')
+    assert stale_files(symbol_dir, index) == ['more.xml', 'style.xml']
+
+def test_symbol_library(symbol_dir):
+    with open(os.path.join(symbol_dir, INDEX_NAME), 'w', encoding='utf-8') as outfile:
+        outfile.write(dumps_index(build_index(symbol_dir)))
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        library = SymbolLibrary(symbol_dir)
+    assert library.names() == ['Datum', 'Trench', 'Édge']
+    assert library.names(tag='polygon') == ['Trench']
+    assert library.names(geometry='point') == ['Datum']
+    assert library.symbol_element('Trench').find('layer/symbol').get('name') == '@Trench@0'
+    with pytest.raises(KeyError):
+        library.entry('@Trench@0')
+
+def test_symbol_library_indexes_stale_folders_in_memory(symbol_dir):
+    with pytest.warns(UserWarning, match='missing'):
+        assert SymbolLibrary(symbol_dir).names() == ['Datum', 'Trench', 'Édge']
+
+def test_committed_indexes_are_up_to_date():
+    assert main(['check']) == 0